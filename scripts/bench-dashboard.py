@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+bench-dashboard.py - Load benchmark for the dashboard: dev server vs production
+
+Starts a fake Docker Engine (Unix socket) and gpu-server.py with its fake
+GPU backend, then runs the dashboard twice - under the Flask development
+server and under gunicorn with src/gunicorn.conf.py - and hammers
+/api/dashboard from many concurrent keep-alive clients against each.
+Reports requests/second and latency percentiles per mode.
+
+Usage:
+    python3 scripts/bench-dashboard.py --clients 64 --duration 10
+    python3 scripts/bench-dashboard.py --mode prod --workers 2 --threads 64
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DASHBOARD = os.path.join(ROOT, 'src', 'dashboard-unified.py')
+GPU_SERVER = os.path.join(ROOT, 'src', 'gpu-server.py')
+GUNICORN_CONF = os.path.join(ROOT, 'src', 'gunicorn.conf.py')
+
+class FakeDockerHandler(BaseHTTPRequestHandler):
+    """Just enough of the Engine API for the dashboard's collectors"""
+    protocol_version = 'HTTP/1.1'
+    containers = []
+
+    def log_message(self, *args):
+        pass
+
+    def address_string(self):
+        return 'docker'
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def start_chunked(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def send_chunk(self, data):
+        line = (json.dumps(data) + '\n').encode()
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+        self.wfile.flush()
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path.endswith('/containers/json'):
+            return self.send_json(self.containers)
+        if path.endswith('/events'):
+            # Hold the stream open without events
+            self.start_chunked()
+            while True:
+                time.sleep(60)
+        if path.endswith('/stats'):
+            self.start_chunked()
+            usage = 0
+            try:
+                while True:
+                    usage += 10 ** 8
+                    self.send_chunk({
+                        'cpu_stats': {'cpu_usage': {'total_usage': usage},
+                                      'system_cpu_usage': usage * 10, 'online_cpus': 4},
+                        'memory_stats': {'usage': 512 << 20, 'limit': 8 << 30, 'stats': {}}
+                    })
+                    time.sleep(1)
+            except OSError:
+                return
+        if path.endswith('/json'):
+            return self.send_json({'RestartCount': 0, 'State': {'Status': 'running'}})
+        self.send_json({'message': 'not found'}, 404)
+
+class FakeDockerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def run_fake_docker(socket_path, count):
+    names = ['localai', 'ollama', 'forge', 'comfyui', 'n8n', 'chromadb', 'whisper']
+    FakeDockerHandler.containers = [{
+        'Id': f"{i:012x}" + 'a' * 52,
+        'Names': [f"/{names[i] if i < len(names) else f'service-{i}'}"],
+        'Image': 'bench:latest',
+        'State': 'running',
+        'Ports': [],
+        'NetworkSettings': {'Networks': {'ai-network': {}}}
+    } for i in range(count)]
+    FakeDockerServer(socket_path, FakeDockerHandler).serve_forever()
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for(port, path, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+def client_worker(port, clients, duration, results):
+    """Run `clients` keep-alive client threads; put (latencies, errors) on results"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def client():
+        local = []
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        while time.time() < stop_at:
+            started = time.perf_counter()
+            try:
+                conn.request('GET', '/api/dashboard')
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    raise http.client.HTTPException(response.status)
+            except (OSError, http.client.HTTPException):
+                with lock:
+                    errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+                continue
+            local.append(time.perf_counter() - started)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put((latencies, errors[0]))
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+def run_load(port, args):
+    results = multiprocessing.Queue()
+    per_process = [args.clients // args.processes + (1 if i < args.clients % args.processes else 0)
+                   for i in range(args.processes)]
+    started = time.time()
+    workers = [multiprocessing.Process(target=client_worker,
+                                       args=(port, count, args.duration, results))
+               for count in per_process if count]
+    for worker in workers:
+        worker.start()
+    latencies = []
+    errors = 0
+    for _ in workers:
+        worker_latencies, worker_errors = results.get()
+        latencies.extend(worker_latencies)
+        errors += worker_errors
+    for worker in workers:
+        worker.join()
+    return sorted(latencies), errors, time.time() - started
+
+def bench_mode(mode, env, args):
+    port = free_port()
+    env = dict(env, DASHBOARD_PORT=str(port), DASHBOARD_HOST='127.0.0.1',
+               DASHBOARD_WORKERS=str(args.workers), DASHBOARD_THREADS=str(args.threads),
+               DASHBOARD_STATE_DIR=tempfile.mkdtemp(prefix='bench-dashboard-'))
+    if mode == 'dev':
+        command = [sys.executable, DASHBOARD]
+    else:
+        command = [sys.executable, '-m', 'gunicorn', '-c', GUNICORN_CONF,
+                   '--chdir', os.path.join(ROOT, 'src'), 'dashboard-unified:app']
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_for(port, '/api/dashboard'):
+            sys.exit(f"dashboard ({mode}) did not start")
+        # Let the collectors and stats streams settle
+        time.sleep(2)
+        latencies, errors, elapsed = run_load(port, args)
+    finally:
+        server.terminate()
+        server.wait()
+
+    label = 'dev server' if mode == 'dev' else f"gunicorn workers={args.workers} threads={args.threads}"
+    print(f"[{label}] clients={args.clients} duration={elapsed:.1f}s")
+    print(f"  requests={len(latencies)} errors={errors} req/s={len(latencies) / elapsed:.0f}")
+    print("  latency ms: p50={:.2f} p90={:.2f} p99={:.2f} max={:.2f}".format(
+        *(percentile(latencies, p) * 1000 for p in (50, 90, 99, 100))))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--mode', choices=('dev', 'prod', 'both'), default='both')
+    parser.add_argument('--clients', type=int, default=64, help='concurrent keep-alive clients')
+    parser.add_argument('--processes', type=int, default=4, help='client processes')
+    parser.add_argument('--duration', type=float, default=10, help='seconds to run per mode')
+    parser.add_argument('--containers', type=int, default=9, help='fake containers')
+    parser.add_argument('--gpus', type=int, default=2, help='fake GPU count')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=32, help='gunicorn threads per worker')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-dashboard-')
+    docker_socket = os.path.join(workdir, 'docker.sock')
+    docker = multiprocessing.Process(target=run_fake_docker, args=(docker_socket, args.containers),
+                                     daemon=True)
+    docker.start()
+
+    gpu_port = free_port()
+    gpu_server = subprocess.Popen([sys.executable, GPU_SERVER],
+                                  env=dict(os.environ, GPU_BACKEND='fake', FAKE_GPU_COUNT=str(args.gpus),
+                                           GPU_SERVER_PORT=str(gpu_port)),
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deployed = os.path.join(workdir, 'deployed-services.json')
+    with open(deployed, 'w') as f:
+        json.dump({'services': []}, f)
+
+    env = dict(os.environ,
+               DOCKER_SOCKET=docker_socket,
+               GPU_SERVER_URL=f"http://127.0.0.1:{gpu_port}/gpu-metrics",
+               DEPLOYED_SERVICES_FILE=deployed,
+               PYTHONUNBUFFERED='1')
+    try:
+        if not wait_for(gpu_port, '/gpu-metrics'):
+            sys.exit("gpu-server.py did not start")
+        for mode in (('dev', 'prod') if args.mode == 'both' else (args.mode,)):
+            bench_mode(mode, env, args)
+    finally:
+        gpu_server.terminate()
+        gpu_server.wait()
+        docker.terminate()
+
+if __name__ == '__main__':
+    main()
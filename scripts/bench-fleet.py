@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+bench-fleet.py - Fleet aggregation benchmark with local stand-in nodes
+
+Starts several processes that each serve many stand-in AI box dashboards
+(a fake /api/dashboard with ETags and gzip, changing every --change
+seconds), some of them slow (answering after --slow-delay seconds) and
+some dead (nothing listening). Then runs dashboard-unified.py in fleet
+mode over all of them and samples /api/fleet and /api/fleet/stream.
+Reports how quickly the healthy nodes become fresh and how old their data
+gets while slow and dead nodes time out alongside them.
+
+Usage:
+    python3 scripts/bench-fleet.py --nodes 60 --slow 5 --dead 5 --duration 20
+"""
+
+import argparse
+import gzip
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DASHBOARD = os.path.join(ROOT, 'src', 'dashboard-unified.py')
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """A node's /api/dashboard: a snapshot that changes every `change` seconds"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        node = self.server.node
+        if node['delay']:
+            time.sleep(node['delay'])
+        if self.path.split('?')[0] != '/api/dashboard':
+            return self.send_body(404, b'{}')
+
+        version = int((time.time() - node['started']) / node['change']) + 1
+        etag = f'"{version}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = json.dumps({
+            'services': {'data': [{'name': f"service-{i}", 'status': 'running'}
+                                  for i in range(node['services'])], 'count': node['services']},
+            'system': {'hostname': node['name']},
+            'gpu': {'gpus': [{'index': i, 'gpu_util': float(version % 100), 'mem_used': 1024.0,
+                              'mem_total': 24576.0} for i in range(node['gpus'])]},
+            'version': version
+        }).encode()
+        headers = {'ETag': etag}
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            headers['Content-Encoding'] = 'gzip'
+        self.send_body(200, body, headers)
+
+    def send_body(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+class StandInServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        # The aggregator hangs up on slow nodes once its timeout passes
+        pass
+
+def run_nodes(names, delay, args, ports):
+    """Serve one stand-in dashboard per name from this process; put (name, port) on ports"""
+    for name in names:
+        server = StandInServer(('127.0.0.1', 0), StandInHandler)
+        server.node = {'name': name, 'delay': delay, 'change': args.change, 'started': time.time(),
+                       'services': args.services, 'gpus': args.gpus}
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        ports.put((name, server.server_address[1]))
+    while True:
+        time.sleep(60)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def get_json(port, path):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        return json.loads(response.read()) if response.status == 200 else None
+    finally:
+        conn.close()
+
+def wait_for(port, path, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if get_json(port, path) is not None:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+def count_stream_lines(port, duration, counter):
+    """Read /api/fleet/stream for `duration` seconds, counting node lines"""
+    sock = socket.create_connection(('127.0.0.1', port), timeout=duration + 5)
+    sock.sendall(b'GET /api/fleet/stream HTTP/1.1\r\nHost: bench\r\n\r\n')
+    stop_at = time.time() + duration
+    sock.settimeout(1)
+    while time.time() < stop_at:
+        try:
+            data = sock.recv(65536)
+        except socket.timeout:
+            continue
+        if not data:
+            break
+        counter.append(data.count(b'{"name"'))
+    sock.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--nodes', type=int, default=60, help='stand-in nodes in total')
+    parser.add_argument('--slow', type=int, default=5, help='nodes slower than the fleet timeout')
+    parser.add_argument('--dead', type=int, default=5, help='nodes with nothing listening')
+    parser.add_argument('--processes', type=int, default=4, help='stand-in node processes')
+    parser.add_argument('--interval', type=float, default=5, help='FLEET_INTERVAL seconds')
+    parser.add_argument('--timeout', type=float, default=2, help='FLEET_TIMEOUT seconds')
+    parser.add_argument('--concurrency', type=int, default=16, help='FLEET_CONCURRENCY')
+    parser.add_argument('--slow-delay', type=float, default=4, help='seconds a slow node takes')
+    parser.add_argument('--change', type=float, default=2, help='seconds between node snapshot changes')
+    parser.add_argument('--services', type=int, default=12, help='services per node')
+    parser.add_argument('--gpus', type=int, default=2, help='GPUs per node')
+    parser.add_argument('--duration', type=float, default=20, help='seconds to sample')
+    args = parser.parse_args()
+
+    healthy = args.nodes - args.slow - args.dead
+    groups = [([f"node-{i:03d}" for i in range(healthy)], 0),
+              ([f"slow-{i:03d}" for i in range(args.slow)], args.slow_delay)]
+    ports = multiprocessing.Queue()
+    workers = []
+    for names, delay in groups:
+        for p in range(args.processes):
+            share = names[p::args.processes]
+            if share:
+                worker = multiprocessing.Process(target=run_nodes, args=(share, delay, args, ports),
+                                                 daemon=True)
+                worker.start()
+                workers.append(worker)
+    nodes = dict(ports.get() for _ in range(healthy + args.slow))
+    for i in range(args.dead):
+        nodes[f"dead-{i:03d}"] = free_port()
+
+    port = free_port()
+    env = dict(os.environ,
+               FLEET_NODES=','.join(f"{name}=127.0.0.1:{node_port}" for name, node_port in nodes.items()),
+               FLEET_INTERVAL=str(args.interval), FLEET_TIMEOUT=str(args.timeout),
+               FLEET_CONCURRENCY=str(args.concurrency),
+               DASHBOARD_PORT=str(port), DASHBOARD_HOST='127.0.0.1',
+               DASHBOARD_STATE_DIR=tempfile.mkdtemp(prefix='bench-fleet-'),
+               DOCKER_SOCKET=os.path.join(tempfile.mkdtemp(prefix='bench-fleet-'), 'missing.sock'),
+               GPU_SERVER_URL=f"http://127.0.0.1:{free_port()}/gpu-metrics",
+               PYTHONUNBUFFERED='1')
+    server = subprocess.Popen([sys.executable, DASHBOARD], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_for(port, '/health'):
+            sys.exit("dashboard did not start")
+        started = time.time()
+        stream_lines = []
+        stream = threading.Thread(target=count_stream_lines, args=(port, args.duration, stream_lines))
+        stream.start()
+
+        all_fresh_after = None
+        max_age = 0.0
+        states = {}
+        while time.time() - started < args.duration:
+            view = get_json(port, '/api/fleet?full=0')
+            states = view['states']
+            ages = [node['age'] for node in view['nodes'] if node['name'].startswith('node-')]
+            if all_fresh_after is None and all(age is not None for age in ages):
+                all_fresh_after = time.time() - started
+            if all_fresh_after is not None:
+                max_age = max([max_age] + [age for age in ages if age is not None])
+            time.sleep(0.5)
+        stream.join()
+        latency = [stats for key, stats in get_json(port, '/debug/perf')['latency']['collector'].items()
+                   if key.startswith('fleet:node-')]
+    finally:
+        server.terminate()
+        server.wait()
+        for worker in workers:
+            worker.terminate()
+
+    print(f"nodes={args.nodes} (healthy={healthy} slow={args.slow} dead={args.dead}) "
+          f"interval={args.interval}s timeout={args.timeout}s concurrency={args.concurrency}")
+    print(f"  all healthy nodes reported after {all_fresh_after or float('nan'):.2f}s")
+    print(f"  oldest healthy-node data seen after that: {max_age:.1f}s")
+    print(f"  final states: {json.dumps(states)}")
+    print(f"  stream node lines received={sum(stream_lines)}")
+    if latency:
+        print("  healthy-node poll ms: p50={:.2f} p99={:.2f} max={:.2f}".format(
+            max(stats['p50_ms'] for stats in latency), max(stats['p99_ms'] for stats in latency),
+            max(stats['max_ms'] for stats in latency)))
+
+if __name__ == '__main__':
+    main()
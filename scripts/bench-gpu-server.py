@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+bench-gpu-server.py - Load benchmark for gpu-server.py
+
+Starts gpu-server.py with the fake GPU backend on a local port and hammers
+/gpu-metrics from many concurrent keep-alive clients, optionally with
+long-lived /gpu-metrics/stream clients connected at the same time.
+Reports requests/second and latency percentiles.
+
+Usage:
+    python3 scripts/bench-gpu-server.py --clients 64 --duration 10 --streams 8
+"""
+
+import argparse
+import http.client
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'gpu-server.py')
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for_server(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/gpu-metrics')
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.1)
+    return False
+
+def client_worker(port, clients, duration, results):
+    """Run `clients` keep-alive client threads; put (latencies, errors) on results"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def client():
+        local = []
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        while time.time() < stop_at:
+            started = time.perf_counter()
+            try:
+                conn.request('GET', '/gpu-metrics')
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    raise http.client.HTTPException(response.status)
+            except (OSError, http.client.HTTPException):
+                with lock:
+                    errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+                continue
+            local.append(time.perf_counter() - started)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put((latencies, errors[0]))
+
+def stream_worker(port, duration, counter):
+    """Hold a /gpu-metrics/stream connection open and count events"""
+    sock = socket.create_connection(('127.0.0.1', port), timeout=duration + 5)
+    sock.sendall(b'GET /gpu-metrics/stream HTTP/1.1\r\nHost: bench\r\n\r\n')
+    stop_at = time.time() + duration
+    sock.settimeout(1)
+    while time.time() < stop_at:
+        try:
+            data = sock.recv(65536)
+        except socket.timeout:
+            continue
+        if not data:
+            break
+        counter.append(data.count(b'data: '))
+    sock.close()
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--clients', type=int, default=64, help='concurrent keep-alive clients')
+    parser.add_argument('--processes', type=int, default=4, help='client processes')
+    parser.add_argument('--streams', type=int, default=8, help='concurrent stream clients')
+    parser.add_argument('--duration', type=float, default=10, help='seconds to run')
+    parser.add_argument('--gpus', type=int, default=8, help='fake GPU count')
+    args = parser.parse_args()
+
+    port = free_port()
+    env = dict(os.environ, GPU_BACKEND='fake', FAKE_GPU_COUNT=str(args.gpus),
+               GPU_SERVER_PORT=str(port))
+    server = subprocess.Popen([sys.executable, SERVER], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_for_server(port):
+            sys.exit("gpu-server.py did not start")
+
+        stream_events = []
+        streams = [threading.Thread(target=stream_worker, args=(port, args.duration, stream_events))
+                   for _ in range(args.streams)]
+        for thread in streams:
+            thread.start()
+
+        results = multiprocessing.Queue()
+        per_process = [args.clients // args.processes + (1 if i < args.clients % args.processes else 0)
+                       for i in range(args.processes)]
+        started = time.time()
+        workers = [multiprocessing.Process(target=client_worker,
+                                           args=(port, count, args.duration, results))
+                   for count in per_process if count]
+        for worker in workers:
+            worker.start()
+        latencies = []
+        errors = 0
+        for _ in workers:
+            worker_latencies, worker_errors = results.get()
+            latencies.extend(worker_latencies)
+            errors += worker_errors
+        for worker in workers:
+            worker.join()
+        elapsed = time.time() - started
+        for thread in streams:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    print(f"clients={args.clients} streams={args.streams} gpus={args.gpus} duration={elapsed:.1f}s")
+    print(f"requests={len(latencies)} errors={errors} req/s={len(latencies) / elapsed:.0f}")
+    print("latency ms: p50={:.2f} p90={:.2f} p99={:.2f} max={:.2f}".format(
+        *(percentile(latencies, p) * 1000 for p in (50, 90, 99, 100))))
+    if args.streams:
+        print(f"stream events received={sum(stream_events)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+bench-llm-router.py - Direct vs routed LLM throughput against mock backends
+
+Starts a mock LocalAI and a mock Ollama (scripts/mock-llm-server.py), the
+fake-backend gpu-server.py and src/llm-router.py, then runs concurrent
+streaming chat clients first straight at LocalAI (what clients do today)
+and then through the router. Reports aggregate tokens/second, time to
+first token and how the router spread the requests.
+
+Usage:
+    python3 scripts/bench-llm-router.py --clients 16 --duration 10
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+ROUTER = os.path.join(ROOT, 'src', 'llm-router.py')
+GPU_SERVER = os.path.join(ROOT, 'src', 'gpu-server.py')
+MOCK = os.path.join(ROOT, 'scripts', 'mock-llm-server.py')
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for(port, path, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', path)
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.1)
+    return False
+
+def run_clients(port, args):
+    """Streaming chat clients for args.duration seconds; returns (tokens, ttfts, errors, elapsed)"""
+    tokens = [0]
+    ttfts = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.time() + args.duration
+    body = json.dumps({'model': args.model, 'stream': True, 'max_tokens': args.max_tokens,
+                       'messages': [{'role': 'user', 'content': 'Say something.'}]})
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        while time.time() < stop_at:
+            started = time.perf_counter()
+            first = None
+            count = 0
+            try:
+                conn.request('POST', '/v1/chat/completions', body=body,
+                             headers={'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                if response.status != 200:
+                    response.read()
+                    raise http.client.HTTPException(response.status)
+                for line in response:
+                    if line.startswith(b'data: {') and b'"delta"' in line:
+                        if first is None:
+                            first = time.perf_counter() - started
+                        count += 1
+            except (OSError, http.client.HTTPException):
+                with lock:
+                    errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                continue
+            with lock:
+                tokens[0] += count
+                if first is not None:
+                    ttfts.append(first)
+        conn.close()
+
+    started = time.time()
+    threads = [threading.Thread(target=client) for _ in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return tokens[0], sorted(ttfts), errors[0], time.time() - started
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+def report(label, tokens, ttfts, errors, elapsed):
+    print(f"[{label}] requests={len(ttfts)} errors={errors} tokens/s={tokens / elapsed:.0f}")
+    print("  ttft ms: p50={:.0f} p99={:.0f}".format(percentile(ttfts, 50) * 1000,
+                                                    percentile(ttfts, 99) * 1000))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--clients', type=int, default=16, help='concurrent streaming clients')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per mode')
+    parser.add_argument('--model', default='llama3')
+    parser.add_argument('--max-tokens', type=int, default=32)
+    parser.add_argument('--tps', type=float, default=120, help='aggregate tokens/s of each mock backend')
+    parser.add_argument('--max-inflight', type=int, default=8, help='router cap per backend')
+    args = parser.parse_args()
+
+    ports = {'localai': free_port(), 'ollama': free_port(), 'gpu': free_port(), 'router': free_port()}
+    processes = []
+
+    def start(command, env=None):
+        process = subprocess.Popen(command, env=dict(os.environ, **(env or {})),
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        processes.append(process)
+
+    try:
+        for name, kind in (('localai', 'openai'), ('ollama', 'ollama')):
+            start([sys.executable, MOCK, '--kind', kind, '--port', str(ports[name]),
+                   '--models', args.model, '--tps', str(args.tps)])
+        start([sys.executable, GPU_SERVER], {'GPU_BACKEND': 'fake', 'FAKE_GPU_COUNT': '2',
+                                             'GPU_SERVER_PORT': str(ports['gpu'])})
+        start([sys.executable, ROUTER], {
+            'ROUTER_PORT': str(ports['router']),
+            'LOCALAI_URL': f"http://127.0.0.1:{ports['localai']}", 'LOCALAI_GPUS': '0',
+            'OLLAMA_URL': f"http://127.0.0.1:{ports['ollama']}", 'OLLAMA_GPUS': '1',
+            'LOCALAI_MAX_INFLIGHT': str(args.max_inflight), 'OLLAMA_MAX_INFLIGHT': str(args.max_inflight),
+            'GPU_SERVER_URL': f"http://127.0.0.1:{ports['gpu']}/gpu-metrics"
+        })
+        for name in ('localai', 'ollama', 'router'):
+            if not wait_for(ports[name], '/v1/models'):
+                sys.exit(f"{name} did not start")
+
+        report('direct to localai', *run_clients(ports['localai'], args))
+        report('through llm-router', *run_clients(ports['router'], args))
+
+        conn = http.client.HTTPConnection('127.0.0.1', ports['router'], timeout=5)
+        conn.request('GET', '/router/status')
+        status = json.loads(conn.getresponse().read())
+        print("  routed: " + ', '.join(f"{backend['name']}={backend['routed']}"
+                                       for backend in status['backends']))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+if __name__ == '__main__':
+    main()
@@ -110,7 +110,7 @@ fi
 
 # Check Network Ports
 echo -e "\n${BLUE}Network Ports:${NC}"
-PORTS=("8080:LocalAI" "11434:Ollama" "7860:Forge" "9400:DCGM")
+PORTS=("8080:LocalAI" "11434:Ollama" "7860:Forge" "8090:LLM Router" "9400:DCGM")
 
 for PORT_INFO in "${PORTS[@]}"; do
     PORT=$(echo "$PORT_INFO" | cut -d':' -f1)
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+llm-bench.py - Inference throughput and latency benchmark for deployed LLMs
+
+Runs the workloads in a suite file (config/llm-bench.json by default)
+against LocalAI's /v1/chat/completions and Ollama's /api/generate, each at
+several concurrency levels, with streaming responses so time to first
+token can be measured. For every run it records TTFT, end-to-end latency
+(p50/p95/p99), tokens/second, error rate and the GPU utilization, memory
+and power gpu-server.py sampled while the run was in progress.
+
+Results are written as versioned JSON (schema_version) named after the
+time and the image tags under test, and can be compared with an earlier
+result file to spot regressions between image tags. --mock runs the suite
+offline against scripts/mock-llm-server.py and a fake-backend gpu-server;
+its results go to a separate mock/ directory and are never picked as the
+'latest' baseline of a real run.
+
+Usage:
+    python3 scripts/llm-bench.py --baseline latest
+    python3 scripts/llm-bench.py --workload localai-chat --concurrency 1,16 --tag localai=v2.19.0
+    python3 scripts/llm-bench.py --mock --requests 16
+"""
+
+import argparse
+import glob
+import http.client
+import json
+import math
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import datetime
+
+SCHEMA_VERSION = 1
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DEFAULT_SUITE = os.path.join(ROOT, 'config', 'llm-bench.json')
+DEFAULT_OUTPUT = os.path.join(ROOT, 'data', 'llm-bench')
+MOCK_SERVER = os.path.join(ROOT, 'scripts', 'mock-llm-server.py')
+GPU_SERVER = os.path.join(ROOT, 'src', 'gpu-server.py')
+
+REQUEST_TIMEOUT = 300  # seconds for one generation
+
+def openai_request(workload, chat):
+    body = {'model': workload['model'], 'max_tokens': workload['max_tokens'], 'stream': True}
+    if chat:
+        body['messages'] = [{'role': 'user', 'content': workload['prompt']}]
+    else:
+        body['prompt'] = workload['prompt']
+    return ('/v1/chat/completions' if chat else '/v1/completions'), body
+
+def ollama_request(workload, chat):
+    body = {'model': workload['model'], 'stream': True,
+            'options': {'num_predict': workload['max_tokens']}}
+    if chat:
+        body['messages'] = [{'role': 'user', 'content': workload['prompt']}]
+    else:
+        body['prompt'] = workload['prompt']
+    return ('/api/chat' if chat else '/api/generate'), body
+
+def openai_event(line):
+    """(token text or None, completion token count or None) from one SSE line"""
+    if not line.startswith(b'data: {'):
+        return None, None
+    event = json.loads(line[6:])
+    usage = (event.get('usage') or {}).get('completion_tokens')
+    for choice in event.get('choices') or ():
+        text = (choice.get('delta') or {}).get('content') or choice.get('text')
+        if text:
+            return text, usage
+    return None, usage
+
+def ollama_event(line):
+    """(token text or None, eval_count or None) from one NDJSON line"""
+    if not line.strip():
+        return None, None
+    event = json.loads(line)
+    text = event.get('response') or (event.get('message') or {}).get('content')
+    return text or None, event.get('eval_count') if event.get('done') else None
+
+# api -> (request builder, stream line parser)
+APIS = {
+    'openai-chat': (lambda workload: openai_request(workload, True), openai_event),
+    'openai-completion': (lambda workload: openai_request(workload, False), openai_event),
+    'ollama-generate': (lambda workload: ollama_request(workload, False), ollama_event),
+    'ollama-chat': (lambda workload: ollama_request(workload, True), ollama_event),
+}
+
+def run_request(conn, path, body, parse):
+    """One streamed generation; returns {'ttft', 'latency', 'tokens'} or raises"""
+    started = time.perf_counter()
+    conn.request('POST', path, body=body, headers={'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    if response.status != 200:
+        response.read()
+        raise http.client.HTTPException(f"HTTP {response.status}")
+    ttft = None
+    events = 0
+    reported = None
+    for line in response:
+        text, count = parse(line)
+        if text:
+            if ttft is None:
+                ttft = time.perf_counter() - started
+            events += 1
+        if count is not None:
+            reported = count
+    if ttft is None:
+        raise http.client.HTTPException('no tokens in the response')
+    return {'ttft': ttft, 'latency': time.perf_counter() - started,
+            'tokens': reported if reported is not None else events}
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+
+    def pick(pct):
+        return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+    return {'mean': round(sum(values) / len(values) * 1000, 1),
+            'p50': round(pick(50) * 1000, 1), 'p95': round(pick(95) * 1000, 1),
+            'p99': round(pick(99) * 1000, 1), 'max': round(values[-1] * 1000, 1)}
+
+def run_workload(url, workload, concurrency, requests, warmup):
+    """Run `requests` generations from `concurrency` keep-alive clients"""
+    build, parse = APIS[workload['api']]
+    path, body = build(workload)
+    body = json.dumps(body)
+    parts = urllib.parse.urlsplit(url)
+
+    def connect():
+        return http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=REQUEST_TIMEOUT)
+
+    # Unmeasured requests first, so model loading does not count as TTFT
+    conn = connect()
+    for _ in range(warmup):
+        try:
+            run_request(conn, path, body, parse)
+        except (OSError, http.client.HTTPException, ValueError):
+            conn.close()
+            conn = connect()
+    conn.close()
+
+    samples = []
+    errors = []
+    remaining = [requests]
+    lock = threading.Lock()
+
+    def client():
+        conn = connect()
+        while True:
+            with lock:
+                if not remaining[0]:
+                    break
+                remaining[0] -= 1
+            try:
+                sample = run_request(conn, path, body, parse)
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                with lock:
+                    errors.append(str(e) or e.__class__.__name__)
+                conn.close()
+                conn = connect()
+                continue
+            with lock:
+                samples.append(sample)
+        conn.close()
+
+    started = time.time()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    ended = time.time()
+
+    tokens = sum(sample['tokens'] for sample in samples)
+    decode_rates = [(sample['tokens'] - 1) / (sample['latency'] - sample['ttft']) for sample in samples
+                    if sample['tokens'] > 1 and sample['latency'] > sample['ttft']]
+    return {
+        'workload': workload['name'],
+        'target': workload['target'],
+        'api': workload['api'],
+        'model': workload['model'],
+        'url': url,
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': len(errors),
+        'error_rate': round(len(errors) / requests, 4) if requests else 0,
+        'error_examples': sorted(set(errors))[:3],
+        'started': started,
+        'ended': ended,
+        'duration': round(ended - started, 3),
+        'tokens': tokens,
+        'tokens_per_second': round(tokens / (ended - started), 2),
+        'request_tokens_per_second': {
+            'mean': round(sum(decode_rates) / len(decode_rates), 2) if decode_rates else None,
+            'p50': round(sorted(decode_rates)[len(decode_rates) // 2], 2) if decode_rates else None
+        },
+        'ttft_ms': percentiles([sample['ttft'] for sample in samples]),
+        'latency_ms': percentiles([sample['latency'] for sample in samples])
+    }
+
+def gpu_window(gpu_url, started, ended):
+    """Per-GPU mean/max of gpu-server's history between `started` and `ended`"""
+    window = math.ceil(time.time() - started) + 2
+    step = max(1, math.ceil(window / 1000))
+    parts = urllib.parse.urlsplit(gpu_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=5)
+    try:
+        conn.request('GET', f"{parts.path.rstrip('/')}/history?window={window}s&step={step}s")
+        response = conn.getresponse()
+        history = json.loads(response.read())
+        if response.status != 200:
+            return {'error': history.get('error', f"HTTP {response.status}")}
+    except (OSError, http.client.HTTPException, ValueError) as e:
+        return {'error': str(e)}
+    finally:
+        conn.close()
+
+    # Bucket timestamps mark bucket ends; keep buckets overlapping the run
+    keep = [i for i, timestamp in enumerate(history['timestamps'])
+            if started < timestamp <= ended + step]
+    gpus = []
+    for gpu in history['gpus']:
+        summary = {'index': gpu['index'], 'name': gpu['name']}
+        for metric in ('gpu_util', 'mem_util', 'power_draw', 'temperature'):
+            points = [gpu[metric][i] for i in keep if gpu[metric][i] is not None]
+            summary[metric] = {'mean': round(sum(points) / len(points), 1), 'max': max(points)} \
+                if points else None
+        gpus.append(summary)
+    return {'samples': len(keep), 'step': step, 'gpus': gpus}
+
+def image_tag(container):
+    """Image reference and short ID of a running container, via the docker CLI"""
+    try:
+        output = subprocess.run(['docker', 'inspect', '--format', '{{.Config.Image}} {{.Image}}', container],
+                                capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if output.returncode != 0 or not output.stdout.strip():
+        return None
+    image, _, image_id = output.stdout.strip().partition(' ')
+    return f"{image}@{image_id.split(':')[-1][:12]}"
+
+def parse_pairs(values):
+    """{'a': 'b'} from ['a=b', ...]"""
+    pairs = {}
+    for value in values or ():
+        name, sep, rest = value.partition('=')
+        if not sep:
+            sys.exit(f"expected name=value, got {value!r}")
+        pairs[name] = rest
+    return pairs
+
+def result_filename(created, images):
+    """e.g. 20260101-120000_localai-v2.19.0_ollama-0.3.6.json"""
+    tags = '_'.join(f"{target}-{(image or 'unknown').split('@')[0].rsplit(':', 1)[-1]}"
+                    for target, image in sorted(images.items()))
+    return f"{created:%Y%m%d-%H%M%S}_{re.sub(r'[^A-Za-z0-9._-]', '', tags) or 'run'}.json"
+
+def load_baseline(value, output_dir, current, mock):
+    """(path, document) to compare with; 'latest' is the newest earlier run of the same kind"""
+    if value == 'latest':
+        paths = sorted(path for path in glob.glob(os.path.join(output_dir, '*.json')) if path != current)
+        for path in reversed(paths):
+            with open(path, 'r') as f:
+                baseline = json.load(f)
+            # Mock numbers say nothing about real hardware, and vice versa
+            if baseline.get('mock', False) == mock:
+                value = path
+                break
+        else:
+            print("No earlier results to compare with")
+            return None, None
+    else:
+        with open(value, 'r') as f:
+            baseline = json.load(f)
+    if baseline.get('schema_version') != SCHEMA_VERSION:
+        sys.exit(f"{value}: schema_version {baseline.get('schema_version')} is not {SCHEMA_VERSION}")
+    return value, baseline
+
+def compare(baseline, results, threshold):
+    """Print changes per (workload, concurrency); return the regressions"""
+    previous = {(result['workload'], result['concurrency']): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get((result['workload'], result['concurrency']))
+        if before is None:
+            continue
+        changes = []
+
+        def change(label, old, new, higher_is_better):
+            if not old or new is None:
+                return
+            delta = (new - old) / old
+            worse = -delta if higher_is_better else delta
+            flag = ' REGRESSION' if worse > threshold else ''
+            changes.append(f"{label} {old:g} -> {new:g} ({delta:+.0%}){flag}")
+            if flag:
+                regressions.append(f"{result['workload']} c={result['concurrency']}: {label}")
+
+        change('tokens/s', before['tokens_per_second'], result['tokens_per_second'], True)
+        for field in ('ttft_ms', 'latency_ms'):
+            if before[field] and result[field]:
+                change(f"{field[:-3]} p95 ms", before[field]['p95'], result[field]['p95'], False)
+        if result['error_rate'] > before['error_rate'] + 0.01:
+            changes.append(f"error rate {before['error_rate']:.1%} -> {result['error_rate']:.1%} REGRESSION")
+            regressions.append(f"{result['workload']} c={result['concurrency']}: error rate")
+        print(f"  {result['workload']} c={result['concurrency']}: " + '; '.join(changes))
+    return regressions
+
+def print_result(result):
+    ttft, latency = result['ttft_ms'] or {}, result['latency_ms'] or {}
+    print(f"{result['workload']:<20} c={result['concurrency']:<3} requests={result['requests']} "
+          f"errors={result['error_rate']:.1%} tokens/s={result['tokens_per_second']:.1f} "
+          f"per-request={result['request_tokens_per_second']['mean'] or 0:.1f}")
+    print(f"{'':<20} ttft ms p50/p95/p99={ttft.get('p50')}/{ttft.get('p95')}/{ttft.get('p99')} "
+          f"latency ms p50/p95/p99={latency.get('p50')}/{latency.get('p95')}/{latency.get('p99')}")
+    gpus = (result.get('gpu') or {}).get('gpus')
+    if gpus:
+        print(f"{'':<20} gpu util mean " + ' '.join(
+            f"{gpu['index']}={gpu['gpu_util']['mean'] if gpu['gpu_util'] else '-'}%" for gpu in gpus))
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for(port, path, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', path)
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.1)
+    return False
+
+def start_mocks(suite, processes):
+    """Mock backends for every target plus a fake gpu-server; returns (targets, gpu_url)"""
+    targets = {}
+    for target in suite['targets']:
+        workloads = [workload for workload in suite['workloads'] if workload['target'] == target]
+        kind = 'ollama' if any(workload['api'].startswith('ollama') for workload in workloads) else 'openai'
+        models = sorted({workload['model'] for workload in workloads}) or ['llama3']
+        port = free_port()
+        processes.append(subprocess.Popen([sys.executable, MOCK_SERVER, '--kind', kind, '--port', str(port),
+                                           '--models', ','.join(models)],
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        targets[target] = f"http://127.0.0.1:{port}"
+        if not wait_for(port, '/v1/models'):
+            sys.exit(f"mock {target} did not start")
+    gpu_port = free_port()
+    processes.append(subprocess.Popen([sys.executable, GPU_SERVER],
+                                      env=dict(os.environ, GPU_BACKEND='fake', FAKE_GPU_COUNT='2',
+                                               GPU_SERVER_PORT=str(gpu_port), GPU_SAMPLE_INTERVAL='0.5'),
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    if not wait_for(gpu_port, '/gpu-metrics'):
+        sys.exit("gpu-server.py did not start")
+    return targets, f"http://127.0.0.1:{gpu_port}/gpu-metrics"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--suite', default=DEFAULT_SUITE, help='workload suite JSON')
+    parser.add_argument('--workload', action='append', help='run only these workloads (repeatable)')
+    parser.add_argument('--target', action='append', metavar='NAME=URL', help='override a target URL')
+    parser.add_argument('--concurrency', help='override concurrency levels, e.g. 1,8,16')
+    parser.add_argument('--requests', type=int, help='override requests per concurrency level')
+    parser.add_argument('--warmup', type=int, default=1, help='unmeasured requests before each run')
+    parser.add_argument('--gpu-server', default=os.environ.get('GPU_SERVER_URL', 'http://localhost:9999/gpu-metrics'))
+    parser.add_argument('--tag', action='append', metavar='TARGET=TAG',
+                        help='image tag under test (default: docker inspect of the target container)')
+    parser.add_argument('--label', default='', help='free-form note stored with the results')
+    parser.add_argument('--output-dir', help=f"where results go (default {DEFAULT_OUTPUT}, mock runs in mock/)")
+    parser.add_argument('--baseline', help="result file to compare with, or 'latest'")
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change flagged as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit 1 if anything regressed')
+    parser.add_argument('--mock', action='store_true', help='run offline against mock backends')
+    args = parser.parse_args()
+
+    with open(args.suite, 'r') as f:
+        suite = json.load(f)
+    workloads = [workload for workload in suite['workloads']
+                 if not args.workload or workload['name'] in args.workload]
+    for workload in workloads:
+        if workload['api'] not in APIS:
+            sys.exit(f"{workload['name']}: unknown api {workload['api']!r} (one of {', '.join(APIS)})")
+        if args.concurrency:
+            workload['concurrency'] = [int(level) for level in args.concurrency.split(',')]
+        if args.requests:
+            workload['requests'] = args.requests
+    suite['workloads'] = workloads
+
+    processes = []
+    try:
+        if args.mock:
+            targets, gpu_url = start_mocks(suite, processes)
+            images = dict.fromkeys(targets, 'mock')
+        else:
+            targets = dict(suite['targets'], **parse_pairs(args.target))
+            gpu_url = args.gpu_server
+            images = {target: image_tag(target) for target in targets}
+        images.update(parse_pairs(args.tag))
+
+        results = []
+        for workload in workloads:
+            for concurrency in workload['concurrency']:
+                result = run_workload(targets[workload['target']], workload, concurrency,
+                                      workload['requests'], args.warmup)
+                result['image'] = images.get(workload['target'])
+                result['gpu'] = gpu_window(gpu_url, result['started'], result['ended'])
+                results.append(result)
+                print_result(result)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    created = datetime.now()
+    document = {
+        'schema_version': SCHEMA_VERSION,
+        'created': created.isoformat(),
+        'host': socket.gethostname(),
+        'label': args.label,
+        'mock': args.mock,
+        'images': images,
+        'targets': targets,
+        'suite': suite,
+        'results': results
+    }
+    output_dir = args.output_dir or (os.path.join(DEFAULT_OUTPUT, 'mock') if args.mock else DEFAULT_OUTPUT)
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, result_filename(created, images))
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"Results written to {path}")
+
+    if args.baseline:
+        baseline_path, baseline = load_baseline(args.baseline, output_dir, path, args.mock)
+        if baseline is not None:
+            print(f"Compared with {baseline_path} ({', '.join(f'{k}={v}' for k, v in baseline['images'].items())}):")
+            regressions = compare(baseline, results, args.threshold)
+            if regressions and args.fail_on_regression:
+                sys.exit(f"{len(regressions)} regression(s): " + ', '.join(regressions))
+
+if __name__ == '__main__':
+    main()
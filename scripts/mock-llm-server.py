@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+mock-llm-server.py - Stand-in LocalAI (OpenAI API) or Ollama server
+
+Generates filler tokens at a simulated GPU's speed so routing and
+benchmarks can run offline. The backend has a fixed aggregate token rate
+(--tps) shared by every request in flight, with no single request faster
+than --stream-tps, and the first token arrives after --ttft seconds. Both
+streaming (SSE for OpenAI, NDJSON for Ollama) and non-streaming responses
+are supported, and --fail-rate injects HTTP 500s.
+
+Usage:
+    python3 scripts/mock-llm-server.py --kind openai --port 8080 --models llama3,mistral
+    python3 scripts/mock-llm-server.py --kind ollama --port 11434 --tps 200 --ttft 0.1
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+WORDS = ('the', 'model', 'answers', 'with', 'a', 'token', 'stream', 'of', 'plain', 'words')
+
+class MockGPU:
+    """Shares an aggregate token rate between the requests in flight"""
+
+    def __init__(self, tps, stream_tps):
+        self.tps = tps
+        self.stream_tps = stream_tps
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with self._lock:
+            self.active += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self.active -= 1
+
+    def token_delay(self):
+        return max(1 / self.stream_tps, self.active / self.tps)
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        args = self.server.args
+        if self.path == '/v1/models':
+            self.send_json(200, {'object': 'list', 'data': [{'id': model, 'object': 'model'}
+                                                            for model in args.models]})
+        elif self.path == '/api/tags' and args.kind == 'ollama':
+            self.send_json(200, {'models': [{'name': model if ':' in model else f"{model}:latest"}
+                                            for model in args.models]})
+        elif self.path == '/':
+            self.send_json(200, {'status': 'ok'})
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        args = self.server.args
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        openai_paths = ('/v1/chat/completions', '/v1/completions')
+        ollama_paths = ('/api/generate', '/api/chat')
+        if self.path not in openai_paths and not (args.kind == 'ollama' and self.path in ollama_paths):
+            return self.send_json(404, {'error': 'not found'})
+        model = request.get('model')
+        if model and model.split(':')[0] not in {name.split(':')[0] for name in args.models}:
+            return self.send_json(404, {'error': f"model {model} not found"})
+        if random.random() < args.fail_rate:
+            return self.send_json(500, {'error': 'injected failure'})
+
+        if self.path in openai_paths:
+            tokens = int(request.get('max_tokens') or args.max_tokens)
+        else:
+            tokens = int(request.get('options', {}).get('num_predict') or args.max_tokens)
+        stream = request.get('stream', self.path in ollama_paths)
+        self.server.requests += 1
+        with self.server.gpu as gpu:
+            time.sleep(args.ttft)
+            if stream:
+                self.stream(gpu, tokens, model)
+            else:
+                for _ in range(tokens):
+                    time.sleep(gpu.token_delay())
+                self.send_json(200, self.final(model, ' '.join(random.choice(WORDS) for _ in range(tokens)),
+                                               tokens))
+
+    def final(self, model, text, tokens):
+        if self.path.startswith('/v1/'):
+            choice = ({'message': {'role': 'assistant', 'content': text}} if 'chat' in self.path
+                      else {'text': text})
+            return {'model': model, 'choices': [dict(choice, index=0, finish_reason='length')],
+                    'usage': {'prompt_tokens': 8, 'completion_tokens': tokens, 'total_tokens': tokens + 8}}
+        field = {'message': {'role': 'assistant', 'content': text}} if self.path == '/api/chat' \
+            else {'response': text}
+        return dict(field, model=model, done=True, eval_count=tokens)
+
+    def stream(self, gpu, tokens, model):
+        openai = self.path.startswith('/v1/')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream' if openai else 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for i in range(tokens):
+                if i:
+                    time.sleep(gpu.token_delay())
+                word = random.choice(WORDS) + ' '
+                if openai:
+                    delta = {'delta': {'content': word}} if 'chat' in self.path else {'text': word}
+                    line = 'data: ' + json.dumps({'model': model, 'choices': [dict(delta, index=0)]}) + '\n\n'
+                elif self.path == '/api/chat':
+                    line = json.dumps({'model': model, 'message': {'role': 'assistant', 'content': word},
+                                       'done': False}) + '\n'
+                else:
+                    line = json.dumps({'model': model, 'response': word, 'done': False}) + '\n'
+                self.write_chunk(line)
+            if openai:
+                self.write_chunk('data: ' + json.dumps({'model': model, 'choices': [],
+                                                        'usage': {'completion_tokens': tokens}}) + '\n\n')
+                self.write_chunk('data: [DONE]\n\n')
+            else:
+                self.write_chunk(json.dumps({'model': model, 'response': '', 'done': True,
+                                             'eval_count': tokens}) + '\n')
+            self.wfile.write(b'0\r\n\r\n')
+        except OSError:
+            self.close_connection = True
+
+    def write_chunk(self, text):
+        data = text.encode()
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--kind', choices=('openai', 'ollama'), default='openai')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--models', default='llama3', help='comma-separated model names')
+    parser.add_argument('--tps', type=float, default=120, help='aggregate tokens/second of the backend')
+    parser.add_argument('--stream-tps', type=float, default=40, help='fastest tokens/second of one request')
+    parser.add_argument('--ttft', type=float, default=0.15, help='seconds before the first token')
+    parser.add_argument('--max-tokens', type=int, default=64, help='tokens when the request sets no limit')
+    parser.add_argument('--fail-rate', type=float, default=0, help='fraction of requests answered with 500')
+    args = parser.parse_args()
+    args.models = [model.strip() for model in args.models.split(',') if model.strip()]
+
+    server = MockServer(('127.0.0.1', args.port), MockHandler)
+    server.args = args
+    server.gpu = MockGPU(args.tps, args.stream_tps)
+    server.requests = 0
+    print(f"Mock {args.kind} server on http://127.0.0.1:{args.port} serving {', '.join(args.models)}",
+          flush=True)
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
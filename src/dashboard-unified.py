@@ -3,24 +3,36 @@
 AI Box Dashboard - Grid layout with proper GPU display
 """
 
-from flask import Flask, jsonify, send_from_directory, Response
+from flask import Flask, g, jsonify, request, send_from_directory, Response
+from collections import deque
+from contextlib import contextmanager
+import copy
+import http.client
 import subprocess
+import socket
+import fcntl
+import gzip
+import hashlib
 import json
 import os
+import random
+import re
 import time
+import urllib.parse
+import uuid
 from datetime import datetime
 import threading
 
-app = Flask(__name__)
+try:
+    import brotli  # optional: smaller static assets for browsers that accept br
+except ImportError:
+    brotli = None
 
-# HTML content embedded in Python to avoid file dependencies
-DASHBOARD_HTML = """<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>AI Box Dashboard</title>
-    <style>
+app = Flask(__name__, static_folder=None)  # /static/ is served from StaticAssets
+
+# Page content embedded in Python to avoid file dependencies. The stylesheet
+# and script are served as separate content-hashed assets (see StaticAssets).
+DASHBOARD_CSS = """
         * { margin: 0; padding: 0; box-sizing: border-box; }
         
         body {
@@ -483,75 +495,26 @@ DASHBOARD_HTML = """<!DOCTYPE html>
             }
             h1 { font-size: 2rem; }
         }
-    </style>
-</head>
-<body>
-    <header>
-        <div class="header-content">
-            <div class="header-left">
-                <div>
-                    <h1>AI Box Dashboard</h1>
-                    <p class="subtitle">GPU-Accelerated AI Services Platform</p>
-                </div>
-                <div class="system-stats">
-                    <div class="stat-item">
-                        <div class="value" id="totalServices">-</div>
-                        <div class="label">Services</div>
-                    </div>
-                    <div class="stat-item">
-                        <div class="value" id="runningServices">-</div>
-                        <div class="label">Running</div>
-                    </div>
-                    <div class="stat-item">
-                        <div class="value" id="cpuUsage">-</div>
-                        <div class="label">CPU</div>
-                    </div>
-                    <div class="stat-item">
-                        <div class="value" id="memUsage">-</div>
-                        <div class="label">Memory</div>
-                    </div>
-                </div>
-            </div>
-            <div class="gpu-section" id="gpuSection">
-                <div class="loading">Loading GPU info...</div>
-            </div>
-        </div>
-    </header>
-    
-    <main>
-        <div class="services-grid" id="servicesGrid">
-            <div class="loading">Loading services...</div>
-        </div>
-    </main>
-    
-    <footer>
-        <p>AI Box Dashboard | <a href="/api/dashboard" target="_blank">Raw Metrics</a> | <a href="https://github.com/ben-spanswick/AI-Deployment-Automation" target="_blank">Documentation</a></p>
-    </footer>
-
-    <!-- Service Info Modal -->
-    <div id="serviceModal" class="modal">
-        <div class="modal-content">
-            <div class="modal-header">
-                <h2 class="modal-title" id="modalTitle">Service Information</h2>
-                <span class="close" onclick="closeModal()">&times;</span>
-            </div>
-            <div id="modalBody">
-                <!-- Service information will be loaded here -->
-            </div>
-        </div>
-    </div>
+"""
 
-    <script>
+DASHBOARD_JS = """
         const API = {
             system: '/api/system',
             services: '/api/services',
             gpu: '/api/gpu/metrics',
-            control: (service, action) => `/api/services/${service}/${action}`
+            stream: '/api/stream',
+            health: '/api/health/all',
+            control: (service, action) => `/api/services/${service}/${action}`,
+            job: (id) => `/api/jobs/${id}`
         };
 
         let services = [];
         let systemInfo = null;
         let gpuMetrics = null;
+        let health = {};
+        let streaming = false;
+        let pollTimer = null;
+        const STREAM_RETRY_MS = 30000;
 
         async function fetchSystemInfo() {
             try {
@@ -565,7 +528,7 @@ DASHBOARD_HTML = """<!DOCTYPE html>
         }
 
         function updateSystemInfo() {
-            if (!systemInfo) return;
+            if (!systemInfo || !systemInfo.cpu || !systemInfo.memory) return;
             
             document.getElementById('cpuUsage').textContent = `${systemInfo.cpu.usage.toFixed(1)}%`;
             document.getElementById('memUsage').textContent = `${systemInfo.memory.percent.toFixed(1)}%`;
@@ -689,6 +652,17 @@ DASHBOARD_HTML = """<!DOCTYPE html>
                     `;
                 }
                 
+                const probe = health[service.name.toLowerCase()];
+                if (probe && service.status === 'running') {
+                    const latency = probe.latency_ms !== null ? ` (${probe.latency_ms} ms)` : '';
+                    html += `
+                            <div class="service-detail">
+                                <span class="service-detail-label">Health:</span>
+                                <span>${probe.status}${latency}</span>
+                            </div>
+                    `;
+                }
+                
                 html += '</div>';
                 
                 if (service.stats && service.status === 'running') {
@@ -785,7 +759,13 @@ DASHBOARD_HTML = """<!DOCTYPE html>
                 });
                 
                 if (response.ok) {
-                    setTimeout(fetchServices, 1000);
+                    const data = await response.json();
+                    const job = await waitForJob(data.job.id);
+                    if (job.state === 'failed') {
+                        alert(`Failed to ${action} ${serviceName}: ${job.error}`);
+                    }
+                    // The stream pushes the new state on its own
+                    if (!streaming) fetchServices();
                 } else {
                     const error = await response.json();
                     alert(`Failed to ${action} ${serviceName}: ${error.error}`);
@@ -796,6 +776,24 @@ DASHBOARD_HTML = """<!DOCTYPE html>
             }
         }
 
+        const JOB_WAIT_MS = 10 * 60 * 1000;
+
+        async function waitForJob(id) {
+            // Stopping large model containers can take a while, but not forever
+            const deadline = Date.now() + JOB_WAIT_MS;
+            while (Date.now() < deadline) {
+                const response = await fetch(API.job(id));
+                if (!response.ok) {
+                    // Unknown or expired job: polling again will not bring it back
+                    return {state: 'failed', error: `job status unavailable (HTTP ${response.status})`};
+                }
+                const job = await response.json();
+                if (job.state === 'succeeded' || job.state === 'failed') return job;
+                await new Promise(resolve => setTimeout(resolve, 1000));
+            }
+            return {state: 'failed', error: 'timed out waiting for the job to finish'};
+        }
+
         async function fetchGPUMetrics() {
             try {
                 const response = await fetch(API.gpu);
@@ -807,16 +805,80 @@ DASHBOARD_HTML = """<!DOCTYPE html>
             }
         }
 
-        async function initialize() {
-            await fetchSystemInfo();
-            await fetchServices();
-            await fetchGPUMetrics();
-            
-            setInterval(async () => {
+        async function fetchHealth() {
+            try {
+                const response = await fetch(API.health);
+                const data = await response.json();
+                health = data.services;
+                updateServices();
+            } catch (error) {
+                console.error('Failed to fetch service health:', error);
+            }
+        }
+
+        function applyUpdate(data) {
+            // Stream events only carry the sections that changed
+            if (data.system) {
+                systemInfo = data.system;
+                updateSystemInfo();
+            }
+            if (data.gpu) {
+                gpuMetrics = data.gpu.gpus;
+            }
+            if (data.system || data.gpu) {
+                updateGPUSection();
+            }
+            if (data.services) {
+                services = data.services.data;
+                updateServices();
+                updateStats();
+            }
+        }
+
+        function connectStream() {
+            const source = new EventSource(API.stream);
+            streaming = true;
+            source.onopen = () => stopPolling();
+            source.onmessage = (event) => applyUpdate(JSON.parse(event.data));
+            source.onerror = (error) => {
+                if (source.readyState === EventSource.CLOSED) {
+                    // Refused (503 when the server's stream slots are full):
+                    // poll for a while, then try the stream again
+                    streaming = false;
+                    startPolling();
+                    setTimeout(connectStream, STREAM_RETRY_MS);
+                    return;
+                }
+                // EventSource reconnects by itself and gets a full snapshot again
+                console.error('Dashboard stream interrupted:', error);
+            };
+        }
+
+        function startPolling() {
+            if (pollTimer) return;
+            const poll = async () => {
                 await fetchSystemInfo();
                 await fetchServices();
                 await fetchGPUMetrics();
-            }, 5000);
+            };
+            pollTimer = setInterval(poll, 5000);
+            poll();
+        }
+
+        function stopPolling() {
+            clearInterval(pollTimer);
+            pollTimer = null;
+        }
+
+        function initialize() {
+            if (window.EventSource) {
+                connectStream();
+            } else {
+                startPolling();
+            }
+            // All probes in one request; results are cached server-side
+            fetchHealth();
+            setInterval(fetchHealth, 15000);
         }
 
         function showServiceInfo(serviceName) {
@@ -1020,298 +1082,1946 @@ curl -X POST http://localhost:9000/asr \\
         }
 
         initialize();
-    </script>
-</body>
-</html>"""
+"""
 
-# Cache for performance
-cache = {
-    'services': {'data': [], 'timestamp': 0},
-    'gpu': {'data': [], 'timestamp': 0}
-}
-CACHE_TTL = 2  # seconds
-GPU_CACHE_TTL = 5  # seconds - refresh GPU metrics every 5 seconds
+DASHBOARD_HTML = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>AI Box Dashboard</title>
+    <link rel="stylesheet" href="__DASHBOARD_CSS__">
+</head>
+<body>
+    <header>
+        <div class="header-content">
+            <div class="header-left">
+                <div>
+                    <h1>AI Box Dashboard</h1>
+                    <p class="subtitle">GPU-Accelerated AI Services Platform</p>
+                </div>
+                <div class="system-stats">
+                    <div class="stat-item">
+                        <div class="value" id="totalServices">-</div>
+                        <div class="label">Services</div>
+                    </div>
+                    <div class="stat-item">
+                        <div class="value" id="runningServices">-</div>
+                        <div class="label">Running</div>
+                    </div>
+                    <div class="stat-item">
+                        <div class="value" id="cpuUsage">-</div>
+                        <div class="label">CPU</div>
+                    </div>
+                    <div class="stat-item">
+                        <div class="value" id="memUsage">-</div>
+                        <div class="label">Memory</div>
+                    </div>
+                </div>
+            </div>
+            <div class="gpu-section" id="gpuSection">
+                <div class="loading">Loading GPU info...</div>
+            </div>
+        </div>
+    </header>
+    
+    <main>
+        <div class="services-grid" id="servicesGrid">
+            <div class="loading">Loading services...</div>
+        </div>
+    </main>
+    
+    <footer>
+        <p>AI Box Dashboard | <a href="/api/dashboard" target="_blank">Raw Metrics</a> | <a href="https://github.com/ben-spanswick/AI-Deployment-Automation" target="_blank">Documentation</a></p>
+    </footer>
 
-def run_cmd(cmd, timeout=5):
-    """Run shell command and return output - SECURE VERSION"""
-    try:
-        # Convert string commands to list for security
-        if isinstance(cmd, str):
-            # Parse common Docker commands safely
-            if cmd.startswith('docker ps'):
-                cmd_parts = cmd.split()
-            elif cmd.startswith('docker stats'):
-                cmd_parts = cmd.split()
-            elif cmd.startswith('top '):
-                cmd_parts = ['sh', '-c', cmd]  # Only allow specific shell commands
-            elif cmd.startswith('free '):
-                cmd_parts = ['sh', '-c', cmd]
-            elif cmd.startswith('hostname'):
-                cmd_parts = ['hostname']
-            elif cmd.startswith('nvidia-smi --query-gpu='):
-                cmd_parts = cmd.split()
-            elif cmd.startswith('nvidia-smi | grep'):
-                cmd_parts = ['sh', '-c', cmd]
-            elif cmd.startswith('/host-scripts/gpu-'):
-                cmd_parts = ['sh', '-c', cmd]
-            else:
-                # Log and reject unknown commands
-                print(f"Rejected unsafe command: {cmd}")
-                return ""
-        else:
-            cmd_parts = cmd
-            
-        result = subprocess.run(cmd_parts, capture_output=True, text=True, timeout=timeout)
-        output = result.stdout.strip()
-        # Clean up any Docker tty artifacts
-        output = output.replace(' < /dev/null', '')
-        return output
-    except Exception as e:
-        print(f"Error running command '{cmd}': {e}")
-        return ""
+    <!-- Service Info Modal -->
+    <div id="serviceModal" class="modal">
+        <div class="modal-content">
+            <div class="modal-header">
+                <h2 class="modal-title" id="modalTitle">Service Information</h2>
+                <span class="close" onclick="closeModal()">&times;</span>
+            </div>
+            <div id="modalBody">
+                <!-- Service information will be loaded here -->
+            </div>
+        </div>
+    </div>
 
-def get_docker_services():
-    """Get all Docker services on ai-network"""
-    now = time.time()
+    <script src="__DASHBOARD_JS__"></script>
+</body>
+</html>"""
+
+class LatencyHistogram:
+    """Log-linear latency histogram in the style of HdrHistogram.
     
-    # Check cache
-    if cache['services']['data'] and (now - cache['services']['timestamp']) < CACHE_TTL:
-        return cache['services']['data']
+    Each power of two between 1 microsecond and ~67 seconds is split into
+    32 linear sub-buckets, so percentiles are within ~3% of the true value
+    while recording stays O(1) with fixed memory.
+    """
     
-    services = []
+    SUB_BUCKETS = 32
+    MAX_EXPONENT = 26  # 2**26 us ~= 67 s
     
-    # Get all containers with detailed info
-    cmd = "docker ps -a --format '{{.ID}}|{{.Names}}|{{.Status}}|{{.Image}}|{{.Ports}}|{{.Networks}}'"
-    output = run_cmd(cmd)
+    def __init__(self):
+        self.counts = [0] * (self.SUB_BUCKETS * self.MAX_EXPONENT)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
     
-    # Services to exclude from dashboard
-    exclude_services = ['dashboard', 'dcgm-exporter', 'dashboard-backend', 'dcgm', 'gpu-server']
+    def _index(self, micros):
+        if micros < 1:
+            return 0
+        exponent = int(micros).bit_length() - 1
+        sub = int((micros / (1 << exponent) - 1) * self.SUB_BUCKETS)
+        return min(exponent * self.SUB_BUCKETS + sub, len(self.counts) - 1)
     
-    # Get all running container IDs first for bulk stats
-    running_containers = []
-    container_map = {}
+    def _upper_bound(self, index):
+        exponent, sub = divmod(index, self.SUB_BUCKETS)
+        return (1 << exponent) * (1 + (sub + 1) / self.SUB_BUCKETS) / 1e6
     
-    for line in output.split('\n'):
-        if not line or not '|' in line:
-            continue
-            
-        parts = line.split('|')
-        if len(parts) >= 6:
-            container_id = parts[0]
-            name = parts[1]
-            status_raw = parts[2]
-            image = parts[3]
-            ports_raw = parts[4]
-            networks = parts[5]
-            
-            # Skip excluded services
-            if name.lower() in exclude_services:
-                continue
-            
-            # Only include containers on ai-network
-            if 'ai-network' not in networks:
-                continue
-            
-            # Parse status
-            status = 'unknown'
-            if 'Up' in status_raw:
-                status = 'running'
-                running_containers.append(container_id)
-            elif 'Exited' in status_raw:
-                status = 'stopped'
-            elif 'Restarting' in status_raw:
-                status = 'restarting'
-            elif 'Created' in status_raw:
-                status = 'created'
-            
-            # Parse port from the ports string
-            port = None
-            if ports_raw and '->' in ports_raw:
-                # Extract host port from format like "0.0.0.0:8080->8080/tcp"
-                try:
-                    port_parts = ports_raw.split(',')[0].split('->')
-                    if len(port_parts) >= 2:
-                        host_part = port_parts[0].strip()
-                        if ':' in host_part:
-                            port = int(host_part.split(':')[-1])
-                except (ValueError, IndexError) as e:
-                    print(f"Error parsing port from {ports_raw}: {e}")
-                    pass
-            
-            # Get default port if not found
-            if not port:
-                port = get_default_port(name)
-            
-            # Categorize service
-            category = categorize_service(name)
-            
-            container_map[container_id] = {
-                'id': container_id,
-                'name': name,
-                'status': status,
-                'image': image,
-                'category': category,
-                'port': port,
-                'stats': None
-            }
+    def record(self, seconds):
+        index = self._index(seconds * 1e6)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
     
-    # Get stats for all running containers in one command
-    if running_containers:
-        try:
-            # Get all stats at once
-            stats_cmd = f"docker stats {' '.join(running_containers)} --no-stream --format '{{{{.Container}}}}|{{{{.CPUPerc}}}}|{{{{.MemPerc}}}}'"
-            stats_output = run_cmd(stats_cmd, timeout=15)
-            
-            for line in stats_output.split('\n'):
-                if '|' in line:
-                    parts = line.split('|')
-                    if len(parts) >= 3:
-                        container_id = parts[0][:12]  # Docker truncates to 12 chars
-                        cpu_str = parts[1].replace('%', '')
-                        mem_str = parts[2].replace('%', '')
-                        
-                        # Find matching container
-                        for cid, container in container_map.items():
-                            if cid.startswith(container_id):
-                                try:
-                                    container['stats'] = {
-                                        'cpu': float(cpu_str) if cpu_str else 0,
-                                        'memory': float(mem_str) if mem_str else 0
-                                    }
-                                except:
-                                    container['stats'] = {'cpu': 0, 'memory': 0}
-                                break
-        except Exception as e:
-            print(f"Error getting bulk stats: {e}")
-            # Fallback to individual stats for running containers
-            for container_id in running_containers:
-                if container_id in container_map:
-                    try:
-                        cpu_cmd = f"docker stats {container_id} --no-stream --format '{{{{.CPUPerc}}}}' | sed 's/%//'"
-                        mem_cmd = f"docker stats {container_id} --no-stream --format '{{{{.MemPerc}}}}' | sed 's/%//'"
-                        cpu = run_cmd(cpu_cmd, timeout=5)
-                        mem = run_cmd(mem_cmd, timeout=5)
-                        
-                        container_map[container_id]['stats'] = {
-                            'cpu': float(cpu) if cpu else 0,
-                            'memory': float(mem) if mem else 0
-                        }
-                    except:
-                        container_map[container_id]['stats'] = {'cpu': 0, 'memory': 0}
+    def percentile(self, pct):
+        """Latency in seconds at or below which `pct` percent of samples fall"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            target = max(1, int(round(pct / 100 * self.count)))
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= target:
+                    return min(self._upper_bound(index), self.max)
+            return self.max
     
-    # Convert to list
-    services = list(container_map.values())
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 3) if self.count else 0,
+            'p50_ms': round(self.percentile(50) * 1000, 3),
+            'p90_ms': round(self.percentile(90) * 1000, 3),
+            'p99_ms': round(self.percentile(99) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3)
+        }
+
+class PerfRegistry:
+    """Latency histograms keyed by (kind, name), e.g. ('route', '/api/dashboard')"""
     
-    # Cache the result
-    cache['services']['data'] = services
-    cache['services']['timestamp'] = now
+    def __init__(self):
+        self.histograms = {}
+        self._lock = threading.Lock()
     
-    return services
-
-def categorize_service(name):
-    """Categorize service by name"""
-    name_lower = name.lower()
-    
-    if name_lower in ['localai', 'ollama']:
-        return 'LLM Services'
-    elif name_lower in ['forge', 'comfyui', 'stable-diffusion']:
-        return 'Image Generation'
-    elif name_lower == 'n8n':
-        return 'Automation'
-    elif name_lower == 'chromadb':
-        return 'Database'
-    elif name_lower == 'whisper':
-        return 'Audio'
-    else:
-        return 'Other'
+    def observe(self, kind, name, seconds):
+        histogram = self.histograms.get((kind, name))
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault((kind, name), LatencyHistogram())
+        histogram.record(seconds)
+    
+    @contextmanager
+    def time(self, kind, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(kind, name, time.perf_counter() - started)
+    
+    def summary(self):
+        result = {}
+        for (kind, name), histogram in sorted(self.histograms.items()):
+            result.setdefault(kind, {})[name] = histogram.summary()
+        return result
 
-def get_default_port(service):
-    """Get default port for service"""
-    ports = {
-        'localai': 8080,
-        'ollama': 11434,
-        'forge': 7860,
-        'comfyui': 8188,
-        'n8n': 5678,
-        'chromadb': 8000,
-        'whisper': 9000
-    }
-    return ports.get(service.lower())
+perf = PerfRegistry()
 
-@app.route('/')
-def index():
-    """Serve the dashboard HTML"""
-    return DASHBOARD_HTML
+# Upstream HTTP pool (gpu-server, health probes)
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 1))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 5))
+HTTP_MAX_PER_HOST = int(os.environ.get('HTTP_MAX_PER_HOST', 8))
+BREAKER_THRESHOLD = int(os.environ.get('BREAKER_THRESHOLD', 3))  # consecutive failures
+BREAKER_COOLDOWN = float(os.environ.get('BREAKER_COOLDOWN', 30))
+BREAKER_MAX_COOLDOWN = float(os.environ.get('BREAKER_MAX_COOLDOWN', 300))
+GPU_SERVER_URL = os.environ.get('GPU_SERVER_URL', 'http://gpu-server:9999/gpu-metrics')
 
-@app.route('/chromadb-info')
-def chromadb_info():
-    """Serve the ChromaDB info page"""
-    try:
-        with open('/app/chromadb-info.html', 'r') as f:
-            return f.read()
-    except:
-        return "ChromaDB Info page not found", 404
+class UpstreamError(Exception):
+    """An upstream HTTP request failed, timed out or was refused by its breaker"""
 
-@app.route('/ollama-info')
-def ollama_info():
-    """Serve the Ollama info page"""
-    try:
-        with open('/app/ollama-info.html', 'r') as f:
-            return f.read()
-    except:
-        return "Ollama Info page not found", 404
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one upstream.
+    
+    closed: requests go through. After `threshold` failures in a row it
+    opens and requests fail immediately for the cooldown; then it is
+    half-open. With a `probe` callable the half-open check runs in a
+    background thread while callers keep being refused; without one the
+    next caller's request is the trial. A failed trial reopens the breaker
+    with the cooldown doubled, up to `max_cooldown`.
+    """
+    
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN,
+                 max_cooldown=BREAKER_MAX_COOLDOWN, probe=None, name='upstream'):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.probe = probe
+        self.name = name
+        self.current_cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.trips = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.time() - self.opened_at < self.current_cooldown:
+            return 'open'
+        return 'half_open'
+    
+    def allow(self):
+        """Whether a request may be sent now"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'open' or self.trial_running:
+                return False
+            self.trial_running = True
+            if self.probe is None:
+                return True
+        threading.Thread(target=self._run_probe, name=f"breaker-probe-{self.name}",
+                         daemon=True).start()
+        return False
+    
+    def _run_probe(self):
+        try:
+            self.probe()
+        except Exception as e:
+            print(f"{self.name} still failing: {e}")
+            self.failure()
+            return
+        print(f"{self.name} recovered")
+        self.success()
+    
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.current_cooldown = self.cooldown
+            self.trial_running = False
+    
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.opened_at is not None:
+                # Failed trial - back off further
+                self.current_cooldown = min(self.current_cooldown * 2, self.max_cooldown)
+                self.opened_at = time.time()
+            elif self.failures >= self.threshold:
+                self.trips += 1
+                self.opened_at = time.time()
+    
+    def stats(self):
+        return {'state': self.state, 'failures': self.failures, 'trips': self.trips,
+                'cooldown': self.current_cooldown}
 
-@app.route('/api/check-service/<service_name>')
-def check_service_status(service_name):
-    """Check if a specific service is accessible"""
+class HTTPPool:
+    """Thread-safe keep-alive HTTP/1.1 connections pooled per upstream host.
+    
+    Each host gets at most `max_per_host` requests in flight, separate
+    connect and read timeouts and its own circuit breaker, so a dead
+    upstream costs one short connect timeout per cooldown rather than a
+    full timeout on every request.
+    """
+    
+    def __init__(self, connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT,
+                 max_per_host=HTTP_MAX_PER_HOST, max_idle=4):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_per_host = max_per_host
+        self.max_idle = max_idle
+        self._hosts = {}
+        self._lock = threading.Lock()
+    
+    def _host(self, host, port):
+        with self._lock:
+            state = self._hosts.get((host, port))
+            if state is None:
+                state = {
+                    'idle': [],
+                    'slots': threading.BoundedSemaphore(self.max_per_host),
+                    'breaker': CircuitBreaker(name=f"{host}:{port}")
+                }
+                self._hosts[(host, port)] = state
+            return state
+    
+    def _connection(self, host, port, state):
+        with self._lock:
+            if state['idle']:
+                return state['idle'].pop(), True
+        return http.client.HTTPConnection(host, port, timeout=self.connect_timeout), False
+    
+    def _release(self, state, conn):
+        with self._lock:
+            if len(state['idle']) < self.max_idle:
+                state['idle'].append(conn)
+                return
+        conn.close()
+    
+    def breaker(self, url):
+        """The circuit breaker for the host in `url`"""
+        parts = urllib.parse.urlsplit(url)
+        return self._host(parts.hostname, parts.port or 80)['breaker']
+    
+    def request(self, method, url, headers=None, timeout=None, breaker=True):
+        """Send a request and return (status, headers, body).
+        
+        HTTP error statuses are returned, not raised. Connection failures,
+        timeouts, an open breaker or a full host raise UpstreamError. With
+        breaker=False the host's breaker is neither checked nor updated
+        (for callers that manage it themselves, e.g. FallbackChain).
+        """
+        parts = urllib.parse.urlsplit(url)
+        host, port = parts.hostname, parts.port or 80
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        state = self._host(host, port)
+        
+        if not state['slots'].acquire(timeout=self.connect_timeout):
+            raise UpstreamError(f"{parts.netloc}: too many requests in flight")
+        breaker = state['breaker'] if breaker else None
+        if breaker and not breaker.allow():
+            state['slots'].release()
+            raise UpstreamError(f"{parts.netloc}: circuit open")
+        try:
+            with perf.time('http', parts.netloc):
+                result = self._request(host, port, state, method, path, headers,
+                                       timeout or self.read_timeout)
+        except (http.client.HTTPException, OSError) as e:
+            if breaker:
+                breaker.failure()
+            raise UpstreamError(f"{method} {url} failed: {e or e.__class__.__name__}")
+        finally:
+            state['slots'].release()
+        if breaker:
+            breaker.success()
+        return result
+    
+    def _request(self, host, port, state, method, path, headers, timeout):
+        for attempt in range(2):
+            conn, reused = self._connection(host, port, state)
+            try:
+                if conn.sock is None:
+                    conn.timeout = self.connect_timeout
+                    conn.connect()
+                conn.sock.settimeout(timeout)
+                conn.request(method, path, headers=headers or {})
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                # The upstream may have closed an idle keep-alive connection
+                if reused and attempt == 0:
+                    continue
+                raise
+            
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(state, conn)
+            return response.status, response.headers, body
+    
+    def get_json(self, url, timeout=None, breaker=True):
+        """GET a JSON document; non-200 responses raise UpstreamError"""
+        status, _, body = self.request('GET', url, timeout=timeout, breaker=breaker)
+        if status != 200:
+            raise UpstreamError(f"GET {url}: HTTP {status}")
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            raise UpstreamError(f"GET {url}: invalid JSON: {e}")
+    
+    def stats(self):
+        """Breaker state and pool usage per upstream"""
+        with self._lock:
+            hosts = list(self._hosts.items())
+        return {
+            f"{host}:{port}": dict(state['breaker'].stats(), idle=len(state['idle']))
+            for (host, port), state in hosts
+        }
+
+http_pool = HTTPPool()
+
+class FallbackChain:
+    """Fetch data from the first working source in a list.
+    
+    Every source has a CircuitBreaker with a background probe, so while the
+    preferred source is down each fetch goes straight to the next one and
+    pays no timeout. If every source fails, the failure is cached for
+    `negative_ttl` seconds and fetches fail fast until it expires.
+    """
+    
+    def __init__(self, name, negative_ttl):
+        self.name = name
+        self.negative_ttl = negative_ttl
+        self.sources = []
+        self.source = None
+        self._failed_until = 0
+        self._failure = None
+    
+    def add(self, name, fetch, breaker=None):
+        """Append a source; `fetch()` returns data or raises"""
+        if breaker is None:
+            breaker = CircuitBreaker(name=name)
+        breaker.name = name
+        breaker.probe = fetch
+        self.sources.append((name, fetch, breaker))
+    
+    def fetch(self):
+        """Data from the first source that is allowed and succeeds"""
+        if time.time() < self._failed_until:
+            raise UpstreamError(f"{self.name}: {self._failure} (cached)")
+        
+        errors = []
+        for name, fetch, breaker in self.sources:
+            if not breaker.allow():
+                errors.append(f"{name}: circuit open")
+                continue
+            try:
+                data = fetch()
+            except Exception as e:
+                breaker.failure()
+                errors.append(f"{name}: {e}")
+                continue
+            breaker.success()
+            self.source = name
+            return data
+        
+        self._failure = '; '.join(errors)
+        self._failed_until = time.time() + self.negative_ttl
+        raise UpstreamError(f"{self.name}: {self._failure}")
+    
+    def stats(self):
+        return {
+            'source': self.source,
+            'failing_until': self._failed_until if time.time() < self._failed_until else None,
+            'sources': {name: breaker.stats() for name, _, breaker in self.sources}
+        }
+
+class RefreshCache:
+    """Single-flight cache with stale-while-revalidate semantics.
+    
+    Each key has a loader function. Only one refresh per key runs at a time:
+    concurrent readers get the stale value while a refresh is in flight, and
+    a failed refresh keeps serving the last good value.
+    """
+    
+    def __init__(self):
+        self._loaders = {}
+        self._entries = {}
+        self._locks = {}
+        self._ready = {}
+        # Called with (key, entry) after each change, and after refreshes
+        # that only renewed an entry's timestamp
+        self.listeners = []
+        self._source = None  # see follow()
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+        # Bumped whenever a refresh publishes data that differs from before
+        self.version = 0
+        self._changed = threading.Condition()
+    
+    def register(self, key, loader, max_age, default=None):
+        """Register a loader; values older than `max_age` seconds are revalidated"""
+        self._loaders[key] = (loader, max_age, default)
+        self._locks[key] = threading.Lock()
+        self._ready[key] = threading.Event()
+        self._stats[key] = {
+            'hits': 0, 'stale_hits': 0, 'misses': 0,
+            'refreshes': 0, 'errors': 0,
+            'refresh_seconds_total': 0.0, 'last_refresh_seconds': 0.0
+        }
+    
+    def _count(self, key, field, amount=1):
+        with self._stats_lock:
+            self._stats[key][field] += amount
+    
+    def get(self, key, wait=5):
+        """Return the cached value, refreshing it without blocking when stale"""
+        loader, max_age, default = self._loaders[key]
+        entry = self._entries.get(key)
+        
+        if entry is None:
+            # Nothing to serve yet - wait for (or run) the first load
+            self._count(key, 'misses')
+            self.refresh(key, wait=wait)
+            entry = self._entries.get(key)
+            return entry['data'] if entry else default
+        
+        if time.time() - entry['timestamp'] < max_age:
+            self._count(key, 'hits')
+        else:
+            self._count(key, 'stale_hits')
+            self.refresh_async(key)
+        return entry['data']
+    
+    def get_nowait(self, key):
+        """Return the cached entry (or None) without ever blocking.
+        
+        Missing or stale entries are revalidated in the background.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self._count(key, 'misses')
+            self.refresh_async(key)
+        elif time.time() - entry['timestamp'] < self._loaders[key][1]:
+            self._count(key, 'hits')
+        else:
+            self._count(key, 'stale_hits')
+            self.refresh_async(key)
+        return entry
+    
+    def wake(self):
+        """Wake every wait_for_change() caller (used at shutdown)"""
+        with self._changed:
+            self._changed.notify_all()
+    
+    def wait_ready(self, key, timeout):
+        """Wait up to `timeout` seconds for a first value; return the entry or None"""
+        self._ready[key].wait(timeout)
+        return self._entries.get(key)
+    
+    def is_stale(self, key, entry):
+        """Whether an entry is older than its key's max age"""
+        return time.time() - entry['timestamp'] >= self._loaders[key][1]
+    
+    def peek(self, key):
+        """Return the cached entry ({'data', 'timestamp', 'changed', 'version'}) without refreshing"""
+        return self._entries.get(key)
+    
+    def _publish(self, key, data):
+        """Store a new value, bumping the version only if it changed"""
+        previous = self._entries.get(key)
+        if previous is not None and previous['data'] == data:
+            # Same data - just mark it fresh
+            entry = self._entries[key] = dict(previous, timestamp=time.time())
+            for listener in self.listeners:
+                listener(key, entry)
+            return
+        with self._changed:
+            self.version += 1
+            now = time.time()
+            # Replace the whole entry so readers never see a partial update
+            self._entries[key] = {'data': data, 'timestamp': now, 'changed': now,
+                                  'version': self.version}
+            self._ready[key].set()
+            self._changed.notify_all()
+            entry = self._entries[key]
+        for listener in self.listeners:
+            listener(key, entry)
+    
+    def follow(self, source):
+        """Take entries from `source(key)` instead of running the loaders.
+        
+        Entries are installed exactly as the other process published them,
+        version and timestamps included, so every process agrees on
+        versions and staleness. follow(None) goes back to the loaders.
+        """
+        self._source = source
+    
+    def _install(self, key, entry):
+        """Install an entry read from the followed source"""
+        previous = self._entries.get(key)
+        if previous is not None and previous['version'] == entry['version']:
+            if previous['timestamp'] != entry['timestamp']:
+                self._entries[key] = entry
+            return
+        with self._changed:
+            self._entries[key] = entry
+            self.version = max(self.version, entry['version'])
+            self._ready[key].set()
+            self._changed.notify_all()
+    
+    def update(self, key, patch):
+        """Publish patch(current value) for a key that already has a value.
+        
+        Waits for an in-flight refresh first so the patch lands on top of it.
+        Does nothing while following another process, which publishes the
+        change itself.
+        """
+        if self._source is not None:
+            return
+        with self._locks[key]:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._publish(key, patch(entry['data']))
+    
+    def wait_for_change(self, after, timeout):
+        """Block until the version moves past `after` (or timeout); return it"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != after, timeout)
+            return self.version
+    
+    def refresh(self, key, wait=None):
+        """Run the loader for `key` unless a refresh is already in flight.
+        
+        If another thread is refreshing, wait up to `wait` seconds for it
+        (forever when None) instead of starting a second refresh.
+        """
+        lock = self._locks[key]
+        if not lock.acquire(blocking=False):
+            if lock.acquire(timeout=-1 if wait is None else wait):
+                lock.release()
+            return
+        
+        try:
+            source = self._source
+            if source is not None:
+                entry = source(key)
+                if entry is not None:
+                    self._install(key, entry)
+                return
+            
+            loader, _, default = self._loaders[key]
+            started = time.time()
+            try:
+                data = loader()
+            except Exception as e:
+                perf.observe('collector', key, time.time() - started)
+                self._count(key, 'errors')
+                print(f"Error refreshing {key}, keeping last good value: {e}")
+                if key not in self._entries:
+                    # No good value yet - publish the default so readers stop waiting
+                    self._publish(key, default)
+                return
+            elapsed = time.time() - started
+            perf.observe('collector', key, elapsed)
+            
+            self._publish(key, data)
+            with self._stats_lock:
+                stats = self._stats[key]
+                stats['refreshes'] += 1
+                stats['refresh_seconds_total'] += elapsed
+                stats['last_refresh_seconds'] = elapsed
+        finally:
+            lock.release()
+    
+    def refresh_async(self, key):
+        """Start a background refresh unless one is already running"""
+        if self._locks[key].locked():
+            return
+        threading.Thread(target=self.refresh, args=(key,),
+                         name=f"refresh-{key}", daemon=True).start()
+    
+    def stats(self):
+        """Return a copy of the per-key counters"""
+        with self._stats_lock:
+            result = {}
+            for key, stats in self._stats.items():
+                stats = dict(stats)
+                lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+                stats['hit_ratio'] = round(stats['hits'] / lookups, 3) if lookups else None
+                entry = self._entries.get(key)
+                stats['age_seconds'] = round(time.time() - entry['timestamp'], 3) if entry else None
+                result[key] = stats
+            return result
+
+# Latest value per data source, kept fresh by the background collector
+cache = RefreshCache()
+
+# Shared by all dashboard processes on the host (see LeaderElection)
+STATE_DIR = os.environ.get('DASHBOARD_STATE_DIR',
+                           '/dev/shm/aibox-dashboard' if os.path.isdir('/dev/shm') else '/tmp/aibox-dashboard')
+
+class SnapshotStore:
+    """JSON files that let worker processes share cache entries and jobs.
+    
+    Writes go to a temporary file and are renamed into place, so readers
+    never see a partial file. Reads are skipped while a file's mtime is
+    unchanged.
+    """
+    
+    def __init__(self, directory=STATE_DIR):
+        self.directory = directory
+        self._read_cache = {}
+    
+    def path(self, *parts):
+        return os.path.join(self.directory, *parts)
+    
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    
+    def _read(self, path):
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._read_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, 'r') as f:
+            data = json.load(f)
+        self._read_cache[path] = (mtime, data)
+        return data
+    
+    def write_entry(self, key, entry):
+        """Write a whole cache entry (data, version and timestamps)"""
+        self._write(self.path('cache', f"{key}.json"), entry)
+    
+    def read_entry(self, key):
+        """Latest entry the leader wrote for `key`, or None before the first write"""
+        try:
+            return self._read(self.path('cache', f"{key}.json"))
+        except (FileNotFoundError, ValueError):
+            return None
+    
+    def write_job(self, job):
+        self._write(self.path('jobs', f"{job['id']}.json"), job)
+    
+    def read_job(self, job_id):
+        try:
+            return self._read(self.path('jobs', f"{os.path.basename(job_id)}.json"))
+        except (FileNotFoundError, ValueError):
+            return None
+    
+    def delete_job(self, job_id):
+        try:
+            os.unlink(self.path('jobs', f"{job_id}.json"))
+        except FileNotFoundError:
+            pass
+    
+    @contextmanager
+    def lock(self, name, on_wait=None):
+        """Exclusive flock on a named lock file, across threads and processes"""
+        path = self.path('locks', f"{name}.lock")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if on_wait:
+                    on_wait()
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+state_store = SnapshotStore()
+CACHE_TTL = 2  # seconds
+GPU_CACHE_TTL = 5  # seconds - refresh GPU metrics every 5 seconds
+
+# Background refresh interval per data source (seconds)
+SERVICES_INTERVAL = float(os.environ.get('SERVICES_INTERVAL', CACHE_TTL))
+SYSTEM_INTERVAL = float(os.environ.get('SYSTEM_INTERVAL', 10))
+GPU_INTERVAL = float(os.environ.get('GPU_INTERVAL', GPU_CACHE_TTL))
+
+def run_cmd(cmd, timeout=5):
+    """Run shell command and return output - SECURE VERSION"""
     try:
-        if service_name.lower() == 'chromadb':
-            # Check ChromaDB by looking for the chroma-trace-id header
-            import urllib.request
-            import urllib.error
+        # Convert string commands to list for security
+        if isinstance(cmd, str):
+            # Parse allowed commands safely
+            if cmd.startswith('nvidia-smi --query-gpu='):
+                cmd_parts = cmd.split()
+            elif cmd.startswith('nvidia-smi | grep'):
+                cmd_parts = ['sh', '-c', cmd]
+            elif cmd.startswith('/host-scripts/gpu-'):
+                cmd_parts = ['sh', '-c', cmd]
+            else:
+                # Log and reject unknown commands
+                print(f"Rejected unsafe command: {cmd}")
+                return ""
+        else:
+            cmd_parts = cmd
+            
+        with perf.time('command', os.path.basename(cmd_parts[0]) if cmd_parts[0] != 'sh' else cmd.split()[0]):
+            result = subprocess.run(cmd_parts, capture_output=True, text=True, timeout=timeout)
+        output = result.stdout.strip()
+        # Clean up any Docker tty artifacts
+        output = output.replace(' < /dev/null', '')
+        return output
+    except Exception as e:
+        print(f"Error running command '{cmd}': {e}")
+        return ""
+
+DOCKER_SOCKET = os.environ.get('DOCKER_SOCKET', '/var/run/docker.sock')
+DOCKER_API_VERSION = 'v1.41'
+
+class DockerError(Exception):
+    """Docker Engine API request failed"""
+    
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a Unix domain socket"""
+    
+    def __init__(self, socket_path, timeout=10):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+    
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+class DockerClient:
+    """Minimal Docker Engine API client over the Docker Unix socket.
+    
+    Idle keep-alive connections are pooled, so regular polling reuses a
+    handful of sockets instead of forking the docker CLI on every call.
+    """
+    
+    def __init__(self, socket_path=DOCKER_SOCKET, timeout=10, max_idle=4):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+    
+    def _connection(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return UnixHTTPConnection(self.socket_path, timeout=self.timeout), False
+    
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+    
+    def request(self, method, path, params=None, timeout=None):
+        """Send an API request and return the decoded JSON body (or None)"""
+        url = f"/{DOCKER_API_VERSION}{path}"
+        if params:
+            url += '?' + urllib.parse.urlencode(params)
+        
+        with perf.time('docker', f"{method} {self.endpoint(path)}"):
+            return self._request(method, path, url, timeout)
+    
+    @staticmethod
+    def endpoint(path):
+        """Path with the container ID replaced, e.g. /containers/{id}/json"""
+        parts = path.split('/')
+        if len(parts) > 3 and parts[1] == 'containers':
+            parts[2] = '{id}'
+        return '/'.join(parts)
+    
+    def _request(self, method, path, url, timeout):
+        for attempt in range(2):
+            conn, reused = self._connection()
+            conn.timeout = timeout or self.timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(conn.timeout)
             try:
-                req = urllib.request.Request('http://chromadb:8000/', method='HEAD')
-                with urllib.request.urlopen(req, timeout=5) as response:
-                    if 'chroma-trace-id' in response.headers:
-                        return jsonify({'status': 'online'})
-                    else:
-                        return jsonify({'status': 'offline'})
-            except urllib.error.HTTPError as e:
-                # ChromaDB returns 404 but with chroma-trace-id header when running
-                if e.status == 404 and 'chroma-trace-id' in e.headers:
-                    return jsonify({'status': 'online'})
-                else:
-                    return jsonify({'status': 'offline'})
-        elif service_name.lower() == 'ollama':
-            # Check Ollama by calling the tags endpoint
-            import urllib.request
-            with urllib.request.urlopen('http://ollama:11434/api/tags', timeout=5) as response:
-                if response.status == 200:
-                    return jsonify({'status': 'online'})
+                conn.request(method, url, headers={'Host': 'docker'})
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                # A pooled keep-alive connection may have been closed by the daemon
+                if reused and attempt == 0:
+                    continue
+                raise DockerError(f"{method} {path} failed: {e}")
+            
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            
+            if response.status >= 400:
+                try:
+                    message = json.loads(body).get('message', '')
+                except ValueError:
+                    message = body.decode(errors='replace')
+                raise DockerError(f"{method} {path}: {response.status} {message}",
+                                  status=response.status)
+            return json.loads(body) if body else None
+    
+    def containers(self, all=True):
+        """List containers (GET /containers/json)"""
+        return self.request('GET', '/containers/json', {'all': 'true' if all else 'false'})
+    
+    def inspect(self, container):
+        """Inspect one container (GET /containers/{id}/json)"""
+        return self.request('GET', f"/containers/{urllib.parse.quote(container, safe='')}/json")
+    
+    def stats(self, container):
+        """Take one stats sample (GET /containers/{id}/stats?stream=false)"""
+        return self.request('GET', f"/containers/{urllib.parse.quote(container, safe='')}/stats",
+                            {'stream': 'false'})
+    
+    def stream(self, path, params=None, timeout=60, on_connect=None):
+        """Yield JSON objects from a streaming endpoint (one object per line).
+        
+        Streams use a dedicated connection that is never returned to the
+        pool. `on_connect` receives the connection so another thread can
+        close it to end the stream.
+        """
+        url = f"/{DOCKER_API_VERSION}{path}"
+        if params:
+            url += '?' + urllib.parse.urlencode(params)
+        
+        conn = UnixHTTPConnection(self.socket_path, timeout=timeout)
+        if on_connect:
+            on_connect(conn)
+        try:
+            try:
+                conn.request('GET', url, headers={'Host': 'docker'})
+                response = conn.getresponse()
+            except (http.client.HTTPException, OSError) as e:
+                raise DockerError(f"GET {path} failed: {e}")
+            if response.status >= 400:
+                raise DockerError(f"GET {path}: {response.status}", status=response.status)
+            
+            while True:
+                try:
+                    line = response.readline()
+                except (http.client.HTTPException, OSError, ValueError, AttributeError) as e:
+                    # AttributeError: the connection was closed from another thread
+                    raise DockerError(f"GET {path} stream interrupted: {e}")
+                if not line:
+                    return
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            conn.close()
+    
+    def action(self, container, action, stop_timeout=None):
+        """Run a lifecycle action: start, stop or restart"""
+        if action not in ('start', 'stop', 'restart'):
+            raise ValueError(f"Unsupported action: {action}")
+        params = {'t': stop_timeout} if stop_timeout is not None and action != 'start' else None
+        # Stopping waits up to stop_timeout before the daemon answers
+        timeout = self.timeout + (stop_timeout if stop_timeout is not None else 10)
+        self.request('POST', f"/containers/{urllib.parse.quote(container, safe='')}/{action}",
+                     params, timeout=timeout)
+
+docker = DockerClient()
+
+class ContainerInventory:
+    """Container list kept current by the Docker events stream.
+    
+    Does one full /containers/json when it connects (and again after any
+    reconnect), then re-reads only the container named by each create,
+    start, die, destroy (etc.) or network connect/disconnect event.
+    snapshot() returns None while the event stream is down, and callers
+    fall back to listing containers themselves.
+    """
+    
+    CONTAINER_EVENTS = ('create', 'start', 'die', 'destroy', 'stop', 'pause', 'unpause', 'rename')
+    NETWORK_EVENTS = ('connect', 'disconnect')
+    
+    def __init__(self, client, on_change=None):
+        self.client = client
+        self.on_change = on_change
+        self.events = 0
+        self._containers = {}
+        self._live = False
+        self._started = False
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """Start following the event stream (idempotent)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._watch, name='docker-events', daemon=True).start()
+    
+    def snapshot(self):
+        """All containers in /containers/json form, or None if not live"""
+        with self._lock:
+            return list(self._containers.values()) if self._live else None
+    
+    def _watch(self):
+        filters = json.dumps({
+            'type': ['container', 'network'],
+            'event': list(self.CONTAINER_EVENTS + self.NETWORK_EVENTS)
+        })
+        while True:
+            # Replay events from just before the listing so none fall in the gap
+            since = int(time.time()) - 1
+            try:
+                containers = self.client.containers(all=True)
+                with self._lock:
+                    self._containers = {container['Id']: container for container in containers}
+                    self._live = True
+                self._changed()
+                for event in self.client.stream('/events', {'since': since, 'filters': filters},
+                                                timeout=None):
+                    self._apply(event)
+            except DockerError as e:
+                print(f"Docker event stream ended, falling back to polling: {e}")
+            except Exception as e:
+                # A malformed event or listing must not end the watcher thread
+                print(f"Docker event watcher failed, falling back to polling: {e}")
+            with self._lock:
+                self._live = False
+            time.sleep(2)
+    
+    def _apply(self, event):
+        actor = event.get('Actor') or {}
+        if event.get('Type') == 'network':
+            container_id = (actor.get('Attributes') or {}).get('container')
+        else:
+            container_id = actor.get('ID') or event.get('id')
+        if not container_id:
+            return
+        self.events += 1
+        
+        if event.get('Action') == 'destroy':
+            with self._lock:
+                self._containers.pop(container_id, None)
+        else:
+            found = self.client.request('GET', '/containers/json', {
+                'all': 'true',
+                'filters': json.dumps({'id': [container_id]})
+            })
+            with self._lock:
+                if found:
+                    self._containers[found[0]['Id']] = found[0]
                 else:
-                    return jsonify({'status': 'offline'})
+                    self._containers.pop(container_id, None)
+        self._changed()
+    
+    def _changed(self):
+        if self.on_change:
+            self.on_change()
+    
+    def stats(self):
+        with self._lock:
+            return {'live': self._live, 'containers': len(self._containers), 'events': self.events}
+
+inventory = ContainerInventory(docker)
+
+def calculate_cpu_percent(stats):
+    """CPU% from a Docker stats sample, computed the same way as `docker stats`"""
+    cpu = stats.get('cpu_stats') or {}
+    precpu = stats.get('precpu_stats') or {}
+    cpu_delta = (cpu.get('cpu_usage', {}).get('total_usage', 0)
+                 - precpu.get('cpu_usage', {}).get('total_usage', 0))
+    system_delta = cpu.get('system_cpu_usage', 0) - precpu.get('system_cpu_usage', 0)
+    online_cpus = cpu.get('online_cpus') or len(cpu.get('cpu_usage', {}).get('percpu_usage') or []) or 1
+    
+    if cpu_delta > 0 and system_delta > 0:
+        return round(cpu_delta / system_delta * online_cpus * 100, 2)
+    return 0
+
+def calculate_memory_percent(stats):
+    """Memory% from a Docker stats sample, excluding page cache like `docker stats`"""
+    memory = stats.get('memory_stats') or {}
+    usage = memory.get('usage', 0)
+    limit = memory.get('limit', 0)
+    details = memory.get('stats') or {}
+    # cgroup v2 reports inactive_file, cgroup v1 total_inactive_file
+    usage -= details.get('inactive_file', details.get('total_inactive_file', 0))
+    
+    if limit > 0:
+        return round(max(usage, 0) / limit * 100, 2)
+    return 0
+
+def parse_container_status(state):
+    """Map Docker container state to dashboard status"""
+    if state in ('running', 'paused'):
+        return 'running'
+    elif state == 'exited':
+        return 'stopped'
+    elif state in ('restarting', 'created'):
+        return state
+    return 'unknown'
+
+def parse_host_port(ports):
+    """Return the first published host port from a container's port list"""
+    for binding in ports or []:
+        if binding.get('PublicPort'):
+            return binding['PublicPort']
+    return None
+
+STATS_WINDOW = int(os.environ.get('STATS_WINDOW', 5))  # samples averaged for CPU%
+
+class ContainerStatsStream:
+    """Rolling CPU/memory percent per running container.
+    
+    Keeps one long-lived `/containers/{id}/stats` stream per running
+    container and computes CPU deltas locally from the raw counters, so
+    service refreshes read current values instantly instead of waiting for
+    a `docker stats --no-stream` sample interval.
+    """
+    
+    def __init__(self, client, window=STATS_WINDOW):
+        self.client = client
+        self.window = window
+        self._streams = {}
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def sync(self, container_ids):
+        """Follow exactly the given containers, starting and stopping streams"""
+        wanted = set(container_ids)
+        with self._lock:
+            for container_id in list(self._streams):
+                if container_id not in wanted:
+                    self._stop(container_id)
+            for container_id in wanted:
+                if container_id not in self._streams:
+                    stream = {'stop': threading.Event(), 'conn': None}
+                    self._streams[container_id] = stream
+                    threading.Thread(target=self._follow, args=(container_id, stream),
+                                     name=f"stats-{container_id[:12]}", daemon=True).start()
+    
+    def _stop(self, container_id):
+        stream = self._streams.pop(container_id)
+        stream['stop'].set()
+        if stream['conn'] is not None:
+            stream['conn'].close()
+        self._values.pop(container_id, None)
+    
+    def get(self, container_id):
+        """Latest {'cpu', 'memory'} for a container, or None before the first delta"""
+        return self._values.get(container_id)
+    
+    def values(self):
+        """Latest stats for every followed container, keyed by container ID"""
+        return dict(self._values)
+    
+    def _follow(self, container_id, stream):
+        def on_connect(conn):
+            stream['conn'] = conn
+        
+        while not stream['stop'].is_set():
+            previous = None
+            cpu_window = deque(maxlen=self.window)
+            try:
+                for sample in self.client.stream(f"/containers/{container_id}/stats",
+                                                 {'stream': 'true'}, on_connect=on_connect):
+                    if stream['stop'].is_set():
+                        return
+                    cpu = sample.get('cpu_stats') or {}
+                    counters = (cpu.get('cpu_usage', {}).get('total_usage', 0),
+                                cpu.get('system_cpu_usage', 0))
+                    if previous is not None:
+                        # Compute the delta against our own previous sample
+                        cpu_window.append(calculate_cpu_percent({
+                            'cpu_stats': cpu,
+                            'precpu_stats': {'cpu_usage': {'total_usage': previous[0]},
+                                             'system_cpu_usage': previous[1]}
+                        }))
+                        values = {
+                            'cpu': round(sum(cpu_window) / len(cpu_window), 2),
+                            'memory': calculate_memory_percent(sample)
+                        }
+                        with self._lock:
+                            # _stop() may have dropped this container meanwhile
+                            if stream['stop'].is_set():
+                                return
+                            self._values[container_id] = values
+                    previous = counters
+            except DockerError as e:
+                if not stream['stop'].is_set():
+                    print(f"Stats stream for {container_id[:12]} ended: {e}")
+            # Back off before reconnecting (the container may be restarting)
+            stream['stop'].wait(2)
+
+stats_stream = ContainerStatsStream(docker)
+
+RESTART_COUNT_TTL = 30  # seconds before re-inspecting an unchanged container
+restart_counts = {}  # container id -> (state, checked_at, RestartCount)
+
+def get_restart_count(container_id, state):
+    """RestartCount from inspect, re-read when the state changes or the TTL expires"""
+    cached = restart_counts.get(container_id)
+    now = time.time()
+    if cached and cached[0] == state and now - cached[1] < RESTART_COUNT_TTL:
+        return cached[2]
+    try:
+        count = docker.inspect(container_id).get('RestartCount', 0)
+    except DockerError as e:
+        print(f"Error inspecting {container_id[:12]}: {e}")
+        return cached[2] if cached else 0
+    restart_counts[container_id] = (state, now, count)
+    return count
+
+SERVICE_REGISTRY_FILE = os.environ.get('SERVICE_REGISTRY_FILE', '/app/service-registry.json')
+
+class ServiceRegistry:
+    """Per-service dashboard metadata, loaded once at startup.
+    
+    Categories, default ports, hidden containers and the Docker network
+    to show come from SERVICE_REGISTRY_FILE (config/service-registry.json);
+    the built-in defaults below apply when it is missing.
+    """
+    
+    DEFAULTS = {
+        'network': 'ai-network',
+        'categories': {
+            'localai': 'LLM Services',
+            'ollama': 'LLM Services',
+            'forge': 'Image Generation',
+            'comfyui': 'Image Generation',
+            'stable-diffusion': 'Image Generation',
+            'n8n': 'Automation',
+            'chromadb': 'Database',
+            'whisper': 'Audio'
+        },
+        'ports': {
+            'localai': 8080,
+            'ollama': 11434,
+            'forge': 7860,
+            'comfyui': 8188,
+            'n8n': 5678,
+            'chromadb': 8000,
+            'whisper': 9000
+        },
+        'exclude': ['dashboard', 'dcgm-exporter', 'dashboard-backend', 'dcgm', 'gpu-server']
+    }
+    
+    def __init__(self, path=SERVICE_REGISTRY_FILE):
+        config = dict(self.DEFAULTS)
+        try:
+            with open(path, 'r') as f:
+                config.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Error reading {path}, using built-in service registry: {e}")
+        
+        self.network = config['network']
+        self.categories = {name.lower(): category for name, category in config['categories'].items()}
+        self.ports = {name.lower(): int(port) for name, port in config['ports'].items()}
+        self.exclude = frozenset(name.lower() for name in config['exclude'])
+    
+    def category(self, name):
+        return self.categories.get(name.lower(), 'Other')
+    
+    def port(self, name):
+        return self.ports.get(name.lower())
+    
+    def shows(self, name, networks):
+        """Whether a container belongs on the dashboard"""
+        return name.lower() not in self.exclude and self.network in networks
+
+registry = ServiceRegistry()
+
+class ServiceRecord:
+    """One container as shown on the dashboard.
+    
+    Category and default port are looked up once when the record is
+    created; refreshes only update the fields that can change.
+    """
+    
+    __slots__ = ('container_id', 'id', 'name', 'category', 'default_port',
+                 'status', 'image', 'port', 'restarts', 'stats')
+    
+    def __init__(self, container_id, name):
+        self.container_id = container_id
+        self.id = container_id[:12]
+        self.name = name
+        self.category = registry.category(name)
+        self.default_port = registry.port(name)
+        self.status = 'unknown'
+        self.image = ''
+        self.port = self.default_port
+        self.restarts = 0
+        self.stats = None
+    
+    def update(self, container):
+        """Refresh the mutable fields from a /containers/json entry"""
+        state = container.get('State')
+        self.status = parse_container_status(state)
+        self.image = container.get('Image', '')
+        # Get default port if none is published
+        self.port = parse_host_port(container.get('Ports')) or self.default_port
+        self.restarts = get_restart_count(self.container_id, state)
+        self.stats = None
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'image': self.image,
+            'category': self.category,
+            'port': self.port,
+            'restarts': self.restarts,
+            'stats': self.stats
+        }
+
+def container_name(container):
+    return (container.get('Names') or ['/'])[0].lstrip('/')
+
+def container_shown(container):
+    networks = (container.get('NetworkSettings') or {}).get('Networks') or {}
+    return registry.shows(container_name(container), networks)
+
+class ServiceIndex:
+    """Service records keyed by short container ID, kept across refreshes"""
+    
+    def __init__(self):
+        self._records = {}
+    
+    def sync(self, containers):
+        """Update records from a full container list; return them in list order"""
+        records = {}
+        for container in containers:
+            if not container_shown(container):
+                continue
+            short_id = container['Id'][:12]
+            record = self._records.get(short_id)
+            if record is None or record.name != container_name(container):
+                record = ServiceRecord(container['Id'], container_name(container))
+            record.update(container)
+            records[short_id] = record
+        self._records = records
+        return list(records.values())
+    
+    def get(self, short_id):
+        return self._records.get(short_id)
+
+service_index = ServiceIndex()
+
+def service_record(container):
+    """Dashboard record (dict) for a /containers/json entry, or None if it is not shown"""
+    if not container_shown(container):
+        return None
+    record = ServiceRecord(container['Id'], container_name(container))
+    record.update(container)
+    return record.to_dict()
+
+def collect_docker_services():
+    """Collect all Docker services on ai-network"""
+    containers = inventory.snapshot()
+    if containers is None:
+        containers = docker.containers(all=True)
+    
+    records = service_index.sync(containers)
+    
+    # Join rolling stats from the per-container streams on short ID
+    stats_stream.sync(record.container_id for record in records if record.status == 'running')
+    for container_id, stats in stats_stream.values().items():
+        record = service_index.get(container_id[:12])
+        if record is not None:
+            record.stats = stats
+    
+    shown = {record.container_id for record in records}
+    for container_id in list(restart_counts):
+        if container_id not in shown:
+            del restart_counts[container_id]
+    
+    return [record.to_dict() for record in records]
+
+def refresh_service(name):
+    """Re-read one container and patch its record into the services cache.
+    
+    Used after lifecycle actions instead of a full Docker poll.
+    """
+    filters = json.dumps({'name': [f"^/{name}$"]})
+    containers = docker.request('GET', '/containers/json', {'all': 'true', 'filters': filters})
+    record = service_record(containers[0]) if containers else None
+    if record and record['status'] == 'running':
+        # Stats for a just-started container appear after the next full poll
+        record['stats'] = stats_stream.get(containers[0]['Id'])
+    
+    def patch(services):
+        # Keep the container's position in the list
+        updated = []
+        for service in services:
+            if service['name'] != name:
+                updated.append(service)
+            elif record:
+                updated.append(record)
+        if record and not any(service['name'] == name for service in services):
+            updated.append(record)
+        return updated
+    
+    cache.update('services', patch)
+
+def get_docker_services():
+    """Get the latest Docker services snapshot"""
+    return cache.get('services')
+
+def categorize_service(name):
+    """Categorize service by name"""
+    return registry.category(name)
+
+def get_default_port(service):
+    """Get default port for service"""
+    return registry.port(service)
+
+JSON_COMPRESS_MIN_BYTES = int(os.environ.get('JSON_COMPRESS_MIN_BYTES', 1024))
+ASSET_MAX_AGE = 365 * 24 * 3600  # hashed asset URLs never change content
+
+def accepted_encodings():
+    return {part.split(';')[0].strip() for part in request.headers.get('Accept-Encoding', '').split(',')}
+
+class StaticAssets:
+    """Page resources prepared once at startup.
+    
+    Each asset is stored with gzip (and brotli, when the module is
+    installed) variants and a content-hash ETag, so a request only picks a
+    variant. Assets added with hashed=True are served under a URL that
+    contains the hash and cached by browsers for a year; the others (the
+    HTML pages) are revalidated with their ETag.
+    """
+    
+    def __init__(self):
+        self._assets = {}
+    
+    def add(self, path, body, mimetype, hashed=False):
+        """Register an asset and return the URL it is served at"""
+        data = body.encode() if isinstance(body, str) else body
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        if hashed:
+            stem, ext = os.path.splitext(path)
+            path = f"{stem}.{digest}{ext}"
+        variants = {'identity': data, 'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(data, quality=11)
+        self._assets[path] = {
+            'variants': variants,
+            'etag': digest,
+            'mimetype': mimetype,
+            'cache_control': f"public, max-age={ASSET_MAX_AGE}, immutable" if hashed else 'no-cache'
+        }
+        return path
+    
+    def response(self, path):
+        asset = self._assets.get(path)
+        if asset is None:
+            return None
+        if request.if_none_match.contains(asset['etag']):
+            response = Response(status=304)
         else:
-            return jsonify({'status': 'unknown'})
-    except Exception as e:
-        print(f"Error checking {service_name} status: {e}")
-        return jsonify({'status': 'offline'})
+            accepted = accepted_encodings()
+            encoding = next((name for name in ('br', 'gzip') if name in asset['variants'] and name in accepted),
+                            'identity')
+            response = Response(asset['variants'][encoding], mimetype=asset['mimetype'])
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(asset['etag'])
+        response.headers['Cache-Control'] = asset['cache_control']
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+def read_page(path):
+    """Read an info page once at startup; None if it is not installed"""
+    try:
+        with open(path, 'r') as f:
+            return f.read()
+    except OSError:
+        return None
+
+assets = StaticAssets()
+css_url = assets.add('/static/dashboard.css', DASHBOARD_CSS, 'text/css', hashed=True)
+js_url = assets.add('/static/dashboard.js', DASHBOARD_JS, 'application/javascript', hashed=True)
+assets.add('/', DASHBOARD_HTML.replace('__DASHBOARD_CSS__', css_url).replace('__DASHBOARD_JS__', js_url),
+           'text/html')
+INFO_PAGES = {
+    '/chromadb-info': ('ChromaDB', read_page('/app/chromadb-info.html')),
+    '/ollama-info': ('Ollama', read_page('/app/ollama-info.html'))
+}
+for page_path, (_, page) in INFO_PAGES.items():
+    if page is not None:
+        assets.add(page_path, page, 'text/html')
+
+@app.route('/')
+def index():
+    """Serve the dashboard HTML"""
+    return assets.response('/')
+
+@app.route('/static/<path:filename>')
+def static_asset(filename):
+    """Serve a content-hashed page asset"""
+    return assets.response(f"/static/{filename}") or ("Not found", 404)
+
+@app.route('/chromadb-info')
+def chromadb_info():
+    """Serve the ChromaDB info page"""
+    return assets.response('/chromadb-info') or ("ChromaDB Info page not found", 404)
+
+@app.route('/ollama-info')
+def ollama_info():
+    """Serve the Ollama info page"""
+    return assets.response('/ollama-info') or ("Ollama Info page not found", 404)
+
+class JSONCompressor:
+    """gzip for JSON API responses above JSON_COMPRESS_MIN_BYTES.
+    
+    Bodies that carry an ETag (the dashboard snapshot) are compressed once
+    per URL, query string included, and ETag and reused for every client:
+    a `?since=` delta shares the snapshot's ETag but not its body.
+    """
+    
+    def __init__(self, min_bytes=JSON_COMPRESS_MIN_BYTES, memo_size=16):
+        self.min_bytes = min_bytes
+        self.memo_size = memo_size
+        self._memo = {}
+        self._lock = threading.Lock()
+    
+    def __call__(self, response):
+        if (response.mimetype != 'application/json' or response.is_streamed
+                or response.status_code != 200 or 'Content-Encoding' in response.headers
+                or 'gzip' not in accepted_encodings()):
+            return response
+        body = response.get_data()
+        if len(body) < self.min_bytes:
+            return response
+        
+        etag = response.get_etag()[0]
+        key = (request.full_path, etag, 'gzip') if etag else None
+        with self._lock:
+            compressed = self._memo.get(key) if key else None
+        if compressed is None:
+            compressed = gzip.compress(body, compresslevel=5, mtime=0)
+            if key:
+                with self._lock:
+                    if len(self._memo) >= self.memo_size:
+                        self._memo.pop(next(iter(self._memo)))
+                    self._memo[key] = compressed
+        
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        return response
+
+app.after_request(JSONCompressor())
+
+# Health probes for the services in deployed-services.json. Paths and ports
+# come from the healthcheck URLs in docker-compose.yml where it has one;
+# SERVICE_PROBES covers the rest. A probe with a `header` is online when the
+# header is present whatever the status (ChromaDB answers / with a 404).
+DEPLOYED_SERVICES_FILE = os.environ.get('DEPLOYED_SERVICES_FILE', '/app/deployed-services.json')
+COMPOSE_FILE = os.environ.get('COMPOSE_FILE', '/app/docker-compose.yml')
+PROBE_INTERVAL = float(os.environ.get('PROBE_INTERVAL', 15))
+PROBE_JITTER = float(os.environ.get('PROBE_JITTER', 0.2))  # +/- fraction of the interval
+PROBE_TIMEOUT = float(os.environ.get('PROBE_TIMEOUT', 3))
+
+SERVICE_PROBES = {
+    'localai': {'path': '/v1/models'},
+    'ollama': {'path': '/'},
+    'forge': {'path': '/'},
+    'comfyui': {'path': '/system_stats'},
+    'n8n': {'path': '/healthz'},
+    'whisper': {'path': '/docs'},
+    'chromadb': {'method': 'HEAD', 'path': '/', 'header': 'chroma-trace-id'}
+}
+
+def load_compose_healthchecks(path):
+    """Healthcheck URL per service from a docker-compose file.
+    
+    Only needs the `test:` lines, so this scans the file instead of
+    pulling in a YAML parser.
+    """
+    checks = {}
+    service = None
+    in_services = False
+    with open(path, 'r') as f:
+        for line in f:
+            stripped = line.strip()
+            if not stripped or stripped.startswith('#'):
+                continue
+            indent = len(line) - len(line.lstrip())
+            if indent == 0:
+                in_services = stripped == 'services:'
+                service = None
+            elif in_services and indent == 2 and stripped.endswith(':'):
+                service = stripped[:-1]
+            elif service and stripped.startswith('test:'):
+                match = re.search(r'https?://[^\s"\',\]]+', stripped)
+                if match:
+                    checks[service] = match.group(0)
+    return checks
+
+def load_probe_definitions():
+    """Probe definitions for every deployed service that can be probed"""
+    try:
+        with open(DEPLOYED_SERVICES_FILE, 'r') as f:
+            deployed = json.load(f)['services']
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Could not read {DEPLOYED_SERVICES_FILE}, probing all known services: {e}")
+        deployed = list(SERVICE_PROBES)
+    try:
+        healthchecks = load_compose_healthchecks(COMPOSE_FILE)
+    except OSError:
+        healthchecks = {}
+    
+    probes = {}
+    for name in deployed:
+        name = name.lower()
+        probe = dict(SERVICE_PROBES.get(name, {}))
+        if name in healthchecks:
+            # The healthcheck runs inside the container, so keep its port and
+            # path but reach it by container name over ai-network
+            url = urllib.parse.urlsplit(healthchecks[name])
+            probe['port'] = url.port or 80
+            probe['path'] = url.path or '/'
+        probe.setdefault('port', get_default_port(name))
+        if 'path' not in probe or not probe['port']:
+            continue
+        probe.setdefault('method', 'GET')
+        probe['url'] = f"http://{name}:{probe['port']}{probe['path']}"
+        probes[name] = probe
+    return probes
+
+def probe_service(name):
+    """Run one health probe and return its result"""
+    probe = service_probes[name]
+    result = {'status': 'offline', 'code': None, 'latency_ms': None, 'error': None}
+    started = time.time()
+    try:
+        status, headers, _ = http_pool.request(probe['method'], probe['url'], timeout=PROBE_TIMEOUT)
+    except UpstreamError as e:
+        result['error'] = str(e)
+        return result
+    
+    result['code'] = status
+    result['latency_ms'] = round((time.time() - started) * 1000, 1)
+    if 'header' in probe:
+        online = probe['header'] in headers
+    else:
+        online = status < 400
+    result['status'] = 'online' if online else 'offline'
+    return result
+
+def health_key(name):
+    return f"health:{name}"
+
+def fetch_health(names):
+    """Cached probe results for `names`, running missing probes concurrently"""
+    keys = [health_key(name) for name in names]
+    entries = fetch_sections(keys, deadlines=dict.fromkeys(keys, PROBE_TIMEOUT))
+    results = {}
+    for name in names:
+        entry = entries[health_key(name)]
+        result = dict(entry['data']) if entry else {'status': 'unknown'}
+        result['state'] = section_state(health_key(name), entry)
+        result['checked'] = datetime.fromtimestamp(entry['timestamp']).isoformat() if entry else None
+        results[name] = result
+    return results
+
+@app.route('/api/check-service/<service_name>')
+def check_service_status(service_name):
+    """Check if a specific service is accessible"""
+    name = service_name.lower()
+    if name not in service_probes:
+        return jsonify({'status': 'unknown'})
+    return jsonify(fetch_health([name])[name])
+
+@app.route('/api/health/all')
+def api_health_all():
+    """Health probe results for every deployed service in one call"""
+    return jsonify({
+        'services': fetch_health(list(service_probes)),
+        'timestamp': datetime.now().isoformat()
+    })
+
+DASHBOARD_SECTIONS = ('services', 'system', 'gpu')
+
+# How long /api/dashboard waits for a section that has no data yet (seconds)
+SECTION_DEADLINES = {
+    'services': float(os.environ.get('SERVICES_DEADLINE', 3)),
+    'system': float(os.environ.get('SYSTEM_DEADLINE', 2)),
+    'gpu': float(os.environ.get('GPU_DEADLINE', 2))
+}
+
+def fetch_sections(keys=DASHBOARD_SECTIONS, deadlines=SECTION_DEADLINES):
+    """Cache entries for several sections, loading missing ones concurrently.
+    
+    Stale entries are returned immediately and revalidated in the
+    background. Missing entries are loaded in parallel and each is waited
+    for until its own deadline; a section that misses it comes back None.
+    """
+    started = time.time()
+    # get_nowait() starts all missing/stale refreshes before we wait on any
+    entries = {key: cache.get_nowait(key) for key in keys}
+    for key in keys:
+        if entries[key] is None:
+            remaining = deadlines[key] - (time.time() - started)
+            entries[key] = cache.wait_ready(key, max(0, remaining))
+    return entries
+
+def section_state(key, entry):
+    """'fresh', 'stale' (older than its max age) or 'missing' (deadline missed)"""
+    if entry is None:
+        return 'missing'
+    return 'stale' if cache.is_stale(key, entry) else 'fresh'
+
+def section_payload(key, entry):
+    """Build one /api/dashboard section from a cache entry.
+    
+    A missing system section is None and left out of the payload; its
+    state is still reported under 'sections'.
+    """
+    if key == 'services':
+        services = entry['data'] if entry else []
+        return {'data': services, 'count': len(services)}
+    elif key == 'gpu':
+        return {'gpus': entry['data'] if entry else []}
+    return entry['data'] if entry else None
+
+def section_meta(entries):
+    """Per-section state, version and last-change time"""
+    return {
+        key: {
+            'state': section_state(key, entry),
+            'version': entry['version'] if entry else None,
+            'changed': datetime.fromtimestamp(entry['changed']).isoformat() if entry else None
+        }
+        for key, entry in entries.items()
+    }
+
+DELTA_HISTORY = int(os.environ.get('DASHBOARD_DELTA_HISTORY', 1000))  # versions a `?since=` delta may span
+
+class DashboardVersions:
+    """Versioned dashboard snapshots for ETags and `?since=` deltas.
+    
+    Records the cache version at which each service and each GPU field last
+    changed, so a client that already has version N can be sent only what
+    changed after N. Removals are remembered for the last `history`
+    versions; older clients get a full snapshot. The full response body is
+    serialized once per version and reused for every poll until something
+    changes.
+    """
+    
+    # Section -> field identifying an item in that section's list
+    ITEM_KEYS = {'services': 'name', 'gpu': 'index'}
+    
+    def __init__(self, cache, history=DELTA_HISTORY):
+        self.cache = cache
+        self.history = history
+        self._items = {key: {} for key in self.ITEM_KEYS}
+        self._removed = {key: {} for key in self.ITEM_KEYS}
+        self._seen = {}
+        self._body = (None, None)
+        self.base_version = None
+        self._lock = threading.Lock()
+    
+    def entries(self):
+        """Current cache entries for every section (see fetch_sections)"""
+        entries = fetch_sections()
+        with self._lock:
+            if self.base_version is None:
+                # Changes before this point were never tracked
+                self.base_version = self.version(entries)
+            for key in self.ITEM_KEYS:
+                self._track(key, entries[key])
+        return entries
+    
+    @staticmethod
+    def etag(entries):
+        # Section states are part of the body, so they are part of the tag
+        return '.'.join(f"{entry['version'] if entry else 0}{section_state(key, entry)[0]}"
+                        for key, entry in entries.items())
+    
+    @staticmethod
+    def version(entries):
+        return max((entry['version'] for entry in entries.values() if entry), default=0)
+    
+    @staticmethod
+    def timestamp(entries):
+        changed = max((entry['changed'] for entry in entries.values() if entry), default=time.time())
+        return datetime.fromtimestamp(changed).isoformat()
+    
+    def full_body(self, entries):
+        """Serialized full snapshot, cached until the ETag changes"""
+        etag = self.etag(entries)
+        cached_etag, body = self._body
+        if cached_etag == etag:
+            return body
+        
+        data = {}
+        for key, entry in entries.items():
+            payload = section_payload(key, entry)
+            if payload is not None:
+                data[key] = payload
+        data['sections'] = section_meta(entries)
+        data['version'] = self.version(entries)
+        data['timestamp'] = self.timestamp(entries)
+        body = json.dumps(data)
+        self._body = (etag, body)
+        return body
+    
+    def _track(self, key, entry):
+        """Record per-field change versions for a list section"""
+        if entry is None or self._seen.get(key) == entry['version']:
+            return
+        version = entry['version']
+        
+        id_field = self.ITEM_KEYS[key]
+        items = self._items[key]
+        current = {record[id_field]: record for record in entry['data']}
+        for ident, record in current.items():
+            previous = items.get(ident)
+            if previous is None:
+                fields = {field: version for field in record}
+            else:
+                fields = dict(previous['fields'])
+                for field, value in record.items():
+                    if previous['record'].get(field) != value:
+                        fields[field] = version
+            items[ident] = {'record': record, 'fields': fields}
+            self._removed[key].pop(ident, None)
+        for ident in list(items):
+            if ident not in current:
+                del items[ident]
+                self._removed[key][ident] = version
+        self._seen[key] = version
+        self._prune(version)
+    
+    def _prune(self, version):
+        """Forget removals older than the history; deltas from before it become full snapshots"""
+        floor = version - self.history
+        if floor <= self.base_version:
+            return
+        self.base_version = floor
+        for removed in self._removed.values():
+            for ident in [ident for ident, at in removed.items() if at <= floor]:
+                del removed[ident]
+    
+    def delta(self, entries, since):
+        """Only what changed after version `since`, or None if a full snapshot is needed"""
+        with self._lock:
+            current = self.version(entries)
+            if since < self.base_version or since > current:
+                return None
+            
+            result = {
+                'version': current,
+                'since': since,
+                'timestamp': self.timestamp(entries),
+                'sections': section_meta(entries)
+            }
+            
+            services = self._items['services']
+            result['services'] = {
+                'changed': [item['record'] for item in services.values()
+                            if max(item['fields'].values()) > since],
+                'removed': [name for name, version in self._removed['services'].items()
+                            if version > since],
+                'count': len(services)
+            }
+            
+            if entries['system'] and entries['system']['version'] > since:
+                result['system'] = entries['system']['data']
+            
+            gpus = []
+            for index, item in self._items['gpu'].items():
+                fields = {field: item['record'][field] for field, version in item['fields'].items()
+                          if version > since}
+                if fields:
+                    fields['index'] = index
+                    gpus.append(fields)
+            result['gpu'] = {
+                'changed': gpus,
+                'removed': [index for index, version in self._removed['gpu'].items()
+                            if version > since]
+            }
+            return result
+
+dashboard_versions = DashboardVersions(cache)
 
 @app.route('/api/dashboard')
 def api_dashboard():
-    """Get all dashboard data in one call - OPTIMIZED"""
-    services = get_docker_services()
-    system_info = api_system().get_json()
-    gpu_metrics = api_gpu_metrics().get_json()
+    """Get all dashboard data in one call - OPTIMIZED
     
-    return jsonify({
-        'services': {
-            'data': services,
-            'count': len(services)
-        },
-        'system': system_info,
-        'gpu': gpu_metrics,
-        'timestamp': datetime.now().isoformat()
-    })
+    Supports conditional GET (ETag / If-None-Match -> 304) and
+    `?since=<version>` to receive only what changed after that version.
+    """
+    entries = dashboard_versions.entries()
+    etag = dashboard_versions.etag(entries)
+    
+    since = request.args.get('since', type=int)
+    if since is not None and since != dashboard_versions.version(entries):
+        delta = dashboard_versions.delta(entries, since)
+        if delta is not None:
+            response = jsonify(delta)
+        else:
+            # Unknown or expired version - send a full snapshot
+            response = Response(dashboard_versions.full_body(entries), mimetype='application/json')
+    elif since is not None or request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(dashboard_versions.full_body(entries), mimetype='application/json')
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+STREAM_HEARTBEAT = 15  # seconds between keep-alive comments on idle streams
+# Every open stream holds one of the worker's DASHBOARD_THREADS threads, so
+# streams get at most MAX_STREAMS of them and the rest stay free for requests
+WORKER_THREADS = int(os.environ.get('DASHBOARD_THREADS', 32))
+MAX_STREAMS = int(os.environ.get('DASHBOARD_MAX_STREAMS', max(1, WORKER_THREADS // 2)))
+STREAM_RETRY_AFTER = 30  # seconds a client turned away should wait
+
+stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+def stream_response(body, mimetype):
+    """Streaming response holding a stream slot until it closes, or 503 when none is free"""
+    if not stream_slots.acquire(blocking=False):
+        response = jsonify({'error': 'Too many open streams', 'retry_after': STREAM_RETRY_AFTER})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(STREAM_RETRY_AFTER)
+        return response
+    response = Response(body, mimetype=mimetype,
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(stream_slots.release)
+    return response
+
+@app.route('/api/stream')
+def api_stream():
+    """Server-Sent Events feed of dashboard changes.
+    
+    The first event carries every section; after that an event is pushed
+    only when the cache publishes changed data, and it carries only the
+    sections that changed since the previous event.
+    """
+    def events():
+        sent = {}
+        heartbeat_due = False
+        while not shutdown_event.is_set():
+            # Read the version first so a change made while building is not missed
+            version = cache.version
+            changed = {}
+            # Also revalidates stale entries if the collector stalls
+            for key, entry in fetch_sections().items():
+                entry_version = entry['version'] if entry else None
+                if key not in sent or sent[key] != entry_version:
+                    payload = section_payload(key, entry)
+                    if payload is not None:
+                        changed[key] = payload
+                    sent[key] = entry_version
+            
+            if changed:
+                changed['timestamp'] = datetime.now().isoformat()
+                yield f"data: {json.dumps(changed)}\n\n"
+            elif heartbeat_due:
+                yield ": keep-alive\n\n"
+            
+            heartbeat_due = cache.wait_for_change(version, timeout=STREAM_HEARTBEAT) == version
+    
+    return stream_response(events(), 'text/event-stream')
 
 @app.route('/api/services')
 def api_services():
@@ -1323,9 +3033,415 @@ def api_services():
         'timestamp': datetime.now().isoformat()
     })
 
-@app.route('/api/system')
-def api_system():
-    """Get system information"""
+# Fleet aggregation: with FLEET_NODES or FLEET_INVENTORY set, this dashboard
+# also polls other AI boxes' dashboards and serves them as one view.
+FLEET_NODES = os.environ.get('FLEET_NODES', '')  # "name=http://host:8085,host2:8085,..."
+FLEET_INVENTORY = os.environ.get('FLEET_INVENTORY', '')  # ansible inventory.yml to take hosts from
+FLEET_DASHBOARD_PORT = int(os.environ.get('FLEET_DASHBOARD_PORT', 8085))
+FLEET_INTERVAL = float(os.environ.get('FLEET_INTERVAL', 5))
+FLEET_JITTER = float(os.environ.get('FLEET_JITTER', 0.1))  # +/- fraction of the interval
+FLEET_TIMEOUT = float(os.environ.get('FLEET_TIMEOUT', 3))  # per-node read timeout
+FLEET_CONCURRENCY = int(os.environ.get('FLEET_CONCURRENCY', 16))  # node polls in flight at once
+FLEET_STALE_AFTER = float(os.environ.get('FLEET_STALE_AFTER', FLEET_INTERVAL * 3))
+
+def parse_fleet_nodes(value):
+    """{name: base URL} from "name=url,url,..."; a bare URL is named after its host"""
+    nodes = {}
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, url = item.partition('=')
+        if not sep:
+            name, url = '', item
+        if '://' not in url:
+            url = f"http://{url}"
+        url = url.strip().rstrip('/')
+        nodes[name.strip() or urllib.parse.urlsplit(url).netloc] = url
+    return nodes
+
+def load_inventory_nodes(path, port=FLEET_DASHBOARD_PORT):
+    """{name: dashboard URL} for every host in an ansible inventory.
+    
+    Like load_compose_healthchecks this scans the file instead of parsing
+    YAML: each entry of a `hosts:` block is a host, with its
+    `ansible_host` and optional `dashboard_port` read from the lines below.
+    """
+    hosts = {}
+    hosts_indent = None
+    host_indent = None
+    host = None
+    with open(path, 'r') as f:
+        for line in f:
+            stripped = line.strip()
+            if not stripped or stripped.startswith('#'):
+                continue
+            indent = len(line) - len(line.lstrip())
+            if hosts_indent is not None and indent <= hosts_indent:
+                hosts_indent = host = None
+            if stripped == 'hosts:':
+                hosts_indent, host_indent = indent, None
+                continue
+            if hosts_indent is None:
+                continue
+            key, _, value = stripped.partition(':')
+            if host_indent is None or indent == host_indent:
+                host_indent = indent
+                host = key
+                hosts[host] = {}
+            elif host is not None and key in ('ansible_host', 'dashboard_port'):
+                hosts[host][key] = value.strip().strip('"\'')
+    return {
+        name: f"http://{values.get('ansible_host', name)}:{values.get('dashboard_port', port)}"
+        for name, values in hosts.items()
+    }
+
+def load_fleet_nodes():
+    """Nodes from FLEET_INVENTORY, then FLEET_NODES (which wins on a name clash)"""
+    nodes = {}
+    if FLEET_INVENTORY:
+        try:
+            nodes.update(load_inventory_nodes(FLEET_INVENTORY))
+        except OSError as e:
+            print(f"Could not read fleet inventory {FLEET_INVENTORY}: {e}")
+    nodes.update(parse_fleet_nodes(FLEET_NODES))
+    return nodes
+
+class FleetAggregator:
+    """Other AI boxes' /api/dashboard merged into one fleet view.
+    
+    Each node is its own cache key polled by its own collector thread, so a
+    slow or dead node only ever delays itself. A shared semaphore bounds
+    how many polls run at once, every poll has its own timeout, and dead
+    nodes are skipped by their circuit breaker in the HTTP pool. Polls send
+    the node's last ETag and accept gzip, so an unchanged node costs a 304
+    and a changed one a compressed snapshot.
+    """
+    
+    STATES = ('fresh', 'stale', 'down', 'pending')
+    
+    def __init__(self, nodes, timeout=FLEET_TIMEOUT, concurrency=FLEET_CONCURRENCY,
+                 stale_after=FLEET_STALE_AFTER):
+        self.nodes = nodes
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self._slots = threading.BoundedSemaphore(concurrency)
+    
+    @staticmethod
+    def key(name):
+        return f"fleet:{name}"
+    
+    def poll(self, name):
+        """Cache loader for one node: its last good snapshot plus contact status.
+        
+        Never raises - a failed poll keeps the previous snapshot and records
+        the error, so staleness is visible to follower workers too. A 304
+        returns the previous value unchanged, which only renews the entry's
+        timestamp and leaves the cache version alone.
+        """
+        entry = cache.peek(self.key(name))
+        previous = entry['data'] if entry and entry['data'] else {
+            'dashboard': None, 'etag': None, 'last_ok': None, 'latency': None, 'error': None}
+        url = f"{self.nodes[name]}/api/dashboard"
+        headers = {'Accept-Encoding': 'gzip'}
+        if previous['etag']:
+            headers['If-None-Match'] = previous['etag']
+        
+        if not self._slots.acquire(timeout=self.timeout):
+            return self.failed(entry, previous, 'too many node polls in flight')
+        started = time.time()
+        try:
+            status, response_headers, body = http_pool.request('GET', url, headers=headers,
+                                                               timeout=self.timeout)
+            if status == 304:
+                return dict(previous, last_ok=None, error=None)
+            if status != 200:
+                raise UpstreamError(f"GET {url}: HTTP {status}")
+            if response_headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            dashboard, etag = json.loads(body), response_headers.get('ETag')
+        except Exception as e:
+            return self.failed(entry, previous, str(e))
+        finally:
+            self._slots.release()
+        return {'dashboard': dashboard, 'etag': etag, 'last_ok': None,
+                'latency': round(time.time() - started, 3), 'error': None}
+    
+    @staticmethod
+    def failed(entry, previous, error):
+        """`previous` with an error; last_ok pins when the node last answered"""
+        last_ok = previous['last_ok'] if previous['error'] or previous['dashboard'] is None else entry['timestamp']
+        return dict(previous, last_ok=last_ok, error=error)
+    
+    @staticmethod
+    def last_ok(entry):
+        """When the node last answered: the entry's timestamp while polls succeed"""
+        data = entry['data'] if entry else None
+        if not data:
+            return None
+        return data['last_ok'] if data['error'] else entry['timestamp']
+    
+    @staticmethod
+    def summarize(dashboard):
+        """Headline numbers for one node's snapshot"""
+        services = dashboard.get('services', {}).get('data', [])
+        gpus = dashboard.get('gpu', {}).get('gpus', [])
+        return {
+            'hostname': dashboard.get('system', {}).get('hostname'),
+            'services': len(services),
+            'running': sum(1 for service in services if service.get('status') == 'running'),
+            'gpus': len(gpus),
+            'gpu_util': round(sum(gpu.get('gpu_util', 0) for gpu in gpus) / len(gpus), 1) if gpus else None,
+            'gpu_mem_used': sum(gpu.get('mem_used', 0) for gpu in gpus),
+            'gpu_mem_total': sum(gpu.get('mem_total', 0) for gpu in gpus)
+        }
+    
+    def node_view(self, name, entry, now, full=True):
+        """One node's state ('fresh', 'stale', 'down' or 'pending'), age and data"""
+        data = entry['data'] if entry else None
+        last_ok = self.last_ok(entry)
+        if last_ok is None:
+            state = 'down' if data and data['error'] else 'pending'
+        else:
+            state = 'fresh' if now - last_ok < self.stale_after else 'stale'
+        dashboard = data['dashboard'] if data else None
+        
+        view = {
+            'name': name,
+            'url': self.nodes[name],
+            'state': state,
+            'age': round(now - last_ok, 1) if last_ok else None,
+            'latency': data['latency'] if data else None,
+            'error': data['error'] if data else None,
+            'summary': self.summarize(dashboard) if dashboard else None
+        }
+        if full:
+            view['dashboard'] = dashboard
+        return view
+    
+    def view(self, full=True):
+        """Every node plus fleet-wide totals; stale nodes are revalidated in the background"""
+        now = time.time()
+        nodes = [self.node_view(name, cache.get_nowait(self.key(name)), now, full)
+                 for name in self.nodes]
+        states = dict.fromkeys(self.STATES, 0)
+        totals = {'services': 0, 'running': 0, 'gpus': 0, 'gpu_mem_used': 0, 'gpu_mem_total': 0}
+        for node in nodes:
+            states[node['state']] += 1
+            if node['summary']:
+                for field in totals:
+                    totals[field] += node['summary'][field]
+        return {'nodes': nodes, 'states': states, 'totals': totals,
+                'timestamp': datetime.now().isoformat()}
+
+fleet = FleetAggregator(load_fleet_nodes())
+
+@app.route('/api/fleet')
+def api_fleet():
+    """Merged view of every fleet node; `?full=0` sends only per-node summaries"""
+    return jsonify(fleet.view(full=request.args.get('full', '1') != '0'))
+
+@app.route('/api/fleet/stream')
+def api_fleet_stream():
+    """NDJSON feed of fleet nodes.
+    
+    One line per node first, then a line whenever a node's snapshot, state
+    or error changes. Lines carry summaries only unless `?full=1`; blank
+    lines are keep-alives.
+    """
+    full = request.args.get('full') == '1'
+    
+    def lines():
+        sent = {}
+        last_write = time.time()
+        while not shutdown_event.is_set():
+            version = cache.version
+            now = time.time()
+            changed = []
+            for name in fleet.nodes:
+                entry = cache.peek(fleet.key(name))
+                view = fleet.node_view(name, entry, now, full)
+                mark = (entry['data']['etag'] if entry and entry['data'] else None,
+                        view['state'], view['error'])
+                if sent.get(name) != mark:
+                    sent[name] = mark
+                    changed.append(json.dumps(view) + '\n')
+            
+            if changed:
+                yield ''.join(changed)
+                last_write = now
+            elif now - last_write >= STREAM_HEARTBEAT:
+                yield '\n'
+                last_write = now
+            # Wake on new data, and at least once an interval to catch nodes going stale
+            cache.wait_for_change(version, timeout=FLEET_INTERVAL)
+    
+    return stream_response(lines(), 'application/x-ndjson')
+
+HOST_PROC = os.environ.get('HOST_PROC', '/proc')
+
+class HostMetrics:
+    """Host CPU, memory, load and pressure read directly from /proc.
+    
+    CPU usage is computed from the delta between consecutive samples of
+    /proc/stat (the first sample reports the average since boot). Pass a
+    different `proc_root` to read a fixture tree.
+    """
+    
+    PRESSURE_RESOURCES = ('cpu', 'memory', 'io')
+    
+    def __init__(self, proc_root=HOST_PROC):
+        self.proc_root = proc_root
+        self._previous = {}
+        self._lock = threading.Lock()
+    
+    def _read(self, *path):
+        with open(os.path.join(self.proc_root, *path)) as f:
+            return f.read()
+    
+    def cpu_times(self):
+        """{'cpu': (busy, total), 'cpu0': ...} jiffies from /proc/stat"""
+        times = {}
+        for line in self._read('stat').splitlines():
+            if not line.startswith('cpu'):
+                continue
+            fields = line.split()
+            values = [int(v) for v in fields[1:]]
+            # user nice system idle iowait irq softirq steal (guest time is already in user)
+            total = sum(values[:8])
+            idle = values[3] + (values[4] if len(values) > 4 else 0)
+            times[fields[0]] = (total - idle, total)
+        return times
+    
+    def cpu_usage(self):
+        """Overall and per-core CPU percent since the previous call"""
+        times = self.cpu_times()
+        with self._lock:
+            previous, self._previous = self._previous, times
+        
+        usage = {}
+        for name, (busy, total) in times.items():
+            prev_busy, prev_total = previous.get(name, (0, 0))
+            delta_total = total - prev_total
+            delta_busy = busy - prev_busy
+            usage[name] = round(delta_busy / delta_total * 100, 1) if delta_total > 0 else 0.0
+        
+        cores = sorted((name for name in usage if name != 'cpu'), key=lambda n: int(n[3:]))
+        return {
+            'usage': usage.get('cpu', 0.0),
+            'per_core': [usage[name] for name in cores],
+            'cores': len(cores)
+        }
+    
+    def memory(self):
+        """Memory and swap usage from /proc/meminfo (values in MB)"""
+        info = {}
+        for line in self._read('meminfo').splitlines():
+            key, _, value = line.partition(':')
+            info[key] = int(value.split()[0]) // 1024 if value.strip() else 0
+        
+        total = info.get('MemTotal', 0)
+        available = info.get('MemAvailable', info.get('MemFree', 0))
+        used = total - available
+        swap_total = info.get('SwapTotal', 0)
+        swap_used = swap_total - info.get('SwapFree', 0)
+        return {
+            'percent': round(used / total * 100, 1) if total else 0,
+            'used_mb': used,
+            'total_mb': total,
+            'available_mb': available,
+            'swap': {
+                'percent': round(swap_used / swap_total * 100, 1) if swap_total else 0,
+                'used_mb': swap_used,
+                'total_mb': swap_total
+            }
+        }
+    
+    def load(self):
+        """Load averages and process counts from /proc/loadavg"""
+        fields = self._read('loadavg').split()
+        running, _, total = fields[3].partition('/')
+        return {
+            'load1': float(fields[0]),
+            'load5': float(fields[1]),
+            'load15': float(fields[2]),
+            'running': int(running),
+            'processes': int(total)
+        }
+    
+    def pressure(self):
+        """PSI stall data from /proc/pressure/* (None where unsupported)"""
+        result = {}
+        for resource in self.PRESSURE_RESOURCES:
+            try:
+                content = self._read('pressure', resource)
+            except OSError:
+                result[resource] = None
+                continue
+            stalls = {}
+            for line in content.splitlines():
+                kind, *pairs = line.split()
+                values = dict(pair.split('=') for pair in pairs)
+                stalls[kind] = {
+                    'avg10': float(values['avg10']),
+                    'avg60': float(values['avg60']),
+                    'avg300': float(values['avg300']),
+                    'total_us': int(values['total'])
+                }
+            result[resource] = stalls
+        return result
+    
+    def sample(self):
+        """All host metrics in one dict"""
+        cpu = self.cpu_usage()
+        cpu['load'] = self.load()
+        return {
+            'cpu': cpu,
+            'memory': self.memory(),
+            'pressure': self.pressure()
+        }
+
+host_metrics = HostMetrics()
+
+def fetch_gpu_server():
+    """GPU metrics from the gpu-server container"""
+    # The chain owns this host's breaker, so bypass the pool's own check
+    return http_pool.get_json(GPU_SERVER_URL, breaker=False).get('gpus', [])
+
+def fetch_gpu_script():
+    """GPU metrics from the host gpu-simple.sh script"""
+    gpus = []
+    gpus_data = json.loads(run_cmd("/host-scripts/gpu-simple.sh"))
+    
+    for gpu in gpus_data:
+        try:
+            mem_used = float(gpu['mem_used'])
+            mem_total = float(gpu['mem_total'])
+            mem_util = round((mem_used / mem_total) * 100, 1) if mem_total > 0 else 0
+            
+            gpus.append({
+                'index': int(gpu['index']),
+                'name': gpu['name'].strip(),
+                'temperature': float(gpu['temperature']),
+                'gpu_util': float(gpu['gpu_util']),
+                'mem_used': mem_used,
+                'mem_total': mem_total,
+                'mem_util': mem_util,
+                'power_draw': float(gpu['power_draw'])
+            })
+        except Exception as e:
+            print(f"Error parsing GPU data: {e}")
+            continue
+    return gpus
+
+GPU_NEGATIVE_TTL = float(os.environ.get('GPU_NEGATIVE_TTL', 10))
+
+gpu_sources = FallbackChain('gpu', negative_ttl=GPU_NEGATIVE_TTL)
+gpu_sources.add('gpu-server', fetch_gpu_server, http_pool.breaker(GPU_SERVER_URL))
+gpu_sources.add('gpu-simple.sh', fetch_gpu_script)
+
+def collect_system_info():
+    """Collect system information"""
     gpus = []
     driver = "Unknown"
     cuda_version = "Unknown"
@@ -1350,17 +3466,12 @@ def api_system():
     # If environment variable didn't work, get GPU names from GPU server
     if not gpus:
         try:
-            import urllib.request
-            import json
-            
-            # Get GPU data from our GPU server
-            with urllib.request.urlopen('http://gpu-server:9999/gpu-metrics', timeout=5) as response:
-                gpu_data = json.loads(response.read().decode())
-                for gpu in gpu_data.get('gpus', []):
-                    gpus.append({
-                        'name': gpu.get('name', 'Unknown GPU'),
-                        'driver': '575.51.03'  # Current driver version
-                    })
+            # Same source chain as the GPU metrics, so a dead gpu-server is skipped
+            for gpu in gpu_sources.fetch():
+                gpus.append({
+                    'name': gpu.get('name', 'Unknown GPU'),
+                    'driver': '575.51.03'  # Current driver version
+                })
                     
             # Set known values for our system
             driver = "575.51.03"
@@ -1374,136 +3485,778 @@ def api_system():
             driver = "575.51.03"
             cuda_version = "12.9"
     
-    # Get hostname
-    hostname = run_cmd("hostname") or "localhost"
-    
-    # CPU usage - using top for simplicity
-    cpu_cmd = "top -bn1 | grep 'Cpu(s)' | awk '{print $2}' | cut -d'%' -f1"
-    cpu_usage = run_cmd(cpu_cmd)
-    try:
-        cpu_percent = float(cpu_usage)
-    except:
-        cpu_percent = 0
-    
-    # Memory info
-    mem_cmd = "free -m | grep Mem | awk '{print $3,$2}'"
-    mem_info = run_cmd(mem_cmd).split()
-    
-    try:
-        mem_used = int(mem_info[0]) if len(mem_info) > 0 else 0
-        mem_total = int(mem_info[1]) if len(mem_info) > 1 else 1
-        mem_percent = round((mem_used / mem_total) * 100, 1)
-    except:
-        mem_percent = 0
+    # CPU, memory and pressure straight from /proc
+    host = host_metrics.sample()
     
-    return jsonify({
-        'hostname': hostname,
+    return {
+        'hostname': socket.gethostname() or "localhost",
         'nvidia': {
             'gpus': gpus,
             'cuda_driver': cuda_version
         },
-        'cpu': {
-            'usage': cpu_percent
-        },
-        'memory': {
-            'percent': mem_percent
-        }
-    })
+        'cpu': host['cpu'],
+        'memory': host['memory'],
+        'pressure': host['pressure']
+    }
+
+@app.route('/api/system')
+def api_system():
+    """Get system information"""
+    return jsonify(cache.get('system'))
+
+def collect_gpu_metrics():
+    """Collect GPU metrics from the first working source"""
+    return gpu_sources.fetch()
 
 @app.route('/api/gpu/metrics')
 def api_gpu_metrics():
     """Get GPU metrics"""
-    now = time.time()
+    return jsonify({'gpus': cache.get('gpu')})
+
+STOP_TIMEOUT = int(os.environ.get('STOP_TIMEOUT', 60))  # seconds Docker waits before SIGKILL
+JOB_HISTORY = int(os.environ.get('JOB_HISTORY', 100))  # finished jobs kept for polling
+
+class Job:
+    """A background operation with a progress log.
     
-    # Check cache with faster TTL for GPU metrics
-    if cache['gpu']['data'] and (now - cache['gpu']['timestamp']) < GPU_CACHE_TTL:
-        return jsonify({'gpus': cache['gpu']['data']})
+    Job bodies change `result` and `progress` under `lock`, so to_dict()
+    never serializes a half-updated result.
+    """
     
-    gpus = []
+    def __init__(self, kind, target):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.target = target
+        self.state = 'queued'
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.result = None
+        self.progress = []
+        self.lock = threading.Lock()
     
-    # Call local GPU server for metrics
-    try:
-        import urllib.request
-        import json
-        
-        # Use gpu-server container name since we're on ai-network
-        with urllib.request.urlopen('http://gpu-server:9999/gpu-metrics', timeout=5) as response:
-            gpu_data = json.loads(response.read().decode())
-            gpus = gpu_data.get('gpus', [])
-    except Exception as e:
-        print(f"Error getting GPU metrics from server: {e}")
-        # Fallback: try direct host script call
+    @property
+    def done(self):
+        return self.state in ('succeeded', 'failed')
+    
+    def to_dict(self):
+        with self.lock:
+            result = copy.deepcopy(self.result)
+            progress = list(self.progress)
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'target': self.target,
+            'state': self.state,
+            'created': datetime.fromtimestamp(self.created).isoformat(),
+            'started': datetime.fromtimestamp(self.started).isoformat() if self.started else None,
+            'finished': datetime.fromtimestamp(self.finished).isoformat() if self.finished else None,
+            'duration': round((self.finished or time.time()) - self.started, 3) if self.started else None,
+            'error': self.error,
+            'result': result,
+            'progress': progress
+        }
+
+class JobManager:
+    """Runs lifecycle operations in background threads.
+    
+    Each job gets an ID that can be polled or streamed. Jobs touching the
+    same container are serialized through a per-container file lock, so
+    two restarts of one container never overlap, even when they were
+    submitted to different worker processes; different containers run in
+    parallel. Job state is mirrored to the snapshot store so any worker
+    can answer for it.
+    """
+    
+    def __init__(self, store, history=JOB_HISTORY):
+        self.store = store
+        self.history = history
+        self.version = 0
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+    
+    def submit(self, kind, target, work):
+        """Start `work(job)` in the background and return the job"""
+        job = Job(kind, target)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+        threading.Thread(target=self._run, args=(job, work), name=f"job-{job.id}", daemon=True).start()
+        return job
+    
+    def _run(self, job, work):
         try:
-            gpu_json = run_cmd("/host-scripts/gpu-simple.sh")
-            import json
-            gpus_data = json.loads(gpu_json)
-            
-            for gpu in gpus_data:
-                try:
-                    mem_used = float(gpu['mem_used'])
-                    mem_total = float(gpu['mem_total'])
-                    mem_util = round((mem_used / mem_total) * 100, 1) if mem_total > 0 else 0
-                    
-                    gpus.append({
-                        'index': int(gpu['index']),
-                        'name': gpu['name'].strip(),
-                        'temperature': float(gpu['temperature']),
-                        'gpu_util': float(gpu['gpu_util']),
-                        'mem_used': mem_used,
-                        'mem_total': mem_total,
-                        'mem_util': mem_util,
-                        'power_draw': float(gpu['power_draw'])
-                    })
-                except Exception as e:
-                    print(f"Error parsing GPU data: {e}")
-                    continue
+            work(job)
         except Exception as e:
-            print(f"Error with fallback GPU script: {e}")
-            pass
+            print(f"Job {job.id} ({job.kind} {job.target}) failed: {e}")
+            job.error = str(e)
+            self._set_state(job, 'failed')
+        else:
+            self._set_state(job, 'succeeded')
+    
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+            self.store.delete_job(job_id)
+    
+    def _notify(self, job):
+        try:
+            self.store.write_job(job.to_dict())
+        except OSError as e:
+            print(f"Error saving job {job.id}: {e}")
+        with self._changed:
+            self.version += 1
+            self._changed.notify_all()
+    
+    def _set_state(self, job, state):
+        if state == 'running' and job.started is None:
+            job.started = time.time()
+        elif state in ('succeeded', 'failed'):
+            job.finished = time.time()
+        job.state = state
+        self.log(job, state)
+    
+    def log(self, job, message):
+        """Append a progress message and wake stream readers"""
+        with job.lock:
+            job.progress.append({'time': datetime.now().isoformat(), 'message': message})
+        self._notify(job)
     
-    # Cache the result
-    cache['gpu']['data'] = gpus
-    cache['gpu']['timestamp'] = now
+    @contextmanager
+    def container(self, job, name):
+        """Hold the container's lock for the duration of the block"""
+        with self.store.lock(f"container-{os.path.basename(name)}",
+                             on_wait=lambda: self.log(job, f"waiting for another job on {name}")):
+            if job.state == 'queued':
+                self._set_state(job, 'running')
+            yield
+    
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def lookup(self, job_id):
+        """Job state as a dict, including jobs run by other worker processes"""
+        job = self.get(job_id)
+        return job.to_dict() if job else self.store.read_job(job_id)
+    
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+    
+    def wait_for_change(self, after, timeout):
+        """Block until any job changes (or timeout); return the new version"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != after, timeout)
+            return self.version
+    
+    def wake(self):
+        """Wake every wait_for_change() caller (used at shutdown)"""
+        with self._changed:
+            self._changed.notify_all()
+
+jobs = JobManager(state_store)
+
+def run_service_action(job, name, action):
+    """Job body: one lifecycle action on one container"""
+    with jobs.container(job, name):
+        jobs.log(job, f"{action} {name}" + (f" (stop timeout {STOP_TIMEOUT}s)" if action != 'start' else ''))
+        try:
+            docker.action(name, action, stop_timeout=STOP_TIMEOUT)
+        finally:
+            # Update just this container's record, whether or not the action worked
+            try:
+                refresh_service(name)
+            except DockerError as e:
+                print(f"Error refreshing {name} after {action}: {e}")
+
+def parse_requires(value):
+    """Parse "svc:dep1,dep2;svc2:dep3" into {svc: [deps]}"""
+    requires = {}
+    for entry in value.split(';'):
+        if ':' not in entry:
+            continue
+        name, deps = entry.split(':', 1)
+        requires[name.strip()] = [dep.strip() for dep in deps.split(',') if dep.strip()]
+    return requires
+
+def compose_requires(containers):
+    """Start-order dependencies from Docker Compose container labels.
+    
+    Compose (v2.20+) records each service's depends_on as a
+    "service:condition:required,..." label; services are mapped back to
+    container names, since container_name may differ from the service.
+    """
+    names = {}
+    for container in containers:
+        service = (container.get('Labels') or {}).get('com.docker.compose.service')
+        if service:
+            names[service] = container_name(container)
+    
+    requires = {}
+    for container in containers:
+        depends_on = (container.get('Labels') or {}).get('com.docker.compose.depends_on')
+        if depends_on:
+            services = [entry.split(':')[0] for entry in depends_on.split(',') if entry]
+            requires[container_name(container)] = [names.get(service, service) for service in services]
+    return requires
+
+# Start-order dependencies as "svc:dep1,dep2;svc2:dep3". When unset they
+# are read from the containers' Compose depends_on labels.
+SERVICE_REQUIRES = parse_requires(os.environ.get('SERVICE_REQUIRES', ''))
+HEALTH_WAIT_TIMEOUT = float(os.environ.get('HEALTH_WAIT_TIMEOUT', 180))
+
+def service_requires():
+    """SERVICE_REQUIRES, or the Compose depends_on labels when it is unset"""
+    if SERVICE_REQUIRES:
+        return SERVICE_REQUIRES
+    containers = inventory.snapshot()
+    if containers is None:
+        containers = docker.containers(all=True)
+    return compose_requires(containers)
+
+def dependency_layers(names, action, requires):
+    """Group services into layers that can run in parallel.
+    
+    `requires` maps a service to the services it depends on; dependencies
+    outside `names` are ignored. Start and restart run dependencies first;
+    stop runs the layers in reverse. Raises ValueError on a dependency cycle.
+    """
+    pending = {name: {dep for dep in requires.get(name, []) if dep in names} for name in names}
+    layers = []
+    while pending:
+        layer = sorted(name for name, deps in pending.items() if not deps)
+        if not layer:
+            raise ValueError(f"Dependency cycle between: {', '.join(sorted(pending))}")
+        layers.append(layer)
+        for name in layer:
+            del pending[name]
+        for deps in pending.values():
+            deps.difference_update(layer)
+    return list(reversed(layers)) if action == 'stop' else layers
+
+def wait_until_healthy(name, timeout=HEALTH_WAIT_TIMEOUT):
+    """Re-probe a service until it is online; False on timeout or no probe"""
+    if name not in service_probes:
+        return False
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        # Probe directly: a cached or in-flight result may predate the restart
+        result = probe_service(name)
+        cache.update(health_key(name), lambda _: result)
+        if result['status'] == 'online':
+            return True
+        time.sleep(2)
+    return False
+
+def run_batch(job, layers, action, requires):
+    """Job body: run each layer in parallel, waiting for health between layers"""
+    services = {name: {'status': 'pending'} for layer in layers for name in layer}
+    with job.lock:
+        job.result = {'layers': layers, 'services': services}
+    failed = set()
+    
+    def record(name, **fields):
+        with job.lock:
+            services[name].update(fields)
+    
+    def run_one(name):
+        record(name, status='running')
+        started = time.time()
+        try:
+            run_service_action(job, name, action)
+        except Exception as e:
+            record(name, status='failed', error=str(e), action_seconds=round(time.time() - started, 3))
+            failed.add(name)
+            return
+        record(name, action_seconds=round(time.time() - started, 3))
+        if action != 'stop' and name in service_probes:
+            jobs.log(job, f"waiting for {name} to become healthy")
+            if not wait_until_healthy(name):
+                record(name, status='unhealthy', total_seconds=round(time.time() - started, 3))
+                failed.add(name)
+                return
+            record(name, healthy_seconds=round(time.time() - started, 3))
+        record(name, status='ok', total_seconds=round(time.time() - started, 3))
+    
+    for number, layer in enumerate(layers, 1):
+        runnable = []
+        for name in layer:
+            blocked = [dep for dep in requires.get(name, []) if dep in failed]
+            if blocked and action != 'stop':
+                record(name, status='skipped', error=f"dependency failed: {', '.join(blocked)}")
+                failed.add(name)
+            else:
+                runnable.append(name)
+        jobs.log(job, f"layer {number}/{len(layers)}: {action} {', '.join(runnable) or 'nothing'}")
+        
+        threads = [threading.Thread(target=run_one, args=(name,), daemon=True) for name in runnable]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    
+    if failed:
+        raise RuntimeError(f"{action} failed for: {', '.join(sorted(failed))}")
+
+@app.route('/api/services/batch', methods=['POST'])
+def api_batch_control():
+    """Run one action on many services in dependency order as a single job.
+    
+    Body: {"action": "start|stop|restart", "services": [...]}; services
+    defaults to every service on the dashboard.
+    """
+    body = request.get_json(silent=True) or {}
+    action = body.get('action')
+    if action not in ('start', 'stop', 'restart'):
+        return jsonify({'error': 'Invalid action'}), 400
+    known = [service['name'] for service in get_docker_services()]
+    names = body.get('services') or known
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        return jsonify({'error': 'services must be a list of names'}), 400
+    unknown = sorted(set(names) - set(known))
+    if unknown:
+        return jsonify({'error': f"Unknown services: {', '.join(unknown)}"}), 400
+    try:
+        requires = service_requires()
+    except DockerError as e:
+        return jsonify({'error': f"Could not read service dependencies: {e}"}), 503
+    try:
+        layers = dependency_layers(set(names), action, requires)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify({'gpus': gpus})
+    job = jobs.submit(f"batch-{action}", sorted(set(names)),
+                      lambda job: run_batch(job, layers, action, requires))
+    response = jsonify({'status': 'accepted', 'layers': layers, 'job': job.to_dict()})
+    response.status_code = 202
+    response.headers['Location'] = f"/api/jobs/{job.id}"
+    return response
 
 @app.route('/api/services/<name>/<action>', methods=['POST'])
 def api_control_service(name, action):
-    """Control a service"""
+    """Start a lifecycle action as a background job"""
     if action in ['start', 'stop', 'restart']:
-        result = run_cmd(f"docker {action} {name}")
-        
-        # Clear cache
-        cache['services']['data'] = []
-        
-        return jsonify({
-            'status': 'success',
-            'message': f'{name} {action} command sent',
-            'output': result
+        job = jobs.submit(action, name, lambda job: run_service_action(job, name, action))
+        response = jsonify({
+            'status': 'accepted',
+            'message': f'{name} {action} queued',
+            'job': job.to_dict()
         })
+        response.status_code = 202
+        response.headers['Location'] = f"/api/jobs/{job.id}"
+        return response
     
     return jsonify({'error': 'Invalid action'}), 400
 
-@app.route('/metrics')
-def metrics():
-    """Prometheus metrics endpoint (placeholder)"""
-    # Simple placeholder for GPU metrics in Prometheus format
-    output = "# HELP gpu_utilization GPU utilization percentage\n"
-    output += "# TYPE gpu_utilization gauge\n"
+@app.route('/api/jobs')
+def api_jobs():
+    """Recent and running jobs, newest first"""
+    return jsonify({'jobs': [job.to_dict() for job in reversed(jobs.list())]})
+
+@app.route('/api/jobs/<job_id>')
+def api_job(job_id):
+    """State and progress of one job"""
+    job = jobs.lookup(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/stream')
+def api_job_stream(job_id):
+    """Server-Sent Events feed of one job's progress until it finishes"""
+    if jobs.lookup(job_id) is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    
+    def events():
+        sent = None
+        heartbeat_due = False
+        while not shutdown_event.is_set():
+            version = jobs.version
+            snapshot = jobs.lookup(job_id)
+            if snapshot is None:
+                # Trimmed from history (it had finished) before we saw the end
+                expired = {'id': job_id, 'state': 'expired', 'error': 'Job no longer in history'}
+                yield f"data: {json.dumps(expired)}\n\n"
+                return
+            if len(snapshot['progress']) != sent:
+                sent = len(snapshot['progress'])
+                yield f"data: {json.dumps(snapshot)}\n\n"
+            elif heartbeat_due:
+                yield ": keep-alive\n\n"
+            if snapshot['state'] in ('succeeded', 'failed'):
+                return
+            if jobs.get(job_id) is None:
+                # Run by another worker process - follow its snapshot file
+                time.sleep(FOLLOW_INTERVAL)
+                heartbeat_due = False
+                continue
+            # Other jobs wake us too; only a quiet timeout earns a heartbeat
+            heartbeat_due = jobs.wait_for_change(version, timeout=STREAM_HEARTBEAT) == version
     
-    gpu_data = cache['gpu']['data']
-    if gpu_data:
-        for gpu in gpu_data:
-            output += f"gpu_utilization{{gpu=\"{gpu['index']}\",name=\"{gpu['name']}\"}} {gpu['gpu_util']}\n"
+    return stream_response(events(), 'text/event-stream')
+
+def prometheus_labels(**labels):
+    """Render a Prometheus label set, escaping values"""
+    if not labels:
+        return ''
+    parts = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+class PrometheusExporter:
+    """Renders the cached snapshots in the Prometheus text format.
+    
+    Rendering never blocks on a collector, and the serialized output is
+    reused between scrapes until one of the snapshots changes.
+    """
+    
+    CONTAINER_STATUSES = ('running', 'stopped', 'restarting', 'created', 'unknown')
+    
+    def __init__(self, cache):
+        self.cache = cache
+        self._output = (None, None)
+    
+    def render(self):
+        entries = {key: self.cache.get_nowait(key) for key in DASHBOARD_SECTIONS}
+        versions = tuple(entry['version'] if entry else None for entry in entries.values())
+        cached_versions, output = self._output
+        if cached_versions == versions:
+            return output
+        
+        lines = []
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                if value is not None:
+                    lines.append(f"{name}{prometheus_labels(**labels)} {value}")
+        
+        gpus = entries['gpu']['data'] if entries['gpu'] else []
+        gpu_labels = [{'gpu': gpu.get('index'), 'name': gpu.get('name')} for gpu in gpus]
+        def gpu_samples(field, scale=1):
+            return [(labels, gpu[field] * scale if gpu.get(field) is not None else None)
+                    for labels, gpu in zip(gpu_labels, gpus)]
+        
+        # Kept for existing scrape configs that used the old placeholder
+        metric('gpu_utilization', 'gauge', 'GPU utilization percentage (deprecated)',
+               gpu_samples('gpu_util'))
+        metric('aibox_gpu_temperature_celsius', 'gauge', 'GPU temperature', gpu_samples('temperature'))
+        metric('aibox_gpu_utilization_percent', 'gauge', 'GPU utilization', gpu_samples('gpu_util'))
+        metric('aibox_gpu_memory_used_bytes', 'gauge', 'GPU memory in use',
+               gpu_samples('mem_used', 1024 * 1024))
+        metric('aibox_gpu_memory_total_bytes', 'gauge', 'GPU memory size',
+               gpu_samples('mem_total', 1024 * 1024))
+        metric('aibox_gpu_memory_utilization_percent', 'gauge', 'GPU memory in use',
+               gpu_samples('mem_util'))
+        metric('aibox_gpu_power_draw_watts', 'gauge', 'GPU power draw', gpu_samples('power_draw'))
+        
+        services = entries['services']['data'] if entries['services'] else []
+        metric('aibox_container_status', 'gauge', 'Container status (1 for the current status)',
+               [({'name': service['name'], 'status': status}, int(service['status'] == status))
+                for service in services for status in self.CONTAINER_STATUSES])
+        metric('aibox_container_restarts_total', 'counter', 'Container restarts by the restart policy',
+               [({'name': service['name']}, service.get('restarts')) for service in services])
+        metric('aibox_container_cpu_percent', 'gauge', 'Container CPU usage (100 per core)',
+               [({'name': service['name']}, service['stats']['cpu'])
+                for service in services if service.get('stats')])
+        metric('aibox_container_memory_percent', 'gauge', 'Container memory usage of its limit',
+               [({'name': service['name']}, service['stats']['memory'])
+                for service in services if service.get('stats')])
+        
+        system = entries['system']['data'] if entries['system'] else {}
+        cpu = system.get('cpu') or {}
+        memory = system.get('memory') or {}
+        swap = memory.get('swap') or {}
+        load = cpu.get('load') or {}
+        metric('aibox_host_cpu_usage_percent', 'gauge', 'Host CPU usage', [({}, cpu.get('usage'))])
+        metric('aibox_host_cpu_core_usage_percent', 'gauge', 'Host CPU usage per core',
+               [({'core': core}, usage) for core, usage in enumerate(cpu.get('per_core') or [])])
+        metric('aibox_host_load_average', 'gauge', 'Host load average',
+               [({'period': period}, load.get(f'load{period}')) for period in ('1', '5', '15') if load])
+        mb = 1024 * 1024
+        metric('aibox_host_memory_used_bytes', 'gauge', 'Host memory in use',
+               [({}, memory['used_mb'] * mb if 'used_mb' in memory else None)])
+        metric('aibox_host_memory_total_bytes', 'gauge', 'Host memory size',
+               [({}, memory['total_mb'] * mb if 'total_mb' in memory else None)])
+        metric('aibox_host_memory_usage_percent', 'gauge', 'Host memory usage',
+               [({}, memory.get('percent'))])
+        metric('aibox_host_swap_used_bytes', 'gauge', 'Host swap in use',
+               [({}, swap['used_mb'] * mb if 'used_mb' in swap else None)])
+        metric('aibox_host_pressure_stall_seconds_total', 'counter', 'Host PSI stall time',
+               [({'resource': resource, 'kind': kind}, round(values['total_us'] / 1e6, 6))
+                for resource, stalls in (system.get('pressure') or {}).items() if stalls
+                for kind, values in stalls.items()])
+        
+        metric('aibox_last_change_timestamp_seconds', 'gauge', 'When each data source last changed',
+               [({'source': key}, round(entry['changed'], 3))
+                for key, entry in entries.items() if entry])
+        
+        output = '\n'.join(lines) + '\n'
+        self._output = (versions, output)
+        return output
     
-    return Response(output, mimetype='text/plain')
+    def render_self(self):
+        """Dashboard self-instrumentation; changes on every request so never cached"""
+        lines = [
+            '# HELP aibox_dashboard_latency_seconds Dashboard route, collector and upstream call latency',
+            '# TYPE aibox_dashboard_latency_seconds summary'
+        ]
+        for (kind, name), histogram in sorted(perf.histograms.items()):
+            for quantile in (0.5, 0.9, 0.99):
+                labels = prometheus_labels(kind=kind, name=name, quantile=quantile)
+                lines.append(f"aibox_dashboard_latency_seconds{labels} {histogram.percentile(quantile * 100):.6f}")
+            labels = prometheus_labels(kind=kind, name=name)
+            lines.append(f"aibox_dashboard_latency_seconds_sum{labels} {histogram.total:.6f}")
+            lines.append(f"aibox_dashboard_latency_seconds_count{labels} {histogram.count}")
+        
+        lines.append('# HELP aibox_dashboard_cache_lookups_total Cache lookups by result')
+        lines.append('# TYPE aibox_dashboard_cache_lookups_total counter')
+        stats = self.cache.stats()
+        for key, counters in stats.items():
+            for result in ('hits', 'stale_hits', 'misses'):
+                labels = prometheus_labels(key=key, result=result)
+                lines.append(f"aibox_dashboard_cache_lookups_total{labels} {counters[result]}")
+        lines.append('# HELP aibox_dashboard_cache_refresh_errors_total Failed cache refreshes')
+        lines.append('# TYPE aibox_dashboard_cache_refresh_errors_total counter')
+        for key, counters in stats.items():
+            lines.append(f"aibox_dashboard_cache_refresh_errors_total{prometheus_labels(key=key)} {counters['errors']}")
+        
+        upstreams = http_pool.stats()
+        lines.append('# HELP aibox_dashboard_upstream_circuit_open Whether the upstream circuit breaker is open')
+        lines.append('# TYPE aibox_dashboard_upstream_circuit_open gauge')
+        for upstream, state in upstreams.items():
+            lines.append(f"aibox_dashboard_upstream_circuit_open{prometheus_labels(upstream=upstream)} "
+                         f"{0 if state['state'] == 'closed' else 1}")
+        lines.append('# HELP aibox_dashboard_upstream_circuit_trips_total Times the upstream circuit breaker opened')
+        lines.append('# TYPE aibox_dashboard_upstream_circuit_trips_total counter')
+        for upstream, state in upstreams.items():
+            lines.append(f"aibox_dashboard_upstream_circuit_trips_total{prometheus_labels(upstream=upstream)} {state['trips']}")
+        return '\n'.join(lines) + '\n'
+
+prometheus = PrometheusExporter(cache)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics endpoint"""
+    return Response(prometheus.render() + prometheus.render_self(),
+                    mimetype='text/plain; version=0.0.4')
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        perf.observe('route', f"{request.method} {route}", time.perf_counter() - started)
+    return response
+
+@app.route('/debug/perf')
+def debug_perf():
+    """Latency percentiles per route, collector and external call, plus cache hit ratios"""
+    return jsonify({
+        'latency': perf.summary(),
+        'cache': cache.stats(),
+        'upstreams': http_pool.stats(),
+        'inventory': inventory.stats(),
+        'gpu_sources': gpu_sources.stats()
+    })
+
+@app.route('/api/cache/stats')
+def api_cache_stats():
+    """Cache hit/miss and refresh-time counters"""
+    return jsonify(cache.stats())
 
 @app.route('/health')
 def health():
     """Health check endpoint"""
     return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()})
 
+class BackgroundCollector:
+    """Refresh each cached data source on its own schedule.
+    
+    Request handlers only read from the cache, so as long as the collector
+    keeps up, slow Docker or nvidia-smi calls never run inside a request.
+    """
+    
+    def __init__(self, cache):
+        self.cache = cache
+        self.intervals = {}
+        self.jitter = {}
+        self._wakeup = {}
+        self._started = False
+        self._lock = threading.Lock()
+    
+    def register(self, name, interval, jitter=0):
+        """Refresh cache key `name` every `interval` seconds.
+        
+        `jitter` spreads each wait by up to that fraction of the interval so
+        sources with the same interval don't all fire at once.
+        """
+        self.intervals[name] = interval
+        self.jitter[name] = jitter
+        self._wakeup[name] = threading.Event()
+    
+    def start(self):
+        """Start one polling thread per source (idempotent)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for name in self.intervals:
+            thread = threading.Thread(target=self._poll, args=(name,),
+                                      name=f"collector-{name}", daemon=True)
+            thread.start()
+    
+    def _poll(self, name):
+        while True:
+            started = time.time()
+            self.cache.refresh(name)
+            
+            # Read each time: LeaderElection changes intervals on a role switch
+            interval = self.intervals[name]
+            wait = interval * (1 + random.uniform(-self.jitter[name], self.jitter[name]))
+            self._wakeup[name].wait(max(0, wait - (time.time() - started)))
+            self._wakeup[name].clear()
+    
+    def refresh_now(self, name):
+        """Ask a source to refresh without waiting for its next interval"""
+        self._wakeup[name].set()
+
+# Entries older than two intervals mean the collector has stalled (or is not
+# running) and the next read triggers a single-flight revalidation.
+cache.register('services', collect_docker_services, SERVICES_INTERVAL * 2, default=[])
+cache.register('system', collect_system_info, SYSTEM_INTERVAL * 2, default={})
+cache.register('gpu', collect_gpu_metrics, GPU_INTERVAL * 2, default=[])
+
+collector = BackgroundCollector(cache)
+collector.register('services', SERVICES_INTERVAL)
+collector.register('system', SYSTEM_INTERVAL)
+collector.register('gpu', GPU_INTERVAL)
+
+# Container events refresh the services section straight away
+inventory.on_change = lambda: collector.refresh_now('services')
+
+service_probes = load_probe_definitions()
+for name in service_probes:
+    cache.register(health_key(name), lambda name=name: probe_service(name),
+                   PROBE_INTERVAL * 2, default={'status': 'unknown'})
+    collector.register(health_key(name), PROBE_INTERVAL, jitter=PROBE_JITTER)
+
+# Other AI boxes for /api/fleet, one collector thread per node
+for name in fleet.nodes:
+    cache.register(fleet.key(name), lambda name=name: fleet.poll(name), FLEET_INTERVAL * 2)
+    collector.register(fleet.key(name), FLEET_INTERVAL, jitter=FLEET_JITTER)
+
+FOLLOW_INTERVAL = float(os.environ.get('FOLLOW_INTERVAL', 0.5))  # follower snapshot polling
+
+class LeaderElection:
+    """Runs the collectors in exactly one process of a worker group.
+    
+    The process holding an exclusive flock on STATE_DIR/leader.lock is the
+    leader: it runs the collectors and the Docker event inventory and
+    writes every cache entry to the snapshot store whenever it changes or
+    is refreshed. Other processes (extra gunicorn workers) install the same
+    entries, versions and timestamps included, every FOLLOW_INTERVAL
+    seconds, so ETags, `?since=` versions and staleness mean the same in
+    every worker. They keep trying the lock so one of them takes over if
+    the leader exits.
+    """
+    
+    def __init__(self, cache, collector, store):
+        self.cache = cache
+        self.collector = collector
+        self.store = store
+        self.role = None
+        self._intervals = {}
+        self._lock_file = None
+    
+    def _try_lock(self):
+        path = self.store.path('leader.lock')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lock_file = open(path, 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        # Held for the life of the process; the kernel releases it on exit
+        self._lock_file = lock_file
+        return True
+    
+    def start(self):
+        """Take the leader or follower role and start background work (idempotent)"""
+        if self.role is not None:
+            return
+        if self._try_lock():
+            # Continue from the versions a previous leader left behind
+            self.cache.follow(self.store.read_entry)
+            for key in self.collector.intervals:
+                self.cache.refresh(key)
+            self._lead()
+        else:
+            self._follow()
+            threading.Thread(target=self._wait_for_lead, name='leader-election', daemon=True).start()
+        self.collector.start()
+    
+    def _lead(self):
+        self.cache.follow(None)
+        self.collector.intervals.update(self._intervals)
+        self.cache.listeners.append(self._write)
+        for key in self.collector.intervals:
+            entry = self.cache.peek(key)
+            if entry is not None:
+                self._write(key, entry)
+        inventory.start()
+        self.role = 'leader'
+        print(f"Dashboard process {os.getpid()} is running the collectors")
+    
+    def _follow(self):
+        for key in self.collector.intervals:
+            self._intervals[key] = self.collector.intervals[key]
+            self.collector.intervals[key] = FOLLOW_INTERVAL
+        self.cache.follow(self.store.read_entry)
+        self.role = 'follower'
+    
+    def _wait_for_lead(self):
+        while not self._try_lock():
+            time.sleep(1)
+        self._lead()
+        for key in self.collector.intervals:
+            self.collector.refresh_now(key)
+    
+    def _write(self, key, entry):
+        if key in self.collector.intervals:
+            try:
+                self.store.write_entry(key, entry)
+            except OSError as e:
+                print(f"Error writing snapshot for {key}: {e}")
+
+election = LeaderElection(cache, collector, state_store)
+shutdown_event = threading.Event()
+
+def start_background():
+    """Start collectors (leader) or snapshot following (other workers)"""
+    election.start()
+
+def begin_shutdown():
+    """End long-lived streams so the server can stop gracefully"""
+    shutdown_event.set()
+    cache.wake()
+    jobs.wake()
+
 if __name__ == '__main__':
-    print("AI Box Dashboard starting on port 8085...")
-    # Run on port 8085 to test external access
-    app.run(host='0.0.0.0', port=8085, debug=False)
\ No newline at end of file
+    # Development server; production runs under gunicorn (see gunicorn.conf.py)
+    host = os.environ.get('DASHBOARD_HOST', '0.0.0.0')
+    port = int(os.environ.get('DASHBOARD_PORT', 8085))
+    print(f"AI Box Dashboard starting on port {port}...")
+    start_background()
+    app.run(host=host, port=port, debug=False, threaded=True)
\ No newline at end of file
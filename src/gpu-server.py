@@ -1,72 +1,548 @@
 #!/usr/bin/env python3
 """
 gpu-server.py - Simple HTTP server to provide GPU metrics to dashboard
+
+A sampler thread reads the GPUs on a fixed interval through a pluggable
+backend (NVML, a long-running nvidia-smi loop, or a fake provider for
+machines without GPUs) and requests are served from the latest sample.
 """
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from array import array
+import bisect
 import subprocess
 import json
+import math
+import os
 import threading
 import time
+import urllib.parse
+
+try:
+    import pynvml
+except ImportError:
+    pynvml = None
+
+SAMPLE_INTERVAL = float(os.environ.get('GPU_SAMPLE_INTERVAL', 1))  # seconds
+GPU_BACKEND = os.environ.get('GPU_BACKEND', 'auto')  # auto, nvml, nvidia-smi or fake
+
+PORT = int(os.environ.get('GPU_SERVER_PORT', 9999))
+MAX_CONNECTIONS = int(os.environ.get('GPU_SERVER_MAX_CONNECTIONS', 256))  # concurrent request connections
+MAX_STREAMS = int(os.environ.get('GPU_SERVER_MAX_STREAMS', 16))  # concurrent /gpu-metrics/stream clients
+KEEPALIVE_TIMEOUT = float(os.environ.get('GPU_SERVER_KEEPALIVE_TIMEOUT', 5))  # idle keep-alive seconds
+HISTORY_SECONDS = int(os.environ.get('GPU_HISTORY_SECONDS', 86400))  # history kept in the ring buffer
+BACKEND_RETRY_MAX = float(os.environ.get('GPU_BACKEND_RETRY_MAX', 60))  # longest wait between backend restarts
+MAX_HISTORY_POINTS = 2000  # buckets returned by one history query
+
+QUERY_FIELDS = 'index,name,temperature.gpu,utilization.gpu,memory.used,memory.total,power.draw'
+
+def make_gpu(index, name, temperature, gpu_util, mem_used, mem_total, power_draw):
+    """Build a GPU metrics record in the format the dashboard expects"""
+    mem_util = round((mem_used / mem_total) * 100, 1) if mem_total > 0 else 0
+    return {
+        'index': index,
+        'name': name,
+        'temperature': temperature,
+        'gpu_util': gpu_util,
+        'mem_used': mem_used,
+        'mem_total': mem_total,
+        'mem_util': mem_util,
+        'power_draw': power_draw
+    }
+
+def parse_csv_line(line):
+    """Parse one `nvidia-smi --format=csv,noheader,nounits` line, or None"""
+    parts = [p.strip() for p in line.split(',')]
+    if len(parts) < 7:
+        return None
+    try:
+        return make_gpu(int(parts[0]), parts[1], float(parts[2]), float(parts[3]),
+                        float(parts[4]), float(parts[5]), float(parts[6]))
+    except ValueError:
+        return None
+
+class GPUBackend:
+    """Source of GPU samples. read() returns a list of GPU metrics records"""
+
+    name = 'base'
+
+    def read(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class NVMLBackend(GPUBackend):
+    """Reads GPUs through one long-lived NVML session (nvidia-ml-py)"""
+
+    name = 'nvml'
+
+    def __init__(self):
+        if pynvml is None:
+            raise RuntimeError("pynvml is not installed")
+        pynvml.nvmlInit()
+        self.handles = [pynvml.nvmlDeviceGetHandleByIndex(i)
+                        for i in range(pynvml.nvmlDeviceGetCount())]
+        self.names = []
+        for handle in self.handles:
+            name = pynvml.nvmlDeviceGetName(handle)
+            self.names.append(name.decode() if isinstance(name, bytes) else name)
+
+    def read(self):
+        gpus = []
+        for index, handle in enumerate(self.handles):
+            memory = pynvml.nvmlDeviceGetMemoryInfo(handle)
+            try:
+                power = round(pynvml.nvmlDeviceGetPowerUsage(handle) / 1000, 2)
+            except pynvml.NVMLError:
+                power = 0.0
+            gpus.append(make_gpu(
+                index,
+                self.names[index],
+                float(pynvml.nvmlDeviceGetTemperature(handle, pynvml.NVML_TEMPERATURE_GPU)),
+                float(pynvml.nvmlDeviceGetUtilizationRates(handle).gpu),
+                float(memory.used // (1024 * 1024)),
+                float(memory.total // (1024 * 1024)),
+                power
+            ))
+        return gpus
+
+    def close(self):
+        pynvml.nvmlShutdown()
+
+class NvidiaSmiBackend(GPUBackend):
+    """Reads GPUs from one long-running `nvidia-smi --loop-ms` process"""
+
+    name = 'nvidia-smi'
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.latest = None
+        self.error = None
+        self.process = subprocess.Popen([
+            'nvidia-smi', f'--query-gpu={QUERY_FIELDS}',
+            '--format=csv,noheader,nounits', f'--loop-ms={int(interval * 1000)}'
+        ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        threading.Thread(target=self._reader, name='nvidia-smi-reader', daemon=True).start()
+
+    def _reader(self):
+        batch = []
+        for line in self.process.stdout:
+            gpu = parse_csv_line(line)
+            if gpu is None:
+                continue
+            # Each loop prints one line per GPU; index 0 starts a new batch
+            if batch and gpu['index'] <= batch[-1]['index']:
+                self.latest = batch
+                batch = []
+            batch.append(gpu)
+        if batch:
+            self.latest = batch
+        self.error = f"nvidia-smi exited with code {self.process.wait()}"
+
+    def read(self):
+        if self.error:
+            raise RuntimeError(self.error)
+        if self.latest is None:
+            return None
+        return self.latest
+
+    def close(self):
+        self.process.terminate()
+
+class UnavailableBackend(GPUBackend):
+    """Stands in when no backend could start; every read reports why"""
+
+    name = 'unavailable'
+
+    def __init__(self, error):
+        self.error = error
+
+    def read(self):
+        raise RuntimeError(self.error)
+
+class FakeBackend(GPUBackend):
+    """Synthetic GPUs for development and testing without NVIDIA hardware"""
+
+    name = 'fake'
+
+    def __init__(self, count=None):
+        self.count = count if count is not None else int(os.environ.get('FAKE_GPU_COUNT', 2))
+
+    def read(self):
+        now = time.time()
+        gpus = []
+        for index in range(self.count):
+            wave = (math.sin(now / 10 + index) + 1) / 2
+            gpus.append(make_gpu(
+                index, 'NVIDIA GeForce RTX 3090',
+                round(40 + 40 * wave, 1), round(100 * wave, 1),
+                round(2048 + 20000 * wave, 1), 24576.0, round(100 + 250 * wave, 2)
+            ))
+        return gpus
+
+def create_backend(kind=GPU_BACKEND):
+    """Create the configured backend, trying NVML then nvidia-smi for 'auto'.
+
+    Never raises: when nothing can start (no driver, no nvidia-smi) the
+    server keeps running on an UnavailableBackend and answers with the error.
+    """
+    try:
+        if kind == 'fake':
+            return FakeBackend()
+        if kind == 'nvml':
+            return NVMLBackend()
+        if kind == 'nvidia-smi':
+            return NvidiaSmiBackend()
+
+        try:
+            return NVMLBackend()
+        except Exception as e:
+            print(f"NVML unavailable ({e}), falling back to nvidia-smi")
+            return NvidiaSmiBackend()
+    except Exception as e:
+        print(f"No GPU backend could start: {e}")
+        return UnavailableBackend(f"No GPU backend could start: {e}")
+
+def parse_duration(value):
+    """Parse '90', '90s', '15m', '1h' or '1d' into seconds"""
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    value = value.strip().lower()
+    if value and value[-1] in units:
+        seconds = float(value[:-1]) * units[value[-1]]
+    else:
+        seconds = float(value)
+    if seconds <= 0 or math.isnan(seconds) or math.isinf(seconds):
+        raise ValueError(f"Invalid duration: {value}")
+    return seconds
+
+class MetricHistory:
+    """Fixed-size ring buffer of GPU samples in compact typed arrays.
+    
+    Every metric of every GPU gets its own array of small scaled integers
+    (1-2 bytes per point) sharing one timestamp array, so a day of 1 Hz
+    history for 8 GPUs takes under 5 MB.
+    """
+
+    # metric -> (array typecode, scale); the type's max value marks a gap
+    METRICS = {
+        'temperature': ('B', 1),    # degrees C
+        'gpu_util': ('B', 1),       # percent
+        'mem_util': ('H', 10),      # tenths of a percent
+        'power_draw': ('H', 10),    # tenths of a watt
+    }
+    MISSING = {'B': 0xFF, 'H': 0xFFFF}
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.timestamps = array('d', [0.0]) * capacity
+        self.series = {}
+        self.names = {}
+        self.head = 0
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def _new_series(self):
+        return {metric: array(code, [self.MISSING[code]]) * self.capacity
+                for metric, (code, _) in self.METRICS.items()}
+
+    def append(self, timestamp, gpus):
+        """Record one sample (a list of GPU metrics records)"""
+        by_index = {gpu['index']: gpu for gpu in gpus}
+        with self.lock:
+            for index, gpu in by_index.items():
+                if index not in self.series:
+                    self.series[index] = self._new_series()
+                self.names[index] = gpu['name']
+
+            position = self.head
+            self.timestamps[position] = timestamp
+            for index, series in self.series.items():
+                gpu = by_index.get(index)
+                for metric, (code, scale) in self.METRICS.items():
+                    missing = self.MISSING[code]
+                    if gpu is None or gpu.get(metric) is None:
+                        series[metric][position] = missing
+                    else:
+                        series[metric][position] = min(max(int(round(gpu[metric] * scale)), 0),
+                                                       missing - 1)
+            self.head = (position + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+
+    def _physical(self, logical):
+        """Map a chronological index (0 = oldest) to an array position"""
+        return (self.head - self.size + logical) % self.capacity
+
+    def _slice(self, values, start, end):
+        """Chronological slice [start, end) of a ring array"""
+        lo = self._physical(start)
+        count = end - start
+        if lo + count <= self.capacity:
+            return values[lo:lo + count]
+        return values[lo:] + values[:lo + count - self.capacity]
+
+    def query(self, window, step):
+        """Average each metric over `step`-second buckets covering the last `window` seconds"""
+        with self.lock:
+            if not self.size:
+                return {'window': window, 'step': step, 'timestamps': [], 'gpus': []}
+
+            # Timestamps are increasing in chronological order, so bisect them
+            timestamps = self._slice(self.timestamps, 0, self.size)
+            end = timestamps[-1]
+            start = end - window
+            buckets = int(math.ceil(window / step))
+            edges = [bisect.bisect_right(timestamps, start + step * i) for i in range(buckets + 1)]
+            edges[-1] = self.size
+
+            result = {
+                'window': window,
+                'step': step,
+                'start': start,
+                'end': end,
+                'timestamps': [round(start + step * (i + 1), 3) for i in range(buckets)],
+                'gpus': []
+            }
+            for index in sorted(self.series):
+                series = self.series[index]
+                gpu = {'index': index, 'name': self.names.get(index)}
+                for metric, (code, scale) in self.METRICS.items():
+                    missing = self.MISSING[code]
+                    values = self._slice(series[metric], edges[0], self.size)
+                    base = edges[0]
+                    points = []
+                    for i in range(buckets):
+                        bucket = values[edges[i] - base:edges[i + 1] - base]
+                        if missing in bucket:
+                            bucket = [v for v in bucket if v != missing]
+                        points.append(round(sum(bucket) / len(bucket) / scale, 1) if bucket else None)
+                    gpu[metric] = points
+                result['gpus'].append(gpu)
+            return result
+
+    def memory_bytes(self):
+        """Approximate memory held by the buffers"""
+        total = self.timestamps.itemsize * self.capacity
+        for series in self.series.values():
+            total += sum(values.itemsize * self.capacity for values in series.values())
+        return total
+
+class GPUSampler:
+    """Samples a backend on a fixed interval and keeps the latest response.
+
+    While reads keep failing (nvidia-smi exited, a driver reset, no backend
+    at startup) the backend is rebuilt with `factory`, waiting 1 s, 2 s, 4 s
+    ... up to BACKEND_RETRY_MAX between attempts.
+    """
+
+    def __init__(self, backend, interval=SAMPLE_INTERVAL, factory=None):
+        self.backend = backend
+        self.interval = interval
+        self.factory = factory
+        self.gpus = None
+        self.timestamp = 0
+        self.error = None
+        self.max_age = max(10, interval * 5)  # older samples are not served
+        self._retry_delay = 1
+        self._retry_at = None
+        # Pre-serialized response body, swapped in atomically on each sample
+        self.body = None
+        self.updated = threading.Condition()
+        self.history = MetricHistory(max(1, int(HISTORY_SECONDS / interval)))
+
+    def start(self):
+        threading.Thread(target=self._run, name='gpu-sampler', daemon=True).start()
+
+    def sample(self):
+        """Take one sample from the backend"""
+        try:
+            gpus = self.backend.read()
+        except Exception as e:
+            self.error = str(e)
+            self._recover()
+            return
+        if gpus is None:
+            return
+        timestamp = time.time()
+        self.gpus = gpus
+        self.error = None
+        self._retry_delay = 1
+        self._retry_at = None
+        self.body = json.dumps({'gpus': gpus, 'timestamp': timestamp}).encode()
+        self.timestamp = timestamp
+        self.history.append(timestamp, gpus)
+        with self.updated:
+            self.updated.notify_all()
+
+    def _recover(self):
+        """Rebuild a failing backend once its back-off has passed"""
+        if self.factory is None:
+            return
+        now = time.time()
+        if self._retry_at is None:
+            self._retry_at = now + self._retry_delay
+            return
+        if now < self._retry_at:
+            return
+        print(f"Restarting the {self.backend.name} GPU backend after: {self.error}")
+        try:
+            self.backend.close()
+        except Exception:
+            pass
+        self.backend = self.factory()
+        self._retry_delay = min(self._retry_delay * 2, BACKEND_RETRY_MAX)
+        self._retry_at = now + self._retry_delay
+
+    def current_body(self):
+        """The latest response body, or None if there is none younger than max_age"""
+        if self.body is None or time.time() - self.timestamp > self.max_age:
+            return None
+        return self.body
+
+    def wait_for_sample(self, after, timeout):
+        """Wait until a sample newer than `after` exists; return its timestamp"""
+        with self.updated:
+            self.updated.wait_for(lambda: self.timestamp > after, timeout)
+        return self.timestamp
+
+    def _run(self):
+        while True:
+            started = time.time()
+            self.sample()
+            time.sleep(max(0, self.interval - (time.time() - started)))
+
+sampler = None
 
 class GPUHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections alive between polls; idle ones are closed
+    # after KEEPALIVE_TIMEOUT so they do not pin a connection slot
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT
+    # Headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls
+    disable_nagle_algorithm = True
+
     def do_GET(self):
-        if self.path == '/gpu-metrics':
-            try:
-                # Get GPU metrics
-                result = subprocess.run([
-                    'nvidia-smi', '--query-gpu=index,name,temperature.gpu,utilization.gpu,memory.used,memory.total,power.draw',
-                    '--format=csv,noheader,nounits'
-                ], capture_output=True, text=True, timeout=5)
-                
-                gpus = []
-                for line in result.stdout.strip().split('\n'):
-                    if ',' in line:
-                        parts = [p.strip() for p in line.split(',')]
-                        if len(parts) >= 7:
-                            try:
-                                mem_used = float(parts[4])
-                                mem_total = float(parts[5])
-                                mem_util = round((mem_used / mem_total) * 100, 1) if mem_total > 0 else 0
-                                
-                                gpus.append({
-                                    'index': int(parts[0]),
-                                    'name': parts[1],
-                                    'temperature': float(parts[2]),
-                                    'gpu_util': float(parts[3]),
-                                    'mem_used': mem_used,
-                                    'mem_total': mem_total,
-                                    'mem_util': mem_util,
-                                    'power_draw': float(parts[6])
-                                })
-                            except:
-                                continue
-                
-                response = json.dumps({'gpus': gpus})
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-                self.wfile.write(response.encode())
-                
-            except Exception as e:
-                self.send_response(500)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                error_response = json.dumps({'error': str(e)})
-                self.wfile.write(error_response.encode())
+        url = urllib.parse.urlsplit(self.path)
+        if url.path == '/gpu-metrics':
+            body = sampler.current_body()
+            if body is not None:
+                self.send_json(200, body)
+            else:
+                error = sampler.error or 'No GPU sample available yet'
+                self.send_json(503, json.dumps({'error': error}).encode())
+        elif url.path == '/gpu-metrics/stream':
+            self.stream_metrics()
+        elif url.path == '/gpu-metrics/history':
+            self.send_history(urllib.parse.parse_qs(url.query))
         else:
-            self.send_response(404)
+            self.send_json(404, json.dumps({'error': 'Not found'}).encode())
+
+    def send_json(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_history(self, query):
+        """Downsampled history, e.g. /gpu-metrics/history?window=1h&step=10s"""
+        try:
+            window = parse_duration(query.get('window', ['1h'])[0])
+            if 'step' in query:
+                step = parse_duration(query['step'][0])
+            else:
+                step = max(sampler.interval, window / 360)
+        except ValueError as e:
+            self.send_json(400, json.dumps({'error': str(e)}).encode())
+            return
+        if window / step > MAX_HISTORY_POINTS:
+            error = f"window/step must not exceed {MAX_HISTORY_POINTS} points"
+            self.send_json(400, json.dumps({'error': error}).encode())
+            return
+        self.send_json(200, json.dumps(sampler.history.query(window, step)).encode())
+
+    def stream_metrics(self):
+        """Push every new sample as a Server-Sent Event.
+        
+        Streams have their own slot pool and hand back their request slot,
+        so long-lived clients never starve short metric reads.
+        """
+        if not self.server.stream_slots.acquire(blocking=False):
+            self.send_json(503, json.dumps({'error': 'Too many stream clients'}).encode())
+            return
+        self.server.release_connection_slot()
+        self.close_connection = True
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-    
+
+            last = 0
+            while True:
+                timestamp = sampler.wait_for_sample(last, timeout=15)
+                if timestamp > last:
+                    last = timestamp
+                    self.wfile.write(b'data: ' + sampler.body + b'\n\n')
+                else:
+                    self.wfile.write(b': keep-alive\n\n')
+                self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            self.server.stream_slots.release()
+
     def log_message(self, format, *args):
         # Suppress logging
         pass
 
+class GPUServer(ThreadingHTTPServer):
+    """Thread-per-connection server with a bounded number of connections.
+    
+    When all MAX_CONNECTIONS slots are busy the accept loop waits, so extra
+    clients queue in the listen backlog instead of spawning more threads.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, handler):
+        super().__init__(address, handler)
+        self.connection_slots = threading.BoundedSemaphore(MAX_CONNECTIONS)
+        self.stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+        self._local = threading.local()
+
+    def process_request(self, request, client_address):
+        self.connection_slots.acquire()
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self.connection_slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        self._local.holds_slot = True
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self.release_connection_slot()
+
+    def release_connection_slot(self):
+        """Give back the calling connection's slot (at most once)"""
+        if getattr(self._local, 'holds_slot', False):
+            self._local.holds_slot = False
+            self.connection_slots.release()
+
 def run_server():
-    server = HTTPServer(('0.0.0.0', 9999), GPUHandler)
-    print("GPU metrics server running on http://0.0.0.0:9999/gpu-metrics")
+    global sampler
+    backend = create_backend()
+    sampler = GPUSampler(backend, factory=create_backend)
+    sampler.start()
+
+    server = GPUServer(('0.0.0.0', PORT), GPUHandler)
+    print(f"GPU metrics server running on http://0.0.0.0:{PORT}/gpu-metrics ({backend.name} backend)")
     server.serve_forever()
 
 if __name__ == '__main__':
-    run_server()
\ No newline at end of file
+    run_server()
@@ -0,0 +1,46 @@
+"""
+Gunicorn settings for the AI Box Dashboard (production mode)
+
+    gunicorn -c gunicorn.conf.py dashboard:app
+
+gthread workers: each worker process serves DASHBOARD_THREADS requests
+concurrently. Every open dashboard tab keeps one /api/stream connection,
+which holds a thread for as long as the tab is open, so the thread budget
+(DASHBOARD_WORKERS x DASHBOARD_THREADS) has to cover the expected number
+of open tabs plus normal requests. Streams may use at most
+DASHBOARD_MAX_STREAMS threads per worker (default half of them); further
+stream clients get a 503 and the page falls back to polling. With more
+than one worker, only one of them runs the collectors; the others read its
+snapshots (see LeaderElection in the dashboard).
+"""
+
+import os
+import signal
+import sys
+
+bind = f"{os.environ.get('DASHBOARD_HOST', '0.0.0.0')}:{os.environ.get('DASHBOARD_PORT', '8085')}"
+workers = int(os.environ.get('DASHBOARD_WORKERS', 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('DASHBOARD_THREADS', 32))
+keepalive = int(os.environ.get('DASHBOARD_KEEPALIVE', 5))
+graceful_timeout = int(os.environ.get('DASHBOARD_GRACEFUL_TIMEOUT', 30))
+timeout = 60
+accesslog = os.environ.get('DASHBOARD_ACCESS_LOG') or None
+errorlog = '-'
+
+def dashboard_module(worker):
+    return sys.modules[worker.wsgi.import_name]
+
+def post_worker_init(worker):
+    """Start background collection and end SSE streams on SIGTERM"""
+    dashboard = dashboard_module(worker)
+    dashboard.start_background()
+    
+    handle_exit = worker.handle_exit
+    def graceful_exit(sig, frame):
+        dashboard.begin_shutdown()
+        handle_exit(sig, frame)
+    signal.signal(signal.SIGTERM, graceful_exit)
+
+def worker_int(worker):
+    dashboard_module(worker).begin_shutdown()
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+llm-router.py - GPU-aware routing proxy for LocalAI and Ollama
+
+Clients send OpenAI-style requests (/v1/chat/completions, /v1/completions,
+/v1/embeddings) or Ollama-native ones (/api/generate, /api/chat) to one
+address and each request goes to the least-loaded backend that serves its
+model. Load combines a backend's in-flight requests against its
+concurrency cap with the live utilization and memory of the GPUs it is
+pinned to, read from gpu-server.py. Requests for a model stay on the
+backend that served it last while that backend is not much busier than
+the best alternative, so models stay resident instead of being loaded
+into every backend's VRAM.
+"""
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import http.client
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+PORT = int(os.environ.get('ROUTER_PORT', 8090))
+BACKENDS_FILE = os.environ.get('ROUTER_BACKENDS_FILE', '')  # JSON list; default is LocalAI + Ollama below
+GPU_SERVER_URL = os.environ.get('GPU_SERVER_URL', 'http://gpu-server:9999/gpu-metrics')
+GPU_INTERVAL = float(os.environ.get('ROUTER_GPU_INTERVAL', 1))  # seconds between GPU reads
+MODELS_INTERVAL = float(os.environ.get('ROUTER_MODELS_INTERVAL', 30))  # seconds between model list reads
+QUEUE_TIMEOUT = float(os.environ.get('ROUTER_QUEUE_TIMEOUT', 30))  # wait for a free slot before 503
+CONNECT_TIMEOUT = float(os.environ.get('ROUTER_CONNECT_TIMEOUT', 2))
+READ_TIMEOUT = float(os.environ.get('ROUTER_READ_TIMEOUT', 600))  # long generations
+FAILURE_COOLDOWN = float(os.environ.get('ROUTER_FAILURE_COOLDOWN', 10))  # skip an unreachable backend
+AFFINITY_SLACK = float(os.environ.get('ROUTER_AFFINITY_SLACK', 0.25))  # extra load a sticky backend may carry
+GPU_WEIGHT = float(os.environ.get('ROUTER_GPU_WEIGHT', 0.5))  # weight of mean GPU utilization in the load
+MEM_WEIGHT = float(os.environ.get('ROUTER_MEM_WEIGHT', 0.25))  # weight of mean GPU memory use in the load
+KEEPALIVE_TIMEOUT = float(os.environ.get('ROUTER_KEEPALIVE_TIMEOUT', 5))  # idle client keep-alive seconds
+
+OPENAI_PATHS = ('/v1/chat/completions', '/v1/completions', '/v1/embeddings')
+OLLAMA_PATHS = ('/api/generate', '/api/chat', '/api/embeddings', '/api/embed')
+
+# Request path -> backend kinds that can serve it (Ollama also speaks the OpenAI API)
+ROUTES = dict(dict.fromkeys(OPENAI_PATHS, ('openai', 'ollama')),
+              **dict.fromkeys(OLLAMA_PATHS, ('ollama',)))
+
+def parse_gpus(value):
+    """[0, 1] from "0,1" (the LOCALAI_GPUS / OLLAMA_GPUS format) or a list"""
+    if isinstance(value, list):
+        return [int(index) for index in value]
+    return [int(index) for index in str(value).split(',') if index.strip()]
+
+def default_backends():
+    """The compose stack's LocalAI and Ollama containers"""
+    return [
+        {'name': 'localai', 'kind': 'openai',
+         'url': os.environ.get('LOCALAI_URL', 'http://localai:8080'),
+         'gpus': os.environ.get('LOCALAI_GPUS', '0,1'),
+         'max_inflight': int(os.environ.get('LOCALAI_MAX_INFLIGHT', 4))},
+        {'name': 'ollama', 'kind': 'ollama',
+         'url': os.environ.get('OLLAMA_URL', 'http://ollama:11434'),
+         'gpus': os.environ.get('OLLAMA_GPUS', '0,1'),
+         'max_inflight': int(os.environ.get('OLLAMA_MAX_INFLIGHT', 4))}
+    ]
+
+def load_backends():
+    """Backends from ROUTER_BACKENDS_FILE, or the default pair"""
+    if not BACKENDS_FILE:
+        return [Backend(**config) for config in default_backends()]
+    with open(BACKENDS_FILE, 'r') as f:
+        return [Backend(**config) for config in json.load(f)]
+
+class Backend:
+    """One LocalAI or Ollama instance: its GPUs, concurrency cap and models"""
+
+    def __init__(self, name, kind, url, gpus='', max_inflight=4):
+        if kind not in ('openai', 'ollama'):
+            raise ValueError(f"backend {name}: kind must be 'openai' or 'ollama'")
+        parts = urllib.parse.urlsplit(url)
+        self.name = name
+        self.kind = kind
+        self.url = url.rstrip('/')
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.gpus = parse_gpus(gpus)
+        self.max_inflight = max(1, int(max_inflight))
+        self.inflight = 0
+        self.models = None  # None until listed: any model is accepted
+        self.down_until = 0
+        self.routed = 0
+        self.errors = 0
+        self._idle = []
+        self._idle_lock = threading.Lock()
+
+    def load(self, gpus):
+        """Load score: in-flight share of the cap plus weighted GPU util and memory"""
+        load = self.inflight / self.max_inflight
+        stats = [gpus[index] for index in self.gpus if index in gpus]
+        if stats:
+            load += GPU_WEIGHT * sum(gpu['gpu_util'] for gpu in stats) / len(stats) / 100
+            load += MEM_WEIGHT * sum(gpu['mem_util'] for gpu in stats) / len(stats) / 100
+        return load
+
+    def serves(self, model):
+        if model is None or self.models is None:
+            return True
+        # Ollama lists "llama3:latest" for a request naming "llama3"
+        return model in self.models or (':' not in model and f"{model}:latest" in self.models)
+
+    def open(self, method, path, body=None, headers=None, timeout=READ_TIMEOUT):
+        """Send a request and return (connection, response) once headers arrive.
+
+        Reuses an idle keep-alive connection when there is one, retrying
+        once on a fresh connection if the backend had closed it.
+        """
+        for attempt in range(2):
+            with self._idle_lock:
+                conn = self._idle.pop() if self._idle else None
+            reused = conn is not None
+            if conn is None:
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=CONNECT_TIMEOUT)
+            try:
+                if conn.sock is None:
+                    conn.connect()
+                conn.sock.settimeout(timeout)
+                conn.request(method, path, body=body, headers=headers or {})
+                return conn, conn.getresponse()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+
+    def release_connection(self, conn, response):
+        if response.will_close:
+            conn.close()
+            return
+        with self._idle_lock:
+            if len(self._idle) < self.max_inflight:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def fetch_models(self):
+        """Model names the backend currently offers"""
+        path = '/api/tags' if self.kind == 'ollama' else '/v1/models'
+        conn, response = self.open('GET', path, timeout=CONNECT_TIMEOUT * 2)
+        body = response.read()
+        self.release_connection(conn, response)
+        if response.status != 200:
+            raise OSError(f"GET {path}: HTTP {response.status}")
+        data = json.loads(body)
+        if self.kind == 'ollama':
+            return {model['name'] for model in data.get('models', [])}
+        return {model['id'] for model in data.get('data', [])}
+
+    def status(self, gpus, now):
+        return {
+            'name': self.name,
+            'kind': self.kind,
+            'url': self.url,
+            'gpus': self.gpus,
+            'inflight': self.inflight,
+            'max_inflight': self.max_inflight,
+            'load': round(self.load(gpus), 3),
+            'down': now < self.down_until,
+            'routed': self.routed,
+            'errors': self.errors,
+            'models': sorted(self.models) if self.models is not None else None
+        }
+
+class NoBackend(Exception):
+    """No backend can serve the request at all (unknown model or all down)"""
+
+class Router:
+    """Picks a backend per request and tracks in-flight counts.
+
+    A request takes a slot on the least-loaded backend that serves its
+    model and has one free. The model's previous backend is preferred
+    while its load is within AFFINITY_SLACK of the least-loaded one. When
+    every candidate is at its cap the request waits up to QUEUE_TIMEOUT
+    for a slot to free up.
+    """
+
+    def __init__(self, backends):
+        self.backends = backends
+        self.gpus = {}
+        self.gpu_error = None
+        self.affinity = {}
+        self._freed = threading.Condition()
+
+    def start(self):
+        threading.Thread(target=self._poll_gpus, name='gpu-poller', daemon=True).start()
+        threading.Thread(target=self._poll_models, name='model-poller', daemon=True).start()
+
+    def _choose(self, model, kinds, now, exclude):
+        candidates = [backend for backend in self.backends
+                      if backend.kind in kinds and backend.serves(model)]
+        if not candidates:
+            raise NoBackend(f"no backend serves model {model!r}")
+        up = [backend for backend in candidates
+              if now >= backend.down_until and backend.name not in exclude]
+        if not up:
+            raise NoBackend('every backend for this request is unreachable')
+        free = [backend for backend in up if backend.inflight < backend.max_inflight]
+        if not free:
+            return None
+        loads = {backend.name: backend.load(self.gpus) for backend in free}
+        best = min(free, key=lambda backend: loads[backend.name])
+        sticky = self.affinity.get(model)
+        if sticky in loads and loads[sticky] <= loads[best.name] + AFFINITY_SLACK:
+            return next(backend for backend in free if backend.name == sticky)
+        return best
+
+    def acquire(self, model, kinds, exclude=()):
+        """Reserve a slot on a backend, or None if none frees up in QUEUE_TIMEOUT.
+
+        Backends named in `exclude` (already tried for this request) are skipped.
+        """
+        deadline = time.time() + QUEUE_TIMEOUT
+        with self._freed:
+            while True:
+                now = time.time()
+                backend = self._choose(model, kinds, now, exclude)
+                if backend is not None:
+                    backend.inflight += 1
+                    backend.routed += 1
+                    if model is not None:
+                        self.affinity[model] = backend.name
+                    return backend
+                if now >= deadline:
+                    return None
+                # Also wakes up to notice backends coming out of their cooldown
+                self._freed.wait(min(deadline - now, 1))
+
+    def release(self, backend, unreachable=False):
+        with self._freed:
+            backend.inflight -= 1
+            if unreachable:
+                backend.errors += 1
+                backend.down_until = time.time() + FAILURE_COOLDOWN
+            self._freed.notify_all()
+
+    def _poll_gpus(self):
+        parts = urllib.parse.urlsplit(GPU_SERVER_URL)
+        while True:
+            started = time.time()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=CONNECT_TIMEOUT)
+            try:
+                conn.request('GET', parts.path or '/')
+                response = conn.getresponse()
+                data = json.loads(response.read())
+                if response.status != 200:
+                    raise OSError(data.get('error', f"HTTP {response.status}"))
+                self.gpus = {gpu['index']: gpu for gpu in data['gpus']}
+                self.gpu_error = None
+            except (http.client.HTTPException, OSError, ValueError, KeyError) as e:
+                if self.gpu_error is None:
+                    print(f"GPU metrics unavailable, routing on in-flight counts only: {e}")
+                # Old GPU figures would skew routing more than none at all
+                self.gpus = {}
+                self.gpu_error = str(e)
+            finally:
+                conn.close()
+            time.sleep(max(0, GPU_INTERVAL - (time.time() - started)))
+
+    def _poll_models(self):
+        while True:
+            for backend in self.backends:
+                try:
+                    backend.models = backend.fetch_models()
+                except (http.client.HTTPException, OSError, ValueError, KeyError) as e:
+                    print(f"Could not list models on {backend.name}: {e}")
+            time.sleep(MODELS_INTERVAL)
+
+    def models(self):
+        """OpenAI-style list of every model any backend offers"""
+        owners = {}
+        for backend in self.backends:
+            for model in backend.models or ():
+                owners.setdefault(model, []).append(backend.name)
+        return {'object': 'list', 'data': [
+            {'id': model, 'object': 'model', 'owned_by': ','.join(names)}
+            for model, names in sorted(owners.items())
+        ]}
+
+    def status(self):
+        now = time.time()
+        with self._freed:
+            return {
+                'backends': [backend.status(self.gpus, now) for backend in self.backends],
+                'affinity': dict(self.affinity),
+                'gpus': list(self.gpus.values()),
+                'gpu_error': self.gpu_error,
+                'timestamp': now
+            }
+
+router = None
+
+class RouterHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        path = urllib.parse.urlsplit(self.path).path
+        if path == '/v1/models':
+            self.send_json(200, router.models())
+        elif path == '/router/status':
+            self.send_json(200, router.status())
+        elif path == '/health':
+            self.send_json(200, {'status': 'healthy'})
+        else:
+            self.send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        path = urllib.parse.urlsplit(self.path).path
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        kinds = ROUTES.get(path)
+        if kinds is None:
+            self.send_json(404, {'error': 'Not found'})
+            return
+        try:
+            model = json.loads(body or b'{}').get('model')
+        except (ValueError, AttributeError):
+            self.send_json(400, {'error': 'Request body must be a JSON object'})
+            return
+
+        tried = []
+        # A backend that cannot be reached is put on cooldown and the
+        # request goes to the next best one
+        for _ in range(len(router.backends)):
+            try:
+                backend = router.acquire(model, kinds, exclude=tried)
+            except NoBackend as e:
+                self.send_json(503 if tried else 404, {'error': str(e)})
+                return
+            if backend is None:
+                self.send_json(503, {'error': 'All backends are at their concurrency limit'})
+                return
+            tried.append(backend.name)
+            headers = {
+                'Content-Type': self.headers.get('Content-Type', 'application/json'),
+                'Accept': self.headers.get('Accept', '*/*')
+            }
+            # Backends behind an API key see the client's credentials
+            if self.headers.get('Authorization'):
+                headers['Authorization'] = self.headers['Authorization']
+            try:
+                conn, response = backend.open('POST', path, body, headers)
+            except (http.client.HTTPException, OSError) as e:
+                print(f"Backend {backend.name} unreachable: {e}")
+                router.release(backend, unreachable=True)
+                continue
+            try:
+                self.relay(backend, conn, response)
+            finally:
+                router.release(backend)
+            return
+        self.send_json(503, {'error': 'No backend could be reached'})
+
+    def relay(self, backend, conn, response):
+        """Copy the backend response to the client as it arrives (SSE/NDJSON streams too)"""
+        self.send_response(response.status)
+        for name in ('Content-Type', 'Cache-Control'):
+            if response.getheader(name):
+                self.send_header(name, response.getheader(name))
+        self.send_header('X-Router-Backend', backend.name)
+        length = response.getheader('Content-Length')
+        if length is not None:
+            self.send_header('Content-Length', length)
+        else:
+            self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        try:
+            while True:
+                # read1 passes stream events on as they arrive; read() marks a
+                # sized body finished so the connection can be reused
+                chunk = response.read1(65536) if length is None else response.read(65536)
+                if not chunk:
+                    break
+                if length is None:
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                else:
+                    self.wfile.write(chunk)
+                self.wfile.flush()
+            if length is None:
+                self.wfile.write(b'0\r\n\r\n')
+        except (http.client.HTTPException, OSError):
+            # Client or backend went away mid-response; closing the backend
+            # connection also stops the generation there
+            conn.close()
+            self.close_connection = True
+            return
+        backend.release_connection(conn, response)
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Suppress logging
+        pass
+
+class RouterServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+def run_server():
+    global router
+    router = Router(load_backends())
+    router.start()
+
+    server = RouterServer(('0.0.0.0', PORT), RouterHandler)
+    names = ', '.join(f"{backend.name} ({backend.url})" for backend in router.backends)
+    print(f"LLM router running on http://0.0.0.0:{PORT} for {names}")
+    server.serve_forever()
+
+if __name__ == '__main__':
+    run_server()
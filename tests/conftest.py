@@ -0,0 +1,42 @@
+"""Shared fixtures: the hyphenated scripts under src/ and scripts/ loaded as modules"""
+
+import importlib.util
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+def load_module(relative_path, name):
+    """Import a file such as src/gpu-server.py under a usable module name"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, relative_path))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture(scope='session')
+def dashboard():
+    """src/dashboard-unified.py, with no Docker daemon and a private state dir.
+
+    Background collectors are never started; tests call what they need.
+    """
+    os.environ.setdefault('DOCKER_SOCKET', os.path.join(tempfile.mkdtemp(), 'missing.sock'))
+    os.environ.setdefault('DASHBOARD_STATE_DIR', tempfile.mkdtemp())
+    return load_module('src/dashboard-unified.py', 'dashboard_unified')
+
+@pytest.fixture(scope='session')
+def gpu_server():
+    return load_module('src/gpu-server.py', 'gpu_server')
+
+@pytest.fixture(scope='session')
+def llm_router():
+    return load_module('src/llm-router.py', 'llm_router')
+
+@pytest.fixture(scope='session')
+def mock_llm():
+    return load_module('scripts/mock-llm-server.py', 'mock_llm_server')
@@ -0,0 +1,61 @@
+"""Dependency-ordered batch lifecycle operations"""
+
+import pytest
+
+REQUIRES = {'forge': ['localai'], 'localai': ['chromadb'], 'n8n': ['localai', 'ollama']}
+
+def test_dependencies_start_first(dashboard):
+    names = {'forge', 'localai', 'chromadb', 'n8n', 'ollama'}
+    assert dashboard.dependency_layers(names, 'start', REQUIRES) == [
+        ['chromadb', 'ollama'], ['localai'], ['forge', 'n8n']]
+
+def test_stop_runs_the_layers_in_reverse(dashboard):
+    assert dashboard.dependency_layers({'forge', 'localai', 'chromadb'}, 'stop', REQUIRES) == [
+        ['forge'], ['localai'], ['chromadb']]
+
+def test_dependencies_outside_the_batch_are_ignored(dashboard):
+    assert dashboard.dependency_layers({'forge', 'n8n'}, 'restart', REQUIRES) == [['forge', 'n8n']]
+
+def test_cycles_are_rejected(dashboard):
+    with pytest.raises(ValueError, match='a, b'):
+        dashboard.dependency_layers({'a', 'b', 'c'}, 'start', {'a': ['b'], 'b': ['a']})
+
+def test_parse_requires(dashboard):
+    assert dashboard.parse_requires('forge:localai; n8n: localai, ollama ;bad') == {
+        'forge': ['localai'], 'n8n': ['localai', 'ollama']}
+
+def test_compose_labels_map_to_container_names(dashboard):
+    containers = [
+        {'Names': ['/ollama'], 'Labels': {'com.docker.compose.service': 'ollama',
+                                          'com.docker.compose.depends_on': 'models:service_started:true'}},
+        {'Names': ['/model-store'], 'Labels': {'com.docker.compose.service': 'models'}},
+        {'Names': ['/manual'], 'Labels': None},
+    ]
+    assert dashboard.compose_requires(containers) == {'ollama': ['model-store']}
+
+@pytest.fixture
+def client(dashboard, monkeypatch):
+    monkeypatch.setattr(dashboard, 'get_docker_services', lambda: [{'name': 'a'}, {'name': 'b'}])
+    monkeypatch.setattr(dashboard, 'service_requires', lambda: {'a': ['b'], 'b': ['a']})
+    return dashboard.app.test_client()
+
+def test_batch_rejects_unknown_services(client):
+    response = client.post('/api/services/batch', json={'action': 'stop', 'services': ['a', '../images']})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Unknown services: ../images'
+
+def test_batch_rejects_dependency_cycles(client):
+    response = client.post('/api/services/batch', json={'action': 'start'})
+    assert response.status_code == 400
+    assert 'cycle' in response.get_json()['error']
+
+def test_health_wait_probes_past_a_cached_result(dashboard, monkeypatch):
+    name = next(iter(dashboard.service_probes))
+    key = dashboard.health_key(name)
+    # The cache still holds the pre-restart result
+    monkeypatch.setattr(dashboard, 'probe_service', lambda name: {'status': 'online'})
+    dashboard.cache.refresh(key)
+
+    monkeypatch.setattr(dashboard, 'probe_service', lambda name: {'status': 'offline'})
+    assert not dashboard.wait_until_healthy(name, timeout=0.5)
+    assert dashboard.cache.peek(key)['data']['status'] == 'offline'
@@ -0,0 +1,41 @@
+"""`?since=` deltas and their bounded removal history"""
+
+import time
+
+def entry(data, version):
+    now = time.time()
+    return {'data': data, 'timestamp': now, 'changed': now, 'version': version}
+
+def service(name, status='running'):
+    return {'name': name, 'status': status}
+
+def track(versions, services, version):
+    entries = {'services': entry(services, version), 'system': None, 'gpu': entry([], 1)}
+    versions._track('services', entries['services'])
+    versions._track('gpu', entries['gpu'])
+    return entries
+
+def test_delta_carries_changes_and_removals(dashboard):
+    versions = dashboard.DashboardVersions(dashboard.cache)
+    versions.base_version = 1
+    track(versions, [service('ollama'), service('localai')], 2)
+    entries = track(versions, [service('ollama', 'stopped')], 3)
+
+    delta = versions.delta(entries, 2)
+    assert delta['services']['changed'] == [service('ollama', 'stopped')]
+    assert delta['services']['removed'] == ['localai']
+    assert 'system' not in delta
+    assert versions.delta(entries, 3)['services'] == {'changed': [], 'removed': [], 'count': 1}
+
+def test_removals_older_than_the_history_are_forgotten(dashboard):
+    versions = dashboard.DashboardVersions(dashboard.cache, history=5)
+    versions.base_version = 1
+    names = [f"svc-{i}" for i in range(20)]
+    # Each version removes one more service
+    for version in range(2, 22):
+        entries = track(versions, [service(name) for name in names[version - 1:]], version)
+
+    assert len(versions._removed['services']) == 5
+    assert versions.base_version == 16
+    assert versions.delta(entries, 15) is None  # needs a full snapshot
+    assert versions.delta(entries, 16)['services']['removed'] == names[15:20]
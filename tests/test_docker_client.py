@@ -0,0 +1,106 @@
+"""DockerClient against a fake Docker Engine API on a Unix socket"""
+
+import json
+import socketserver
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+CONTAINERS = [
+    {'Id': 'a' * 64, 'Names': ['/ollama'], 'State': 'running',
+     'Labels': {'com.docker.compose.service': 'ollama',
+                'com.docker.compose.depends_on': 'models:service_started:true'}},
+    {'Id': 'b' * 64, 'Names': ['/model-store'], 'State': 'exited',
+     'Labels': {'com.docker.compose.service': 'models'}},
+]
+
+class FakeDockerHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def address_string(self):
+        return 'unix'
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.requests.append((self.path, id(self.connection)))
+        path = urllib.parse.urlsplit(self.path).path
+        if path == '/v1.41/containers/json':
+            self.send_json(200, CONTAINERS)
+        elif path == '/v1.41/events':
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            for action in ('start', 'die'):
+                self.wfile.write(json.dumps({'Type': 'container', 'Action': action}).encode() + b'\n')
+            self.close_connection = True
+        else:
+            self.send_json(404, {'message': 'No such container'})
+
+    def do_POST(self):
+        self.server.requests.append((self.path, id(self.connection)))
+        self.send_response(204)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+class FakeDocker(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+@pytest.fixture
+def docker_socket(tmp_path):
+    path = str(tmp_path / 'docker.sock')
+    server = FakeDocker(path, FakeDockerHandler)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield path, server
+    server.shutdown()
+    server.server_close()
+
+def test_requests_reuse_one_keep_alive_connection(dashboard, docker_socket):
+    path, server = docker_socket
+    client = dashboard.DockerClient(path)
+    assert client.containers()[0]['Names'] == ['/ollama']
+    assert len(client.containers()) == 2
+    assert server.requests[0][0] == '/v1.41/containers/json?all=true'
+    assert len({connection for _, connection in server.requests}) == 1
+
+def test_errors_carry_the_status_and_daemon_message(dashboard, docker_socket):
+    client = dashboard.DockerClient(docker_socket[0])
+    with pytest.raises(dashboard.DockerError) as error:
+        client.inspect('nope')
+    assert error.value.status == 404
+    assert 'No such container' in str(error.value)
+
+def test_unreachable_socket_raises_docker_error(dashboard, tmp_path):
+    client = dashboard.DockerClient(str(tmp_path / 'absent.sock'))
+    with pytest.raises(dashboard.DockerError):
+        client.containers()
+
+def test_stream_yields_one_object_per_line(dashboard, docker_socket):
+    client = dashboard.DockerClient(docker_socket[0])
+    events = list(client.stream('/events', timeout=5))
+    assert [event['Action'] for event in events] == ['start', 'die']
+
+def test_action_passes_the_stop_timeout(dashboard, docker_socket):
+    path, server = docker_socket
+    dashboard.DockerClient(path).action('ollama', 'stop', stop_timeout=30)
+    assert server.requests[-1][0] == '/v1.41/containers/ollama/stop?t=30'
+    with pytest.raises(ValueError):
+        dashboard.DockerClient(path).action('ollama', 'kill')
+
+def test_container_names_stay_in_their_path_segment(dashboard, docker_socket):
+    path, server = docker_socket
+    dashboard.DockerClient(path).action('../images/ollama', 'start')
+    assert server.requests[-1][0] == '/v1.41/containers/..%2Fimages%2Follama/start'
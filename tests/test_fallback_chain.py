@@ -0,0 +1,72 @@
+"""FallbackChain source order, background probes and negative caching"""
+
+import time
+
+import pytest
+
+class Source:
+    """A fetch function that fails until told otherwise"""
+
+    def __init__(self, name, working=True):
+        self.name = name
+        self.working = working
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if not self.working:
+            raise RuntimeError(f"{self.name} down")
+        return self.name
+
+def chain(dashboard, *sources, negative_ttl=0, **breaker):
+    result = dashboard.FallbackChain('gpu', negative_ttl=negative_ttl)
+    for source in sources:
+        result.add(source.name, source, dashboard.CircuitBreaker(**breaker))
+    return result
+
+def test_first_working_source_wins(dashboard):
+    primary, secondary = Source('gpu-server', working=False), Source('nvidia-smi')
+    gpu = chain(dashboard, primary, secondary, threshold=2, cooldown=60)
+    assert gpu.fetch() == 'nvidia-smi'
+    assert gpu.fetch() == 'nvidia-smi'
+    assert gpu.source == 'nvidia-smi'
+
+    # Open now: further fetches skip the failing source entirely
+    assert gpu.stats()['sources']['gpu-server']['state'] == 'open'
+    gpu.fetch()
+    assert primary.calls == 2
+
+def test_probe_brings_a_source_back_in_the_background(dashboard):
+    primary, secondary = Source('gpu-server', working=False), Source('nvidia-smi')
+    gpu = chain(dashboard, primary, secondary, threshold=1, cooldown=0.05)
+    assert gpu.fetch() == 'nvidia-smi'
+    time.sleep(0.1)
+
+    primary.working = True
+    # Half-open: the probe runs in a thread while this fetch still falls through
+    assert gpu.fetch() == 'nvidia-smi'
+    deadline = time.time() + 5
+    while gpu.stats()['sources']['gpu-server']['state'] != 'closed' and time.time() < deadline:
+        time.sleep(0.01)
+    assert gpu.fetch() == 'gpu-server'
+
+def test_failed_probe_doubles_the_cooldown(dashboard):
+    breaker = dashboard.CircuitBreaker(threshold=1, cooldown=0.05, max_cooldown=0.15,
+                                       probe=Source('gpu-server', working=False))
+    breaker.failure()
+    for expected in (0.1, 0.15):
+        time.sleep(breaker.current_cooldown + 0.02)
+        assert not breaker.allow()  # starts the probe
+        deadline = time.time() + 5
+        while breaker.trial_running and time.time() < deadline:
+            time.sleep(0.01)
+        assert breaker.current_cooldown == expected
+
+def test_total_outage_is_cached(dashboard):
+    primary, secondary = Source('gpu-server', working=False), Source('nvidia-smi', working=False)
+    gpu = chain(dashboard, primary, secondary, negative_ttl=60, threshold=5)
+    with pytest.raises(dashboard.UpstreamError, match='gpu-server down; nvidia-smi: nvidia-smi down'):
+        gpu.fetch()
+    with pytest.raises(dashboard.UpstreamError, match='cached'):
+        gpu.fetch()
+    assert primary.calls == secondary.calls == 1
@@ -0,0 +1,153 @@
+"""Fleet aggregation against stand-in node dashboards"""
+
+import gzip
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+SNAPSHOT = {
+    'system': {'hostname': 'box-1'},
+    'services': {'data': [{'name': 'ollama', 'status': 'running'},
+                          {'name': 'localai', 'status': 'stopped'}], 'count': 2},
+    'gpu': {'gpus': [{'index': 0, 'gpu_util': 20, 'mem_used': 1000, 'mem_total': 24000},
+                     {'index': 1, 'gpu_util': 60, 'mem_used': 3000, 'mem_total': 24000}]}
+}
+
+class NodeHandler(BaseHTTPRequestHandler):
+    """A node's /api/dashboard with ETags and gzip, like the real one"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        etag = '"v1"'
+        if self.headers.get('If-None-Match') == etag:
+            self.server.statuses.append(304)
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = json.dumps(SNAPSHOT).encode()
+        self.server.statuses.append(200)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', etag)
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+@pytest.fixture
+def node():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), NodeHandler)
+    server.daemon_threads = True
+    server.statuses = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def aggregator(dashboard, nodes, **kwargs):
+    """A FleetAggregator whose nodes are registered in the dashboard cache"""
+    fleet = dashboard.FleetAggregator(nodes, timeout=2, **kwargs)
+    for name in nodes:
+        dashboard.cache.register(fleet.key(name), lambda name=name: fleet.poll(name), 60)
+    return fleet
+
+def unique(name):
+    # The dashboard cache is shared by every test in the session
+    return f"{name}-{uuid.uuid4().hex[:8]}"
+
+def test_poll_revalidates_with_the_etag(dashboard, node):
+    name = unique('box')
+    fleet = aggregator(dashboard, {name: f"http://127.0.0.1:{node.server_address[1]}"})
+    key = fleet.key(name)
+
+    dashboard.cache.refresh(key)
+    first = dashboard.cache.peek(key)
+    assert first['data']['dashboard'] == SNAPSHOT
+    assert first['data']['etag'] == '"v1"'
+
+    dashboard.cache.refresh(key)
+    second = dashboard.cache.peek(key)
+    assert node.statuses == [200, 304]
+    # A 304 renews the entry without publishing a new version
+    assert second['version'] == first['version']
+    assert fleet.last_ok(second) >= fleet.last_ok(first)
+
+def test_view_summarizes_and_totals_nodes(dashboard, node):
+    up, down = unique('up'), unique('down')
+    fleet = aggregator(dashboard, {up: f"http://127.0.0.1:{node.server_address[1]}",
+                                   down: 'http://127.0.0.1:9'})
+    for name in (up, down):
+        dashboard.cache.refresh(fleet.key(name))
+
+    view = fleet.view(full=False)
+    nodes = {entry['name']: entry for entry in view['nodes']}
+    assert nodes[up]['state'] == 'fresh'
+    assert nodes[up]['summary'] == {'hostname': 'box-1', 'services': 2, 'running': 1, 'gpus': 2,
+                                    'gpu_util': 40.0, 'gpu_mem_used': 4000, 'gpu_mem_total': 48000}
+    assert 'dashboard' not in nodes[up]
+    assert nodes[down]['state'] == 'down'
+    assert nodes[down]['error']
+    assert view['states'] == {'fresh': 1, 'stale': 0, 'down': 1, 'pending': 0}
+    assert view['totals']['running'] == 1
+
+def test_failed_poll_keeps_the_last_snapshot_and_goes_stale(dashboard, node):
+    name = unique('flaky')
+    fleet = aggregator(dashboard, {name: f"http://127.0.0.1:{node.server_address[1]}"}, stale_after=0)
+    key = fleet.key(name)
+    dashboard.cache.refresh(key)
+
+    fleet.nodes[name] = 'http://127.0.0.1:9'
+    dashboard.cache.refresh(key)
+    entry = dashboard.cache.peek(key)
+    view = fleet.node_view(name, entry, fleet.last_ok(entry) + 1)
+    assert view['state'] == 'stale'
+    assert view['error']
+    assert view['dashboard'] == SNAPSHOT
+
+    # Failing the same way again changes nothing
+    dashboard.cache.refresh(key)
+    assert dashboard.cache.peek(key)['version'] == entry['version']
+    assert fleet.last_ok(dashboard.cache.peek(key)) == fleet.last_ok(entry)
+
+def test_node_with_no_system_section(dashboard):
+    # Nodes omit a system section that missed its deadline
+    summary = dashboard.FleetAggregator.summarize({'services': {'data': []}})
+    assert summary['hostname'] is None
+    assert summary['gpu_util'] is None
+
+def test_parse_fleet_nodes(dashboard):
+    assert dashboard.parse_fleet_nodes('gpu1=http://10.0.0.5:8085/, 10.0.0.6:8085,,') == {
+        'gpu1': 'http://10.0.0.5:8085',
+        '10.0.0.6:8085': 'http://10.0.0.6:8085'
+    }
+
+def test_inventory_hosts_become_nodes(dashboard, tmp_path):
+    inventory = tmp_path / 'inventory.yml'
+    inventory.write_text("""all:
+  children:
+    ai_boxes:
+      hosts:
+        box-a:
+          ansible_host: 10.0.0.5
+          gpu_count: 2
+        box-b:
+          ansible_host: "10.0.0.6"
+          dashboard_port: 9085
+      vars:
+        ansible_user: admin
+""")
+    assert dashboard.load_inventory_nodes(str(inventory), port=8085) == {
+        'box-a': 'http://10.0.0.5:8085',
+        'box-b': 'http://10.0.0.6:9085'
+    }
@@ -0,0 +1,136 @@
+"""gpu-server.py with the fake device provider"""
+
+import http.client
+import json
+import threading
+
+import pytest
+
+class StaticBackend:
+    """Replays fixed samples; raises once they run out"""
+
+    name = 'static'
+
+    def __init__(self, samples):
+        self.samples = list(samples)
+
+    def read(self):
+        if not self.samples:
+            raise RuntimeError('no more samples')
+        return self.samples.pop(0)
+
+def test_fake_backend_reports_plausible_gpus(gpu_server):
+    gpus = gpu_server.FakeBackend(count=3).read()
+    assert [gpu['index'] for gpu in gpus] == [0, 1, 2]
+    for gpu in gpus:
+        assert 0 <= gpu['gpu_util'] <= 100
+        assert 0 < gpu['mem_used'] < gpu['mem_total']
+        assert gpu['mem_util'] == round(gpu['mem_used'] / gpu['mem_total'] * 100, 1)
+
+def test_create_backend_picks_fake(gpu_server):
+    assert gpu_server.create_backend('fake').name == 'fake'
+
+def test_missing_nvidia_smi_leaves_an_unavailable_backend(gpu_server, monkeypatch, tmp_path):
+    monkeypatch.setenv('PATH', str(tmp_path))
+    backend = gpu_server.create_backend('nvidia-smi')
+    assert backend.name == 'unavailable'
+    with pytest.raises(RuntimeError, match='nvidia-smi'):
+        backend.read()
+
+def test_parse_csv_line(gpu_server):
+    gpu = gpu_server.parse_csv_line('0, NVIDIA GeForce RTX 3090, 45, 30, 1024, 24576, 120.5')
+    assert gpu['name'] == 'NVIDIA GeForce RTX 3090'
+    assert gpu['mem_util'] == 4.2
+    assert gpu_server.parse_csv_line('0, RTX, [N/A], 30, 1024, 24576, 120') is None
+    assert gpu_server.parse_csv_line('garbage') is None
+
+@pytest.mark.parametrize('value, seconds', [('90', 90), ('90s', 90), ('15m', 900), ('1h', 3600), ('1d', 86400)])
+def test_parse_duration(gpu_server, value, seconds):
+    assert gpu_server.parse_duration(value) == seconds
+
+@pytest.mark.parametrize('value', ['0', '-5m', 'nan', 'soon'])
+def test_parse_duration_rejects_bad_values(gpu_server, value):
+    with pytest.raises(ValueError):
+        gpu_server.parse_duration(value)
+
+def test_history_averages_buckets_and_wraps(gpu_server):
+    history = gpu_server.MetricHistory(capacity=4)
+    for second, util in enumerate([10, 20, 30, 40, 50, 60]):
+        history.append(1000.0 + second, [gpu_server.make_gpu(0, 'GPU', 50, util, 1000, 4000, 100)])
+
+    result = history.query(window=4, step=2)
+    # Only the last four samples survive the ring buffer
+    assert result['timestamps'] == [1003.0, 1005.0]
+    gpu = result['gpus'][0]
+    assert gpu['gpu_util'] == [35.0, 55.0]
+    assert gpu['mem_util'] == [25.0, 25.0]
+
+def test_history_marks_missing_gpus_as_gaps(gpu_server):
+    history = gpu_server.MetricHistory(capacity=8)
+    history.append(1000.0, [gpu_server.make_gpu(0, 'GPU', 50, 10, 1000, 4000, 100),
+                            gpu_server.make_gpu(1, 'GPU', 50, 90, 1000, 4000, 100)])
+    history.append(1001.0, [gpu_server.make_gpu(0, 'GPU', 50, 30, 1000, 4000, 100)])
+    gpus = history.query(window=2, step=1)['gpus']
+    assert gpus[0]['gpu_util'] == [10.0, 30.0]
+    assert gpus[1]['gpu_util'] == [90.0, None]
+
+def test_sampler_keeps_the_last_good_sample(gpu_server):
+    gpus = [gpu_server.make_gpu(0, 'GPU', 50, 10, 1000, 4000, 100)]
+    sampler = gpu_server.GPUSampler(StaticBackend([gpus]), interval=1)
+    sampler.sample()
+    assert json.loads(sampler.body)['gpus'] == gpus
+    sampler.sample()
+    assert sampler.error == 'no more samples'
+    assert sampler.gpus == gpus
+
+def test_sampler_rebuilds_a_failing_backend(gpu_server):
+    gpus = [gpu_server.make_gpu(0, 'GPU', 50, 10, 1000, 4000, 100)]
+    backends = [StaticBackend([gpus])]
+    sampler = gpu_server.GPUSampler(StaticBackend([]), interval=1, factory=lambda: backends.pop())
+    sampler._retry_delay = 0
+    sampler.sample()  # first failure starts the back-off
+    assert sampler.error == 'no more samples'
+    sampler.sample()  # back-off over: rebuilt
+    assert not backends
+    sampler.sample()
+    assert sampler.error is None
+    assert sampler.gpus == gpus
+
+def test_old_samples_are_not_served(gpu_server):
+    sampler = gpu_server.GPUSampler(gpu_server.FakeBackend(count=1), interval=1)
+    sampler.sample()
+    assert sampler.current_body() is not None
+    sampler.timestamp -= sampler.max_age + 1
+    assert sampler.current_body() is None
+
+@pytest.fixture
+def server(gpu_server):
+    gpu_server.sampler = gpu_server.GPUSampler(gpu_server.FakeBackend(count=2), interval=1)
+    server = gpu_server.GPUServer(('127.0.0.1', 0), gpu_server.GPUHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def get(server, path):
+    conn = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+    conn.request('GET', path)
+    response = conn.getresponse()
+    return response.status, json.loads(response.read())
+
+def test_metrics_endpoint_serves_the_latest_sample(gpu_server, server):
+    status, body = get(server, '/gpu-metrics')
+    assert status == 503
+
+    gpu_server.sampler.sample()
+    status, body = get(server, '/gpu-metrics')
+    assert status == 200
+    assert len(body['gpus']) == 2
+
+def test_history_endpoint_validates_its_query(gpu_server, server):
+    gpu_server.sampler.sample()
+    status, body = get(server, '/gpu-metrics/history?window=1h&step=10s')
+    assert status == 200
+    assert len(body['timestamps']) == 360
+    assert get(server, '/gpu-metrics/history?window=1d&step=1s')[0] == 400
+    assert get(server, '/gpu-metrics/history?window=later')[0] == 400
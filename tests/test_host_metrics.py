@@ -0,0 +1,71 @@
+"""HostMetrics against a fixture /proc tree"""
+
+import pytest
+
+STAT = """cpu  100 0 100 700 100 0 0 0 0 0
+cpu0 50 0 50 350 50 0 0 0 0 0
+cpu1 50 0 50 350 50 0 0 0 0 0
+intr 12345
+"""
+
+STAT_LATER = """cpu  250 0 150 800 100 0 0 0 0 0
+cpu0 150 0 50 375 50 0 0 0 0 0
+cpu1 100 0 75 425 50 0 0 0 0 0
+intr 23456
+"""
+
+MEMINFO = """MemTotal:       16384000 kB
+MemFree:         2048000 kB
+MemAvailable:    4096000 kB
+SwapTotal:       2048000 kB
+SwapFree:        1024000 kB
+HugePages_Total:       0
+"""
+
+PRESSURE_CPU = """some avg10=1.50 avg60=0.75 avg300=0.25 total=123456
+full avg10=0.00 avg60=0.00 avg300=0.00 total=0
+"""
+
+@pytest.fixture
+def proc(tmp_path):
+    (tmp_path / 'stat').write_text(STAT)
+    (tmp_path / 'meminfo').write_text(MEMINFO)
+    (tmp_path / 'loadavg').write_text('0.50 1.25 2.00 3/456 7890\n')
+    (tmp_path / 'pressure').mkdir()
+    (tmp_path / 'pressure' / 'cpu').write_text(PRESSURE_CPU)
+    return tmp_path
+
+def test_cpu_usage_is_the_delta_between_samples(dashboard, proc):
+    metrics = dashboard.HostMetrics(proc_root=str(proc))
+    first = metrics.cpu_usage()
+    # First sample: average since boot, iowait counts as idle
+    assert first == {'usage': 20.0, 'per_core': [20.0, 20.0], 'cores': 2}
+
+    (proc / 'stat').write_text(STAT_LATER)
+    second = metrics.cpu_usage()
+    assert second['usage'] == 66.7
+    assert second['per_core'] == [80.0, 50.0]
+
+def test_memory_uses_available_and_reports_swap(dashboard, proc):
+    memory = dashboard.HostMetrics(proc_root=str(proc)).memory()
+    assert memory['total_mb'] == 16000
+    assert memory['available_mb'] == 4000
+    assert memory['used_mb'] == 12000
+    assert memory['percent'] == 75.0
+    assert memory['swap'] == {'percent': 50.0, 'used_mb': 1000, 'total_mb': 2000}
+
+def test_load_and_process_counts(dashboard, proc):
+    assert dashboard.HostMetrics(proc_root=str(proc)).load() == {
+        'load1': 0.5, 'load5': 1.25, 'load15': 2.0, 'running': 3, 'processes': 456}
+
+def test_pressure_is_none_where_unsupported(dashboard, proc):
+    pressure = dashboard.HostMetrics(proc_root=str(proc)).pressure()
+    assert pressure['cpu']['some'] == {'avg10': 1.5, 'avg60': 0.75, 'avg300': 0.25, 'total_us': 123456}
+    assert pressure['memory'] is None
+    assert pressure['io'] is None
+
+def test_sample_combines_every_source(dashboard, proc):
+    sample = dashboard.HostMetrics(proc_root=str(proc)).sample()
+    assert sample['cpu']['load']['processes'] == 456
+    assert sample['memory']['percent'] == 75.0
+    assert set(sample['pressure']) == {'cpu', 'memory', 'io'}
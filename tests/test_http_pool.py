@@ -0,0 +1,77 @@
+"""HTTPPool keep-alive connections and per-upstream circuit breakers"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.connections.add(id(self.connection))
+        status = 200 if self.path == '/ok' else 500
+        body = json.dumps({'path': self.path}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), UpstreamHandler)
+    server.daemon_threads = True
+    server.connections = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", server
+    server.shutdown()
+    server.server_close()
+
+def test_requests_reuse_a_keep_alive_connection(dashboard, upstream):
+    url, server = upstream
+    pool = dashboard.HTTPPool()
+    for _ in range(3):
+        assert pool.get_json(f"{url}/ok") == {'path': '/ok'}
+    assert len(server.connections) == 1
+    assert pool.stats()[url[len('http://'):]]['idle'] == 1
+
+def test_error_statuses_are_returned_not_raised(dashboard, upstream):
+    url, _ = upstream
+    pool = dashboard.HTTPPool()
+    status, _, _ = pool.request('GET', f"{url}/missing")
+    assert status == 500
+    # The upstream answered, so its breaker stays closed
+    assert pool.breaker(url).state == 'closed'
+    with pytest.raises(dashboard.UpstreamError, match='HTTP 500'):
+        pool.get_json(f"{url}/missing")
+
+def test_breaker_opens_after_consecutive_failures(dashboard):
+    pool = dashboard.HTTPPool(connect_timeout=0.5)
+    url = 'http://127.0.0.1:9/gpu-metrics'
+    breaker = pool.breaker(url)
+    for _ in range(breaker.threshold):
+        with pytest.raises(dashboard.UpstreamError, match='failed'):
+            pool.request('GET', url)
+    assert breaker.state == 'open'
+    # Refused at once, without touching the network
+    with pytest.raises(dashboard.UpstreamError, match='circuit open'):
+        pool.request('GET', url)
+    assert breaker.trips == 1
+
+def test_half_open_breaker_lets_one_trial_through(dashboard):
+    breaker = dashboard.CircuitBreaker(threshold=2, cooldown=0)
+    breaker.failure()
+    assert breaker.state == 'closed'
+    breaker.failure()
+    assert breaker.state == 'half_open'  # a zero cooldown is over at once
+
+    assert breaker.allow()
+    assert not breaker.allow()  # the trial is still running
+    breaker.success()
+    assert breaker.state == 'closed'
+    assert breaker.allow()
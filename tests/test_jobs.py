@@ -0,0 +1,78 @@
+"""JobManager background jobs, progress, per-container locks and history"""
+
+import threading
+import time
+
+import pytest
+
+@pytest.fixture
+def jobs(dashboard, tmp_path):
+    return dashboard.JobManager(dashboard.SnapshotStore(str(tmp_path)), history=2)
+
+def wait_done(job, timeout=5):
+    deadline = time.time() + timeout
+    while not job.done and time.time() < deadline:
+        time.sleep(0.01)
+    return job
+
+def test_job_runs_in_the_background_and_logs_progress(jobs):
+    def work(job):
+        with jobs.container(job, 'ollama'):
+            jobs.log(job, 'restart ollama')
+
+    job = wait_done(jobs.submit('restart', 'ollama', work))
+    assert job.state == 'succeeded'
+    assert [entry['message'] for entry in job.progress] == ['running', 'restart ollama', 'succeeded']
+    assert job.to_dict()['duration'] >= 0
+    # Mirrored to the store for the other worker processes
+    assert jobs.store.read_job(job.id)['state'] == 'succeeded'
+
+def test_failed_job_records_the_error(jobs):
+    def work(job):
+        raise RuntimeError('No such container: ollama')
+
+    job = wait_done(jobs.submit('start', 'ollama', work))
+    assert job.state == 'failed'
+    assert jobs.lookup(job.id)['error'] == 'No such container: ollama'
+
+def test_jobs_on_one_container_are_serialized(jobs):
+    running, overlaps = [], []
+    release = threading.Event()
+
+    def work(job):
+        with jobs.container(job, 'ollama'):
+            overlaps.append(len(running))
+            running.append(job.id)
+            release.wait(5)
+            running.remove(job.id)
+
+    first = jobs.submit('restart', 'ollama', work)
+    second = jobs.submit('restart', 'ollama', work)
+    deadline = time.time() + 5
+    while not any('waiting for another job' in entry['message'] for job in (first, second)
+                  for entry in job.progress) and time.time() < deadline:
+        time.sleep(0.01)
+    release.set()
+    wait_done(first)
+    wait_done(second)
+    assert overlaps == [0, 0]
+    assert first.state == second.state == 'succeeded'
+
+def test_finished_jobs_beyond_the_history_are_dropped(jobs):
+    finished = [wait_done(jobs.submit('stop', f"svc-{i}", lambda job: None)) for i in range(3)]
+    jobs.submit('stop', 'svc-3', lambda job: None)
+    assert jobs.lookup(finished[0].id) is None
+    assert jobs.lookup(finished[2].id)['state'] == 'succeeded'
+
+def test_wait_for_change_wakes_on_progress(jobs):
+    version = jobs.version
+    release = threading.Event()
+
+    def work(job):
+        jobs.log(job, 'start ollama')
+        release.wait(5)
+
+    job = jobs.submit('start', 'ollama', work)
+    assert jobs.wait_for_change(version, timeout=5) != version
+    release.set()
+    wait_done(job)
@@ -0,0 +1,160 @@
+"""llm-router.py choice, caps and affinity against mock LocalAI/Ollama servers"""
+
+import argparse
+import http.client
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+@pytest.fixture
+def mock_server(mock_llm):
+    """Factory for mock backends: mock_server('ollama', 'llama3') -> base URL"""
+    servers = []
+
+    def start(kind, *models):
+        server = mock_llm.MockServer(('127.0.0.1', 0), mock_llm.MockHandler)
+        server.args = argparse.Namespace(kind=kind, models=list(models), tps=10000, stream_tps=10000,
+                                         ttft=0, max_tokens=4, fail_rate=0)
+        server.gpu = mock_llm.MockGPU(10000, 10000)
+        server.requests = 0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def backends(llm_router, *configs):
+    return [llm_router.Backend(name, kind, url, gpus, max_inflight)
+            for name, kind, url, gpus, max_inflight in configs]
+
+def test_models_are_listed_per_backend_kind(llm_router, mock_server):
+    localai, ollama = backends(llm_router,
+                               ('localai', 'openai', mock_server('openai', 'mistral'), '0', 4),
+                               ('ollama', 'ollama', mock_server('ollama', 'llama3'), '1', 4))
+    assert localai.fetch_models() == {'mistral'}
+    ollama.models = ollama.fetch_models()
+    assert ollama.models == {'llama3:latest'}
+    # Ollama's ":latest" tag is implied
+    assert ollama.serves('llama3')
+    assert not ollama.serves('mistral')
+
+def test_least_loaded_gpu_wins(llm_router):
+    router = llm_router.Router(backends(llm_router, ('a', 'openai', 'http://a', '0', 4),
+                                        ('b', 'openai', 'http://b', '1', 4)))
+    router.gpus = {0: {'gpu_util': 90, 'mem_util': 50}, 1: {'gpu_util': 10, 'mem_util': 50}}
+    assert router.acquire('llama3', ('openai',)).name == 'b'
+
+def test_affinity_holds_within_the_slack(llm_router, monkeypatch):
+    monkeypatch.setattr(llm_router, 'AFFINITY_SLACK', 0.25)
+    a, b = backends(llm_router, ('a', 'openai', 'http://a', '', 4), ('b', 'openai', 'http://b', '', 4))
+    router = llm_router.Router([a, b])
+    router.affinity['llama3'] = 'a'
+
+    a.inflight = 1  # load 0.25 vs 0.0: still within the slack
+    assert router.acquire('llama3', ('openai',)) is a
+    # a now has two requests in flight (load 0.5), so b takes over
+    assert router.acquire('llama3', ('openai',)) is b
+    assert router.affinity['llama3'] == 'b'
+
+def test_concurrency_caps_queue_then_time_out(llm_router, monkeypatch):
+    monkeypatch.setattr(llm_router, 'QUEUE_TIMEOUT', 0.2)
+    a, b = backends(llm_router, ('a', 'openai', 'http://a', '', 1), ('b', 'openai', 'http://b', '', 1))
+    router = llm_router.Router([a, b])
+    assert {router.acquire(None, ('openai',)).name for _ in range(2)} == {'a', 'b'}
+    assert router.acquire(None, ('openai',)) is None
+
+    threading.Timer(0.05, router.release, args=(a,)).start()
+    assert router.acquire(None, ('openai',)) is a
+
+def test_unknown_model_and_unreachable_backends(llm_router):
+    a, b = backends(llm_router, ('a', 'openai', 'http://a', '', 4), ('b', 'ollama', 'http://b', '', 4))
+    a.models, b.models = {'mistral'}, {'llama3:latest'}
+    router = llm_router.Router([a, b])
+    with pytest.raises(llm_router.NoBackend):
+        router.acquire('phi3', ('openai', 'ollama'))
+    # Ollama-native paths never go to an OpenAI-only backend
+    with pytest.raises(llm_router.NoBackend):
+        router.acquire('mistral', ('ollama',))
+
+    router.release(router.acquire('llama3', ('ollama',)), unreachable=True)
+    assert b.errors == 1
+    with pytest.raises(llm_router.NoBackend):
+        router.acquire('llama3', ('ollama',))
+
+@pytest.fixture
+def routed(llm_router):
+    """Serve llm_router.router (set by the test) on a free port"""
+    server = llm_router.RouterServer(('127.0.0.1', 0), llm_router.RouterHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+def post(port, path, body, **headers):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    conn.request('POST', path, body=json.dumps(body), headers=dict(headers, **{'Content-Type': 'application/json'}))
+    response = conn.getresponse()
+    return response, response.read()
+
+def test_requests_are_relayed_and_fail_over(llm_router, mock_server, routed):
+    dead, ollama = backends(llm_router, ('dead', 'openai', 'http://127.0.0.1:9', '', 4),
+                            ('ollama', 'ollama', mock_server('ollama', 'llama3'), '', 4))
+    llm_router.router = llm_router.Router([dead, ollama])
+    llm_router.router.affinity['llama3'] = 'dead'
+
+    response, body = post(routed, '/v1/chat/completions', {
+        'model': 'llama3', 'messages': [{'role': 'user', 'content': 'hi'}]})
+    assert response.status == 200
+    assert response.getheader('X-Router-Backend') == 'ollama'
+    assert json.loads(body)['usage']['completion_tokens'] == 4
+    assert dead.errors == 1
+    assert llm_router.router.affinity['llama3'] == 'ollama'
+
+    response, body = post(routed, '/api/generate', {'model': 'llama3', 'prompt': 'hi', 'stream': True})
+    lines = [json.loads(line) for line in body.splitlines()]
+    assert response.getheader('Transfer-Encoding') == 'chunked'
+    assert len(lines) == 5 and lines[-1]['done']
+
+def test_bad_requests_are_rejected(llm_router, routed):
+    llm_router.router = llm_router.Router(backends(llm_router, ('a', 'openai', 'http://a', '', 4)))
+    assert post(routed, '/v1/images/generations', {})[0].status == 404
+    response, _ = post(routed, '/v1/completions', ['not', 'an', 'object'])
+    assert response.status == 400
+
+class EchoHandler(BaseHTTPRequestHandler):
+    """An OpenAI-style backend that answers with the credentials it was sent"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        body = json.dumps({'authorization': self.headers.get('Authorization')}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def test_client_credentials_reach_the_backend(llm_router, routed):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), EchoHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        llm_router.router = llm_router.Router(backends(
+            llm_router, ('localai', 'openai', f"http://127.0.0.1:{server.server_address[1]}", '', 4)))
+        _, body = post(routed, '/v1/embeddings', {'model': 'bge', 'input': 'hi'},
+                       Authorization='Bearer sk-local')
+        assert json.loads(body) == {'authorization': 'Bearer sk-local'}
+        _, body = post(routed, '/v1/embeddings', {'model': 'bge', 'input': 'hi'})
+        assert json.loads(body) == {'authorization': None}
+    finally:
+        server.shutdown()
+        server.server_close()
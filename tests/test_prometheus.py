@@ -0,0 +1,64 @@
+"""/metrics text rendered from cached snapshots"""
+
+import time
+
+class SnapshotCache:
+    """Just enough of RefreshCache for PrometheusExporter"""
+
+    def __init__(self, **sections):
+        self.entries = {}
+        for version, (key, data) in enumerate(sections.items(), 1):
+            self.set(key, data, version)
+
+    def set(self, key, data, version):
+        now = time.time()
+        self.entries[key] = {'data': data, 'timestamp': now, 'changed': now, 'version': version}
+
+    def get_nowait(self, key):
+        return self.entries.get(key)
+
+GPUS = [{'index': 0, 'name': 'RTX "3090"', 'gpu_util': 45, 'mem_used': 1024, 'mem_total': 24576,
+         'mem_util': 4.2, 'temperature': 60, 'power_draw': None}]
+SERVICES = [{'name': 'ollama', 'status': 'running', 'restarts': 2, 'stats': {'cpu': 12.5, 'memory': 30.0}},
+            {'name': 'forge', 'status': 'stopped', 'restarts': 0, 'stats': None}]
+SYSTEM = {'cpu': {'usage': 25.0, 'per_core': [20.0, 30.0], 'load': {'load1': 0.5, 'load5': 0.4, 'load15': 0.3}},
+          'memory': {'used_mb': 2048, 'total_mb': 8192, 'percent': 25.0},
+          'pressure': {'io': {'some': {'total_us': 1500000}}, 'cpu': None}}
+
+def samples(output):
+    return {line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+            for line in output.splitlines() if line and not line.startswith('#')}
+
+def test_series_per_gpu_container_and_host(dashboard):
+    output = dashboard.PrometheusExporter(SnapshotCache(gpu=GPUS, services=SERVICES, system=SYSTEM)).render()
+    values = samples(output)
+
+    assert values['aibox_gpu_utilization_percent{gpu="0",name="RTX \\"3090\\""}'] == 45
+    assert values['aibox_gpu_memory_used_bytes{gpu="0",name="RTX \\"3090\\""}'] == 1024 * 1024 * 1024
+    assert values['aibox_container_status{name="ollama",status="running"}'] == 1
+    assert values['aibox_container_status{name="forge",status="running"}'] == 0
+    assert values['aibox_container_restarts_total{name="ollama"}'] == 2
+    assert values['aibox_container_cpu_percent{name="ollama"}'] == 12.5
+    assert values['aibox_host_cpu_core_usage_percent{core="1"}'] == 30.0
+    assert values['aibox_host_load_average{period="15"}'] == 0.3
+    assert values['aibox_host_memory_total_bytes'] == 8192 * 1024 * 1024
+    assert values['aibox_host_pressure_stall_seconds_total{resource="io",kind="some"}'] == 1.5
+    # Missing values are left out rather than reported as zero
+    assert 'aibox_gpu_power_draw_watts' not in ' '.join(values)
+    assert 'aibox_container_cpu_percent{name="forge"}' not in values
+    assert '# TYPE aibox_container_restarts_total counter' in output
+
+def test_missing_sections_render_empty_families(dashboard):
+    output = dashboard.PrometheusExporter(SnapshotCache()).render()
+    assert '# TYPE aibox_gpu_utilization_percent gauge' in output
+    assert samples(output) == {}
+
+def test_output_is_reused_until_a_snapshot_changes(dashboard):
+    cache = SnapshotCache(gpu=GPUS, services=SERVICES, system=SYSTEM)
+    exporter = dashboard.PrometheusExporter(cache)
+    first = exporter.render()
+    assert exporter.render() is first
+
+    cache.set('services', [dict(SERVICES[0], status='restarting')], 10)
+    values = samples(exporter.render())
+    assert values['aibox_container_status{name="ollama",status="restarting"}'] == 1
@@ -0,0 +1,90 @@
+"""RefreshCache single-flight refreshes and stale-while-revalidate reads"""
+
+import threading
+import time
+
+def test_concurrent_readers_share_one_load(dashboard):
+    cache = dashboard.RefreshCache()
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return 'value'
+
+    cache.register('key', loader, 60)
+    results = []
+    readers = [threading.Thread(target=lambda: results.append(cache.get('key'))) for _ in range(8)]
+    for reader in readers:
+        reader.start()
+    time.sleep(0.1)
+    release.set()
+    for reader in readers:
+        reader.join(5)
+
+    assert len(calls) == 1
+    assert results == ['value'] * 8
+
+def test_stale_value_is_served_while_it_revalidates(dashboard):
+    cache = dashboard.RefreshCache()
+    values = iter(['old', 'new'])
+    started, release = threading.Event(), threading.Event()
+
+    def loader():
+        value = next(values)
+        if value == 'new':
+            started.set()
+            release.wait(5)
+        return value
+
+    cache.register('key', loader, 0.05)
+    assert cache.get('key') == 'old'
+    time.sleep(0.1)
+
+    # Stale: answered at once from the old value, refreshed in the background
+    assert cache.get('key') == 'old'
+    assert started.wait(5)
+    assert cache.get('key') == 'old'
+    release.set()
+    cache.refresh('key')  # waits for the background refresh
+    assert cache.get('key') == 'new'
+    assert cache.stats()['key']['stale_hits'] >= 2
+
+def test_failed_refresh_keeps_the_last_good_value(dashboard):
+    cache = dashboard.RefreshCache()
+    results = iter([[1], RuntimeError('collector down')])
+
+    def loader():
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    cache.register('key', loader, 60)
+    cache.refresh('key')
+    cache.refresh('key')
+    assert cache.get('key') == [1]
+    assert cache.stats()['key']['errors'] == 1
+
+def test_first_failure_publishes_the_default(dashboard):
+    cache = dashboard.RefreshCache()
+
+    def loader():
+        raise RuntimeError('no data yet')
+
+    cache.register('key', loader, 60, default=[])
+    assert cache.get('key', wait=1) == []
+
+def test_version_moves_only_when_data_changes(dashboard):
+    cache = dashboard.RefreshCache()
+    values = iter([{'a': 1}, {'a': 1}, {'a': 2}])
+    cache.register('key', lambda: next(values), 60)
+
+    cache.refresh('key')
+    first = cache.peek('key')
+    cache.refresh('key')
+    assert cache.version == first['version']
+    assert cache.peek('key')['timestamp'] >= first['timestamp']
+    cache.refresh('key')
+    assert cache.version == first['version'] + 1
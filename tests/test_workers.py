@@ -0,0 +1,106 @@
+"""Leader election, shared snapshots and stream slots for multi-worker serving"""
+
+import threading
+import time
+
+import pytest
+
+class Collector:
+    """Stands in for the background collector"""
+
+    def __init__(self, *keys):
+        self.intervals = dict.fromkeys(keys, 2)
+        self.refreshed = []
+
+    def start(self):
+        pass
+
+    def refresh_now(self, key):
+        self.refreshed.append(key)
+
+class Inventory:
+    def start(self):
+        pass
+
+def test_snapshot_store_round_trips_entries(dashboard, tmp_path):
+    store = dashboard.SnapshotStore(str(tmp_path))
+    assert store.read_entry('services') is None
+
+    entry = {'data': [{'name': 'ollama'}], 'timestamp': 1.0, 'changed': 1.0, 'version': 3}
+    store.write_entry('services', entry)
+    assert store.read_entry('services') == entry
+    # Renamed into place: no temporary files are left behind
+    assert [path.name for path in (tmp_path / 'cache').iterdir()] == ['services.json']
+
+def test_job_ids_cannot_leave_the_jobs_directory(dashboard, tmp_path):
+    store = dashboard.SnapshotStore(str(tmp_path))
+    store.write_entry('secret', {'data': 1})
+    store.write_job({'id': 'abc'})
+    assert store.read_job('../cache/secret') is None
+    assert store.read_job('abc') == {'id': 'abc'}
+
+@pytest.fixture
+def workers(dashboard, tmp_path, monkeypatch):
+    """Two processes' worth of cache + election sharing one state directory"""
+    monkeypatch.setattr(dashboard, 'inventory', Inventory())
+    store = dashboard.SnapshotStore(str(tmp_path))
+    values = iter(range(100))
+    started = []
+
+    def start():
+        cache = dashboard.RefreshCache()
+        cache.register('key', lambda: {'value': next(values)}, 60)
+        collector = Collector('key')
+        election = dashboard.LeaderElection(cache, collector, dashboard.SnapshotStore(store.directory))
+        election.start()
+        started.append(election)
+        return cache, collector, election
+
+    yield start
+    # Hand the lock down until every follower has taken over and stopped
+    # polling for it, before the inventory stub goes away
+    deadline = time.time() + 10
+    while any(election.role != 'leader' or election._lock_file for election in started):
+        assert time.time() < deadline
+        for election in started:
+            if election.role == 'leader' and election._lock_file:
+                election._lock_file.close()
+                election._lock_file = None
+        time.sleep(0.05)
+
+def test_one_leader_and_followers_share_its_entries(dashboard, workers):
+    leader_cache, _, leader = workers()
+    follower_cache, follower_collector, follower = workers()
+    assert (leader.role, follower.role) == ('leader', 'follower')
+    # Followers only poll the leader's snapshots
+    assert follower_collector.intervals['key'] == dashboard.FOLLOW_INTERVAL
+
+    leader_cache.refresh('key')
+    follower_cache.refresh('key')
+    assert follower_cache.peek('key') == leader_cache.peek('key')
+    assert follower_cache.version == leader_cache.version
+
+def test_a_follower_takes_over_when_the_leader_exits(workers):
+    _, _, leader = workers()
+    follower_cache, follower_collector, follower = workers()
+    leader._lock_file.close()  # what the kernel does when the process exits
+
+    deadline = time.time() + 5
+    while follower.role != 'leader' and time.time() < deadline:
+        time.sleep(0.05)
+    assert follower.role == 'leader'
+    assert follower_collector.intervals['key'] == 2
+    assert follower_collector.refreshed == ['key']
+    follower_cache.refresh('key')
+    assert follower_cache.peek('key')['data'] is not None
+
+def test_streams_beyond_the_cap_get_a_retry_hint(dashboard, monkeypatch):
+    monkeypatch.setattr(dashboard, 'stream_slots', threading.BoundedSemaphore(1))
+    with dashboard.app.test_request_context():
+        first = dashboard.stream_response(iter(['data: 1\n\n']), 'text/event-stream')
+        refused = dashboard.stream_response(iter([]), 'text/event-stream')
+        assert refused.status_code == 503
+        assert refused.headers['Retry-After'] == str(dashboard.STREAM_RETRY_AFTER)
+
+        first.close()  # the client went away
+        assert dashboard.stream_response(iter([]), 'text/event-stream').status_code == 200